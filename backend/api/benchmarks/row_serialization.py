@@ -0,0 +1,105 @@
+"""
+Benchmark spreadsheet row serialization used when chunking evaluations.
+
+Compares the previous DataFrame.to_string + clean_text path against the
+compact `column: value` serializer on a synthetic course-evaluation export.
+
+Usage (from the backend directory):
+    python -m api.benchmarks.row_serialization --rows 100000 --cols 12
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from api.utils.row_serializer import join_rows, serialize_rows
+
+COMMENTS = [
+    "N/A",
+    "Good class",
+    "None",
+    "The instructor explained difficult concepts clearly and was always available in office hours.",
+    "Too many assignments due in the same week as the midterm.",
+    "Lectures were engaging but the slides were hard to follow.",
+]
+
+
+def clean_text(text: str) -> str:
+    # Same steps as DocumentService.clean_text, inlined so the benchmark does not need API credentials
+    text = text.strip()
+    text = re.sub(r'\s+', ' ', text)
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return re.sub(r'[\x00-\x09\x0b\x0c\x0e-\x1f\x7f]', '', text)
+
+
+def make_frame(rows: int, cols: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {
+        "course": rng.choice(["CSC 510", "CSC 316", "MA 305"], rows),
+        "section": rng.integers(1, 6, rows),
+    }
+    for i in range(max(0, cols - 3)):
+        ratings = rng.integers(1, 6, rows).astype(float)
+        ratings[rng.random(rows) < 0.05] = np.nan
+        data[f"Q{i + 1} rating"] = ratings
+    data["comment"] = rng.choice(COMMENTS, rows)
+    return pd.DataFrame(data)
+
+
+def legacy_chunks(df: pd.DataFrame, rows_per_chunk: int):
+    chunks = []
+    for i in range(0, len(df), rows_per_chunk):
+        batch = df.iloc[i:i + rows_per_chunk]
+        include_header = (i == 0) or (len(df.columns) < 10)
+        text = clean_text(batch.to_string(header=include_header, index=False))
+        chunks.append(clean_text(text))
+    return chunks
+
+
+def compact_chunks(df: pd.DataFrame, rows_per_chunk: int):
+    rows = serialize_rows(df)
+    return [join_rows(rows[i:i + rows_per_chunk]) for i in range(0, len(df), rows_per_chunk)]
+
+
+def count_tokens(chunks) -> int:
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return sum(len(encoding.encode(chunk)) for chunk in chunks)
+    except Exception:
+        return sum(len(chunk) for chunk in chunks) // 4
+
+
+def run(name, fn, df, rows_per_chunk, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = fn(df, rows_per_chunk)
+        best = min(best, time.perf_counter() - start)
+    chars = sum(len(chunk) for chunk in chunks)
+    tokens = count_tokens(chunks)
+    print(f"{name:<8} {best:8.3f}s {len(df) / best:12,.0f} rows/s {chars:14,} chars {tokens:12,} tokens")
+    return best, chars, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--cols", type=int, default=12)
+    parser.add_argument("--rows-per-chunk", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.cols)
+    print(f"{args.rows} rows x {len(df.columns)} columns, {args.rows_per_chunk} rows per chunk, best of {args.repeat}")
+    legacy_time, legacy_chars, legacy_tokens = run("legacy", legacy_chunks, df, args.rows_per_chunk, args.repeat)
+    compact_time, compact_chars, compact_tokens = run("compact", compact_chunks, df, args.rows_per_chunk, args.repeat)
+    print(f"speedup {legacy_time / compact_time:.1f}x, "
+          f"output size {compact_chars / legacy_chars:.0%} of legacy chars, "
+          f"{compact_tokens / legacy_tokens:.0%} of legacy tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,132 @@ class Settings(BaseSettings):
     DATABASE_NAME: str = "assistant_db"
     LOG_LEVEL: str = "INFO"
     UPLOAD_DIR: str = "uploads"
-    
+
+    # Embedding storage mode (see api/database/vector_index.py). Changing the dimensions
+    # requires re-uploading stored files and re-exporting the teaching materials snapshot
+    EMBEDDING_MODEL: str = "text-embedding-3-large"
+    EMBEDDING_DIMENSIONS: int = 3072  # text-embedding-3 models can return shortened vectors, e.g. 1024
+    EMBEDDING_QUANTIZATION: str = "none"  # Atlas index quantization: "none", "int8" or "binary"
+    EMBEDDING_RESCORE_FACTOR: int = 4  # quantized searches rescore k * factor candidates at full precision (<= 1 disables)
+    # Stored vector encoding: "array" (BSON doubles), "float32" (BSON binary vector) or "raw" (float32
+    # bytes, in-process search only). Existing documents: python -m api.utils.vector_codec migrate
+    EMBEDDING_STORAGE_FORMAT: str = "array"
+
+    # Chunk embedding cache (in-process LRU tier + MongoDB tier)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 20000
+    EMBEDDING_CACHE_COLLECTION: str = "embedding_cache"
+    EMBEDDING_CACHE_TTL_DAYS: int = 30  # 0 keeps persisted embeddings forever
+
+    # Per-chat in-memory copy of evaluation vectors, searched exactly instead of via Atlas $vectorSearch
+    CHAT_VECTOR_CACHE_ENABLED: bool = True
+    CHAT_VECTOR_CACHE_MAX_MB: int = 256
+    CHAT_VECTOR_CACHE_TTL_SECONDS: float = 600  # 0 never reloads a cached chat
+
+    # Retrieval query embeddings (in-process TTL + LRU, concurrent identical lookups share one request)
+    QUERY_EMBEDDING_CACHE_ENABLED: bool = True
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = 2048
+    QUERY_EMBEDDING_CACHE_TTL_SECONDS: float = 3600  # 0 never expires entries
+
+    # Run a turn's retrieval tool calls together: one query embedding request, concurrent async searches
+    FUSED_RETRIEVAL_ENABLED: bool = True
+
+    # Bound chat models and ToolNodes reused across agent steps, keyed by the frontend + MCP tool set
+    AGENT_TOOL_CACHE_ENABLED: bool = True
+    AGENT_TOOL_CACHE_MAX_ENTRIES: int = 32
+
+    # Authenticated users cached per process; writers of user state update or invalidate their entry
+    USER_CACHE_ENABLED: bool = True
+    USER_CACHE_MAX_ENTRIES: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 30
+
+    # Agent prompt token budget (see api/langgraph/context_manager.py): the last CHAT_CONTEXT_RECENT_TURNS
+    # turns are sent verbatim, older tool results are truncated, and older turns are summarized when the
+    # conversation is still over budget (summaries are cached per chat and extended incrementally)
+    CHAT_CONTEXT_ENABLED: bool = True
+    CHAT_CONTEXT_MAX_TOKENS: int = 16000
+    CHAT_CONTEXT_RECENT_TURNS: int = 2
+    CHAT_CONTEXT_STALE_TOOL_RESULT_TOKENS: int = 200
+    CHAT_CONTEXT_SUMMARY_MODEL: str = "gpt-4o-mini"
+    CHAT_CONTEXT_SUMMARY_TOKENS: int = 600
+    CHAT_CONTEXT_SUMMARY_CACHE_MAX_CHATS: int = 1024
+
+    # Recorded answers replayed when a chat repeats a question (same earlier turns, unchanged files; matched
+    # after normalization or by embedding cosine >= ANSWER_CACHE_SIMILARITY). Uploads and deletes invalidate
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 2048
+    ANSWER_CACHE_TTL_SECONDS: float = 86400
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # 0 matches normalized questions only
+
+    # MCP fetch server pool: calls go to the least busy worker; timed out or unhealthy workers are restarted
+    MCP_FETCH_WORKERS: int = 2
+    MCP_CALL_TIMEOUT_SECONDS: float = 30
+    MCP_HEALTH_CHECK_INTERVAL_SECONDS: float = 30
+
+    # Fetch tool responses (extracted page text) reused while fresh per Cache-Control/Expires, then revalidated
+    # with ETag/Last-Modified; pages that set neither stay fresh for FETCH_CACHE_DEFAULT_TTL_SECONDS
+    FETCH_CACHE_ENABLED: bool = True
+    FETCH_CACHE_MAX_ENTRIES: int = 256
+    FETCH_CACHE_MAX_MB: int = 64
+    FETCH_CACHE_DEFAULT_TTL_SECONDS: float = 300
+    FETCH_CACHE_MAX_TTL_SECONDS: float = 86400
+
+    # Memory-mapped teaching materials snapshot searched locally when present (see api/utils/vector_snapshot.py)
+    TEACHING_MATERIALS_SNAPSHOT_DIR: str = "snapshots/teaching_materials"  # "" always queries Atlas
+
+    # Upload progress pushed over server-sent events (GET /api/files/progress/{file_id}/stream): updates are
+    # coalesced to at most this many events per second; a stream for a file that has not started processing
+    # within PROGRESS_STREAM_START_TIMEOUT_SECONDS ends with a not_found event
+    PROGRESS_STREAM_MAX_UPDATES_PER_SECOND: float = 5
+    PROGRESS_STREAM_KEEPALIVE_SECONDS: float = 15
+    PROGRESS_STREAM_START_TIMEOUT_SECONDS: float = 60
+
+    # Upload progress store (see api/services/progress_store.py): "memory" (per process) or "mongo" (shared by
+    # all workers, written in batches every PROGRESS_STORE_FLUSH_INTERVAL_SECONDS). Entries expire
+    # PROGRESS_STORE_TTL_SECONDS after their last update; each process keeps at most MAX_ENTRIES in memory
+    PROGRESS_STORE: str = "memory"
+    PROGRESS_STORE_MAX_ENTRIES: int = 1000
+    PROGRESS_STORE_TTL_SECONDS: float = 3600
+    PROGRESS_STORE_COLLECTION: str = "file_progress"
+    PROGRESS_STORE_FLUSH_INTERVAL_SECONDS: float = 1.0
+
+    # Vectorization pipeline
+    EMBEDDING_BATCH_SIZE: int = 100
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # embedding batches in flight per upload
+
+    # Stream chunks from the loaders straight into the vector store instead of materializing the whole file
+    INGEST_STREAMING: bool = True
+
+    # Worker processes of the parsing pool shared by PDF extraction and Excel ingestion
+    PROCESS_POOL_WORKERS: int = 4
+
+    # PDF extraction: pages kept in flight per upload are twice PDF_EXTRACTION_WORKERS
+    # (0 extracts serially on a thread instead of the process pool)
+    PDF_EXTRACTION_WORKERS: int = 4
+    PDF_PAGE_TIMEOUT_SECONDS: float = 30.0
+
+    # CSV ingestion ("auto" uses pyarrow when installed, else pandas' C parser)
+    CSV_BLOCK_ROWS: int = 20000
+    CSV_ENGINE: str = "auto"
+
+    # Spreadsheet rows repeating an earlier row (normalized exact match, or MinHash/LSH
+    # near match at DEDUP_NEAR_THRESHOLD estimated Jaccard; 0 = exact only) are not embedded
+    DEDUP_ENABLED: bool = True
+    DEDUP_NEAR_THRESHOLD: float = 0.9
+    DEDUP_NUM_PERM: int = 64
+    DEDUP_LSH_BANDS: int = 8
+
+    # Excel ingestion: rows per streamed block, and sheets in flight per upload on the process pool (0 = serial)
+    EXCEL_BLOCK_ROWS: int = 5000
+    EXCEL_SHEET_WORKERS: int = 4
+
+    # Chunking: rows and PDF lines are packed into chunks of up to this many tokens
+    CHUNK_TOKEN_BUDGET: int = 512
+    CHUNK_TOKEN_OVERLAP: int = 50  # PDF text only; spreadsheet rows never overlap
+    CHUNK_TOKENIZER: str = "tiktoken"  # "tiktoken" or "estimate"
+
     class Config:
         env_file = ".env"
+        extra = "ignore"
 
-settings = Settings() 
\ No newline at end of file
+settings = Settings()
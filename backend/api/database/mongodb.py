@@ -1,14 +1,18 @@
 import os
-from pymongo import MongoClient
-from pymongo.operations import SearchIndexModel
+from pymongo import AsyncMongoClient, MongoClient
 from dotenv import load_dotenv
 from ..utils.logger import logger
+from ..config.settings import settings
+from .vector_index import ensure_vector_index
 
 load_dotenv()
 
 class MongoDB:
     client: MongoClient = None
     db = None
+    # Native asyncio client for hot async paths (e.g. concurrent vector searches), created on first use
+    async_client: AsyncMongoClient = None
+    async_db = None
 
     @classmethod
     def connect_db(cls):
@@ -21,6 +25,9 @@ class MongoDB:
             
             # Create vector index if it doesn't exist
             cls._ensure_evaluations_vector_index()
+            cls._ensure_evaluations_lookup_indexes()
+            cls._ensure_embedding_cache_index()
+            cls._ensure_progress_store_index()
             logger.info("Mongo Check Complete")
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
@@ -30,43 +37,7 @@ class MongoDB:
     def _ensure_evaluations_vector_index(cls):
         """Ensure vector index exists for similarity search"""
         try:
-            collection = cls.db.evaluations_vectors
-            
-            # Create collection if it doesn't exist
-            if "evaluations_vectors" not in cls.db.list_collection_names():
-                cls.db.create_collection("evaluations_vectors")
-                logger.info("Created evaluations_vectors collection")
-            
-            # Check if index exists
-            indexes = list(collection.list_search_indexes())
-            index_exists = any(index.get("name") == "evaluations_index" for index in indexes)
-            
-            if not index_exists:
-                # Create vector index using SearchIndexModel
-                search_index_model = SearchIndexModel(
-                    definition={
-                        "fields": [
-                            {
-                                "type": "vector",
-                                "numDimensions": 3072,
-                                "path": "embedding",
-                                "similarity": "cosine"
-                            },
-                            {
-                                "path": "source",
-                                "type": "filter"
-                            }
-                        ]
-                    },
-                    name="evaluations_index",
-                    type="vectorSearch"
-                )
-                
-                result = collection.create_search_index(model=search_index_model)
-                logger.info(f"Created vector index in MongoDB: {result}")
-            else:
-                logger.info("Vector index 'evaluations_index' already exists")
-
+            ensure_vector_index(cls.db, "evaluations_vectors", "evaluations_index", filter_paths=["source"])
         except Exception as e:
             # If the error is about index already existing, log it as info instead of error
             if "Index already exists" in str(e) or "IndexAlreadyExists" in str(e):
@@ -75,12 +46,64 @@ class MongoDB:
                 logger.error(f"Failed to create vector index: {e}")
                 raise
 
+    @classmethod
+    def _ensure_evaluations_lookup_indexes(cls):
+        """Index the fields used to load a chat's vectors and delete a file's vectors"""
+        try:
+            cls.db.evaluations_vectors.create_index("source", name="source")
+            cls.db.evaluations_vectors.create_index("file_id", name="file_id")
+        except Exception as e:
+            logger.warning(f"Failed to create evaluations_vectors lookup indexes: {e}")
+
+    @classmethod
+    def _ensure_embedding_cache_index(cls):
+        """Ensure the persistent embedding cache expires old entries"""
+        if settings.EMBEDDING_CACHE_TTL_DAYS <= 0:
+            return
+        try:
+            cls.db[settings.EMBEDDING_CACHE_COLLECTION].create_index(
+                "created_at",
+                name="created_at_ttl",
+                expireAfterSeconds=settings.EMBEDDING_CACHE_TTL_DAYS * 24 * 3600
+            )
+        except Exception as e:
+            logger.warning(f"Failed to create embedding cache TTL index: {e}")
+
+    @classmethod
+    def _ensure_progress_store_index(cls):
+        """Expire shared upload progress entries (written with their expiry time)"""
+        if settings.PROGRESS_STORE != "mongo":
+            return
+        try:
+            cls.db[settings.PROGRESS_STORE_COLLECTION].create_index(
+                "expires_at",
+                name="expires_at_ttl",
+                expireAfterSeconds=0
+            )
+        except Exception as e:
+            logger.warning(f"Failed to create progress store TTL index: {e}")
+
     @classmethod
     def close_db(cls):
         if cls.client:
             cls.client.close()
             logger.info("Closed MongoDB connection")
 
+    @classmethod
+    async def close_async_db(cls):
+        if cls.async_client:
+            await cls.async_client.close()
+            cls.async_client = None
+            cls.async_db = None
+            logger.info("Closed async MongoDB connection")
+
     @classmethod
     def get_db(cls):
-        return cls.db 
\ No newline at end of file
+        return cls.db
+
+    @classmethod
+    def get_async_db(cls):
+        if cls.async_db is None:
+            cls.async_client = AsyncMongoClient(os.getenv("MONGODB_URL"))
+            cls.async_db = cls.async_client[os.getenv("DATABASE_NAME")]
+        return cls.async_db 
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""
+Embedding storage mode and the Atlas Vector Search index definitions derived from it.
+
+EMBEDDING_DIMENSIONS shortens text-embedding-3 vectors through the API's
+`dimensions` option, and EMBEDDING_QUANTIZATION lets Atlas index them as int8
+(scalar) or binary while documents keep full-precision vectors. Quantized
+searches can over-fetch candidates and rescore them against those vectors.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_mongodb.utils import make_serializable
+from langchain_openai import OpenAIEmbeddings
+from pymongo.operations import SearchIndexModel
+
+from ..config.settings import settings
+from ..utils.construction_stats import record_construction
+from ..utils.logger import logger
+from ..utils.vector_codec import decode_vectors
+
+# Output size of each model when no `dimensions` is requested
+NATIVE_DIMENSIONS = {
+    "text-embedding-3-large": 3072,
+    "text-embedding-3-small": 1536,
+    "text-embedding-ada-002": 1536,
+}
+
+# EMBEDDING_QUANTIZATION values mapped to Atlas index quantization types
+_QUANTIZATION_TYPES = {"none": None, "int8": "scalar", "scalar": "scalar", "binary": "binary"}
+
+EMBEDDING_PATH = "embedding"
+
+
+def index_quantization() -> Optional[str]:
+    mode = settings.EMBEDDING_QUANTIZATION.lower()
+    if mode not in _QUANTIZATION_TYPES:
+        raise ValueError(f"Unknown EMBEDDING_QUANTIZATION '{settings.EMBEDDING_QUANTIZATION}'")
+    return _QUANTIZATION_TYPES[mode]
+
+
+def create_embeddings() -> OpenAIEmbeddings:
+    """Embeddings client for the configured model and dimensions"""
+    model = settings.EMBEDDING_MODEL
+    dimensions = settings.EMBEDDING_DIMENSIONS
+    if dimensions == NATIVE_DIMENSIONS.get(model):
+        # Leave `dimensions` unset at the native size so cache keys and requests match older data
+        dimensions = None
+    embeddings = OpenAIEmbeddings(model=model, dimensions=dimensions)
+    record_construction("OpenAIEmbeddings")
+    return embeddings
+
+
+def vector_index_definition(filter_paths: Sequence[str] = ()) -> Dict[str, Any]:
+    vector_field = {
+        "type": "vector",
+        "path": EMBEDDING_PATH,
+        "numDimensions": settings.EMBEDDING_DIMENSIONS,
+        "similarity": "cosine",
+    }
+    quantization = index_quantization()
+    if quantization:
+        vector_field["quantization"] = quantization
+    fields = [vector_field] + [{"type": "filter", "path": path} for path in filter_paths]
+    return {"fields": fields}
+
+
+def _definition_matches(existing: Dict[str, Any], wanted: Dict[str, Any]) -> bool:
+    def key(definition):
+        fields = definition.get("fields", [])
+        vectors = [
+            (f.get("path"), f.get("numDimensions"), f.get("similarity"), f.get("quantization") or None)
+            for f in fields if f.get("type") == "vector"
+        ]
+        filters = sorted(f.get("path") for f in fields if f.get("type") == "filter")
+        return vectors, filters
+    return key(existing) == key(wanted)
+
+
+def ensure_vector_index(db, collection_name: str, index_name: str, filter_paths: Sequence[str] = ()):
+    """
+    Create the collection's vector index from the storage config, or update it
+    when its dimensions, quantization or filter fields no longer match.
+    """
+    if collection_name not in db.list_collection_names():
+        db.create_collection(collection_name)
+        logger.info(f"Created {collection_name} collection")
+
+    collection = db[collection_name]
+    definition = vector_index_definition(filter_paths)
+    existing = next(iter(collection.list_search_indexes(index_name)), None)
+
+    if existing is None:
+        result = collection.create_search_index(
+            model=SearchIndexModel(definition=definition, name=index_name, type="vectorSearch")
+        )
+        logger.info(f"Created vector index '{index_name}' in MongoDB: {result}")
+        return
+
+    current = existing.get("latestDefinition") or existing.get("definition") or {}
+    if _definition_matches(current, definition):
+        logger.info(f"Vector index '{index_name}' already exists")
+        return
+
+    collection.update_search_index(index_name, definition)
+    logger.warning(
+        f"Updated vector index '{index_name}' to {settings.EMBEDDING_DIMENSIONS} dims, "
+        f"quantization {index_quantization() or 'none'}; vectors stored with other dimensions "
+        f"are not searchable until their files are re-uploaded"
+    )
+
+
+def _rescore(candidates: List[Tuple[Document, float]], vectors: List[Any], query_vector: Sequence[float], k: int
+             ) -> List[Tuple[Document, float]]:
+    """Re-rank candidates by exact cosine similarity against their stored vectors"""
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+    matrix = decode_vectors(vectors)
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    similarities = (matrix @ query) / norms
+
+    order = np.argsort(-similarities)[:k]
+    # Same scale as Atlas cosine scores
+    return [(candidates[i][0], float((1.0 + similarities[i]) / 2.0)) for i in order]
+
+
+def _rescoring() -> bool:
+    return index_quantization() is not None and settings.EMBEDDING_RESCORE_FACTOR > 1
+
+
+def similarity_search(store, query: str, k: int, pre_filter: Optional[Dict[str, Any]] = None
+                      ) -> List[Tuple[Document, float]]:
+    """
+    Atlas vector search through a MongoDBAtlasVectorSearch store.
+
+    With a quantized index the top `k * EMBEDDING_RESCORE_FACTOR` candidates are
+    fetched with their stored full-precision vectors and re-ranked by exact
+    cosine similarity, recovering most of the recall lost to quantization.
+    """
+    if not _rescoring():
+        return store.similarity_search_with_score(query, k=k, pre_filter=pre_filter)
+
+    candidates = store.similarity_search_with_score(
+        query, k=k * settings.EMBEDDING_RESCORE_FACTOR, pre_filter=pre_filter, include_embeddings=True
+    )
+    if not candidates:
+        return []
+    vectors = [doc.metadata.pop(EMBEDDING_PATH) for doc, _ in candidates]
+    # Query embeddings are cached, so this does not embed the query a second time
+    return _rescore(candidates, vectors, store.embeddings.embed_query(query), k)
+
+
+async def asimilarity_search_by_vector(collection, index_name: str, query_vector: Sequence[float], k: int,
+                                       pre_filter: Optional[Dict[str, Any]] = None, oversampling_factor: int = 10
+                                       ) -> List[Tuple[Document, float]]:
+    """
+    Native async $vectorSearch on an AsyncMongoClient collection.
+
+    Results match MongoDBAtlasVectorSearch.similarity_search_with_score
+    (and `similarity_search` when rescoring), so callers can use either path.
+    """
+    rescoring = _rescoring()
+    limit = k * settings.EMBEDDING_RESCORE_FACTOR if rescoring else k
+    stage = {
+        "index": index_name,
+        "path": EMBEDDING_PATH,
+        "queryVector": list(map(float, query_vector)),
+        "numCandidates": limit * oversampling_factor,
+        "limit": limit,
+    }
+    if pre_filter:
+        stage["filter"] = pre_filter
+    pipeline = [{"$vectorSearch": stage}, {"$set": {"score": {"$meta": "vectorSearchScore"}}}]
+    if not rescoring:
+        pipeline.append({"$project": {EMBEDDING_PATH: 0}})
+
+    candidates, vectors = [], []
+    cursor = await collection.aggregate(pipeline)
+    async for res in cursor:
+        if "text" not in res:
+            continue
+        text = res.pop("text")
+        score = res.pop("score")
+        vector = res.pop(EMBEDDING_PATH, None)
+        make_serializable(res)
+        candidates.append((Document(page_content=text, metadata=res), score))
+        vectors.append(vector)
+
+    if not rescoring or not candidates:
+        return candidates
+    return _rescore(candidates, vectors, query_vector, k)
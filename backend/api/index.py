@@ -1,6 +1,6 @@
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, Response
-from .langgraph.agent import assistant_ui_graph
+from fastapi import Depends, FastAPI, Response
+from .langgraph.agent import assistant_ui_graph, cleanup as cleanup_agent, context_manager, fetch_cache, mcp_pool, tool_binding_cache
 from .routes.add_langgraph_route import add_langgraph_route
 from .database.mongodb import MongoDB
 from .routes.file_routes import router as file_router
@@ -8,6 +8,11 @@ from .routes.auth_routes import router as auth_router
 from .routes.feedback_routes import router as feedback_router
 from .routes.logging_routes import router as logging_router
 from .utils.logger import logger
+from .utils.process_pool import shutdown_process_pool
+from .utils.construction_stats import ConstructionCounterMiddleware
+from .utils.deps import get_services
+from .services.container import ServiceContainer
+from .services.progress_store import progress_store
 from apscheduler.schedulers.background import BackgroundScheduler
 import requests
 import os
@@ -22,6 +27,10 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     # Code to run before the app starts
     MongoDB.connect_db()
+    # Long-lived clients and services shared by all requests
+    app.state.services = ServiceContainer()
+    # Load the prompt budget's tokenizer before the first chat instead of on the event loop
+    await asyncio.to_thread(context_manager.load_tokenizer)
     # Initialize the scheduler
     scheduler = BackgroundScheduler()
     # Start after 1 minute from now
@@ -30,6 +39,11 @@ async def lifespan(app: FastAPI):
     scheduler.start()
     yield
     # Code to run after the app shuts down
+    await cleanup_agent()
+    shutdown_process_pool()
+    # Write batched progress updates before the connection closes
+    await asyncio.to_thread(progress_store.close)
+    await MongoDB.close_async_db()
     MongoDB.close_db()
 
 
@@ -54,11 +68,25 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Count objects constructed per request (see /health/services)
+app.add_middleware(ConstructionCounterMiddleware)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "message": "Service is running"}
 
+@app.get("/health/services")
+async def services_health(services: ServiceContainer = Depends(get_services)):
+    """Construction counts and cache statistics of the shared service container"""
+    return {
+        **services.stats(),
+        "agent_tool_bindings": tool_binding_cache.stats(),
+        "mcp_workers": mcp_pool.stats(),
+        "fetch_cache": fetch_cache.stats(),
+        "chat_context": context_manager.stats(),
+    }
+
 def sync_health_check():
     try:
         health_url = f"{BASE_URL}/health"
@@ -2,13 +2,22 @@ from langchain_openai import ChatOpenAI
 from typing_extensions import Literal, TypedDict, Dict, List, Any, Union, Optional
 from langgraph.graph import StateGraph, END
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import SystemMessage
+from langgraph.prebuilt.tool_node import msg_content_output
+from langchain_core.messages import AIMessage, SystemMessage, ToolMessage
 from langgraph.errors import NodeInterrupt
 from langchain_core.tools import BaseTool
 from pydantic import BaseModel
-from .tools import tools
+from .tools import _session_id, retrieval_searches, tools
 from .state import AgentState
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from ..config.settings import settings
+from ..utils.construction_stats import record_construction
+from .context_manager import context_manager
+from .fetch_cache import FetchCache
+from .mcp_pool import MCPWorkerPool
+import asyncio
+import hashlib
+from collections import OrderedDict
+import json
 import os
 import sys
 import importlib
@@ -79,25 +88,33 @@ class FrontendTool(BaseTool):
         raise NodeInterrupt("This is a frontend tool call")
 
 
-# Initialize MCP client outside of functions to maintain the connection
-mcp_client = None
+# Pages returned by the fetch tool, reused across chats while their HTTP caching headers allow
+fetch_cache = FetchCache(
+    max_entries=settings.FETCH_CACHE_MAX_ENTRIES,
+    max_bytes=settings.FETCH_CACHE_MAX_MB * 1024 * 1024,
+    default_ttl=settings.FETCH_CACHE_DEFAULT_TTL_SECONDS,
+    max_ttl=settings.FETCH_CACHE_MAX_TTL_SECONDS,
+    enabled=settings.FETCH_CACHE_ENABLED,
+)
+
+# Pool of fetch server subprocesses shared by all chats, started on first use
+mcp_pool = MCPWorkerPool(
+    {
+        "command": "python",
+        "args": ["-m", "mcp_server_fetch"],
+        "transport": "stdio",
+    },
+    size=settings.MCP_FETCH_WORKERS,
+    call_timeout=settings.MCP_CALL_TIMEOUT_SECONDS,
+    health_check_interval=settings.MCP_HEALTH_CHECK_INTERVAL_SECONDS,
+    interceptors={"fetch": fetch_cache.intercept},
+)
 
 
 async def initialize_mcp_client():
-    """Initialize the MCP client if not already initialized"""
-    global mcp_client
-    if mcp_client is None:
-        mcp_client = MultiServerMCPClient(
-            {
-                "fetch": {
-                    "command": "python",
-                    "args": ["-m", "mcp_server_fetch"],
-                    "transport": "stdio",
-                }
-            }
-        )
-        await mcp_client.__aenter__()
-    return mcp_client
+    """Start the MCP worker pool if not already started (safe to call concurrently)"""
+    await mcp_pool.start()
+    return mcp_pool
 
 
 async def get_tool_defs(config):
@@ -129,21 +146,181 @@ async def get_tools(config):
     return tools + frontend_tools + client.get_tools()
 
 
+class ToolBindingCache:
+    """
+    Bound chat models and ToolNodes keyed by a fingerprint of the tool set.
+
+    The backend tools are fixed, the frontend tools arrive with each chat
+    request and the MCP tools only change when the MCP client loads them, so a
+    fingerprint of the frontend and MCP tools identifies the converted schemas
+    and tool instances. Every step of a tool loop, and every chat with the same
+    frontend tools, reuses them instead of converting schemas and constructing
+    tools again. A changed MCP tool list produces a new fingerprint; the old
+    entries age out of the LRU.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._mcp_fingerprint = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _digest(parts) -> str:
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def fingerprint(self, frontend_tools, mcp_tools) -> str:
+        frontend = [[tool.name, tool.description, tool.parameters] for tool in frontend_tools]
+        mcp_fingerprint = self._digest([[tool.name, tool.description, tool.args] for tool in mcp_tools])
+        if mcp_fingerprint != self._mcp_fingerprint:
+            if self._mcp_fingerprint is not None:
+                # MCP tools changed: bindings built for the old list can never be hit again
+                self.invalidations += 1
+                self._entries.clear()
+                print("MCP tool list changed, cleared cached tool bindings")
+            self._mcp_fingerprint = mcp_fingerprint
+        return self._digest([frontend, mcp_fingerprint])
+
+    def get(self, key: str, kind: str):
+        """Return the cached `kind` ("model" or "tool_node") for a fingerprint, or None"""
+        entry = self._entries.get(key)
+        if entry is not None and kind in entry:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[kind]
+        self.misses += 1
+        return None
+
+    def put(self, key: str, kind: str, value):
+        self._entries.setdefault(key, {})[kind] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self._mcp_fingerprint = None
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "mcp_invalidations": self.invalidations,
+        }
+
+
+tool_binding_cache = ToolBindingCache(max_entries=settings.AGENT_TOOL_CACHE_MAX_ENTRIES)
+
+
+async def _tool_set_key(config) -> str:
+    client = await initialize_mcp_client()
+    mcp_tools = client.get_tools() if client else []
+    return tool_binding_cache.fingerprint(config["configurable"]["frontend_tools"], mcp_tools)
+
+
+async def get_bound_model(config):
+    """Chat model bound to the current tool set, cached by tool set fingerprint"""
+    if not settings.AGENT_TOOL_CACHE_ENABLED:
+        record_construction("BoundChatModel")
+        return model.bind_tools(await get_tool_defs(config))
+
+    key = await _tool_set_key(config)
+    bound_model = tool_binding_cache.get(key, "model")
+    if bound_model is None:
+        record_construction("BoundChatModel")
+        bound_model = model.bind_tools(await get_tool_defs(config))
+        tool_binding_cache.put(key, "model", bound_model)
+    return bound_model
+
+
+async def get_tool_node(config) -> ToolNode:
+    """ToolNode over the current tool set, cached by tool set fingerprint"""
+    if not settings.AGENT_TOOL_CACHE_ENABLED:
+        record_construction("ToolNode")
+        return ToolNode(await get_tools(config))
+
+    key = await _tool_set_key(config)
+    tool_node = tool_binding_cache.get(key, "tool_node")
+    if tool_node is None:
+        record_construction("ToolNode")
+        tool_node = ToolNode(await get_tools(config))
+        tool_binding_cache.put(key, "tool_node", tool_node)
+    return tool_node
+
+
 async def call_model(state, config):
     system = config["configurable"]["system"]
 
     messages = [SystemMessage(content=system)] + state["messages"]
-    tool_defs = await get_tool_defs(config)
-    model_with_tools = model.bind_tools(tool_defs)
+    # Fit the conversation into the prompt token budget (older turns truncated or summarized)
+    messages = await context_manager.prepare(messages, chat_id=_session_id(config))
+    model_with_tools = await get_bound_model(config)
     response = await model_with_tools.ainvoke(messages)
     # We return a list, because this will get added to the existing list
     return {"messages": [response]}
 
 
+async def run_retrieval_calls(tool_calls, config) -> List[ToolMessage]:
+    """
+    Run retrieval tool calls together: every query is embedded in one request
+    (through the query embedding cache) and the searches run concurrently, so
+    the step takes as long as the slowest search instead of their sum.
+    """
+    messages = {}
+    valid_calls = []
+    for call in tool_calls:
+        query = call["args"].get("query")
+        if not query or not isinstance(query, str):
+            content = f"Error: Invalid query parameter. Received: {type(query)}: {query}"
+            messages[call["id"]] = ToolMessage(content=content, name=call["name"], tool_call_id=call["id"])
+        else:
+            valid_calls.append(call)
+
+    if valid_calls:
+        query_embeddings = config["configurable"]["services"].query_embeddings
+        try:
+            embeddings = await query_embeddings.aembed_queries([call["args"]["query"] for call in valid_calls])
+            outputs = await asyncio.gather(*(
+                retrieval_searches[call["name"]](embedding, config)
+                for call, embedding in zip(valid_calls, embeddings)
+            ))
+        except Exception as e:
+            print(f"Error embedding retrieval queries: {str(e)}")
+            outputs = [f"Error retrieving context: {str(e)}"] * len(valid_calls)
+        for call, output in zip(valid_calls, outputs):
+            messages[call["id"]] = ToolMessage(
+                content=msg_content_output(output), name=call["name"], tool_call_id=call["id"]
+            )
+
+    return [messages[call["id"]] for call in tool_calls]
+
+
 async def run_tools(state, config, **kwargs):
     """Process tool calls from the model's response"""
-    tool_node = ToolNode(await get_tools(config))
-    return await tool_node.ainvoke(state, config, **kwargs)
+    tool_calls = state["messages"][-1].tool_calls
+    retrieval_calls = [call for call in tool_calls if call["name"] in retrieval_searches]
+    if not settings.FUSED_RETRIEVAL_ENABLED or not retrieval_calls:
+        tool_node = await get_tool_node(config)
+        return await tool_node.ainvoke(state, config, **kwargs)
+
+    # Retrieval calls run fused; any other tools (MCP, frontend) run through ToolNode alongside them
+    other_calls = [call for call in tool_calls if call["name"] not in retrieval_searches]
+    steps = [run_retrieval_calls(retrieval_calls, config)]
+    if other_calls:
+        tool_node = await get_tool_node(config)
+        steps.append(tool_node.ainvoke({"messages": [AIMessage(content="", tool_calls=other_calls)]}, config, **kwargs))
+    results = await asyncio.gather(*steps)
+
+    by_id = {message.tool_call_id: message for message in results[0]}
+    if other_calls:
+        by_id.update({message.tool_call_id: message for message in results[1]["messages"]})
+    # Answer the calls in the order the model made them
+    return {"messages": [by_id[call["id"]] for call in tool_calls]}
 
 
 # Define a new graph
@@ -163,7 +340,6 @@ assistant_ui_graph = workflow.compile()
 
 # Make sure to add proper cleanup for MCP client when your application shuts down
 async def cleanup():
-    global mcp_client
-    if mcp_client is not None:
-        await mcp_client.__aexit__(None, None, None)
-        mcp_client = None
\ No newline at end of file
+    await mcp_pool.close()
+    await fetch_cache.close()
+    tool_binding_cache.clear()
\ No newline at end of file
@@ -0,0 +1,298 @@
+"""
+Prompt token budget for the agent.
+
+The chat route receives the whole conversation from the client on every turn,
+so each request would re-send every earlier turn, including the retrieved
+chunks of old tool results, and get slower and more expensive as a chat goes
+on. Before each model call the history is fitted into CHAT_CONTEXT_MAX_TOKENS:
+
+1. Leading system messages (the route's prompt and the client's) are merged.
+2. The last CHAT_CONTEXT_RECENT_TURNS turns (a turn starts at a user message)
+   are kept verbatim.
+3. Tool results in older turns are truncated to CHAT_CONTEXT_STALE_TOOL_RESULT_TOKENS.
+4. If that is still over budget, older turns are replaced by a summary in the
+   system message. Summaries are cached per chat and only extended with the
+   turns that went stale since, so a request summarizes a turn or two at most.
+5. As a last resort, tool results of the recent turns are truncated and the
+   oldest recent turns dropped; the current turn is always sent.
+
+Only the model input is budgeted; the graph state keeps the full history.
+"""
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_openai import ChatOpenAI
+from langgraph.constants import TAG_NOSTREAM
+
+from ..config.settings import settings
+from ..utils.construction_stats import record_construction
+from ..utils.logger import logger
+from ..utils.token_chunker import get_tokenizer
+
+# Per-message overhead of the chat format (role, separators)
+_MESSAGE_OVERHEAD_TOKENS = 4
+# Longest user or assistant message passed to the summarizer, in characters
+_SUMMARY_INPUT_CHARS = 8000
+
+SUMMARY_PROMPT = """You keep a running summary of a conversation between a professor and an AI teaching assistant \
+that analyzes the professor's course evaluations. Update the current summary with the new messages. Keep the \
+professor's questions and goals, the findings about their evaluations (themes, strengths, weaknesses, figures), \
+and the recommendations already given with their sources. Leave out greetings and repetition. Write at most \
+{words} words."""
+
+
+def message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(part.get("text") or "")
+    return "\n".join(parts)
+
+
+def _digest(message: BaseMessage) -> str:
+    payload = [
+        message.type,
+        message_text(message),
+        [[call.get("name"), call.get("args")] for call in getattr(message, "tool_calls", None) or []],
+        getattr(message, "tool_call_id", None),
+    ]
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _prefix_digest(digests: Sequence[str]) -> str:
+    return hashlib.sha1("".join(digests).encode("ascii")).hexdigest()
+
+
+def _turns(history: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Split the history at user messages, so no turn separates a tool call from its result"""
+    turns: List[List[BaseMessage]] = []
+    for message in history:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+class _Summary:
+    def __init__(self, count: int, digest: str, text: str):
+        self.count = count  # number of stale messages the summary covers
+        self.digest = digest  # prefix digest of those messages
+        self.text = text
+
+
+class ConversationContextManager:
+    """Fits the agent's input messages into the prompt token budget (see module docstring)"""
+
+    def __init__(self, max_tokens: int = 16000, recent_turns: int = 2, stale_tool_result_tokens: int = 200,
+                 summary_model: str = "gpt-4o-mini", summary_tokens: int = 600, max_chats: int = 1024,
+                 enabled: bool = True):
+        self.max_tokens = max_tokens
+        self.recent_turns = max(1, recent_turns)
+        self.stale_tool_result_tokens = stale_tool_result_tokens
+        self.summary_model = summary_model
+        self.summary_tokens = summary_tokens
+        self.max_chats = max_chats
+        self.enabled = enabled
+        self._summaries: "OrderedDict[str, _Summary]" = OrderedDict()
+        self._summarizer: Optional[ChatOpenAI] = None
+        self._tokenizer = None
+        self.requests = 0
+        self.over_budget = 0
+        self.tool_results_truncated = 0
+        self.summaries_created = 0
+        self.summary_cache_hits = 0
+        self.turns_dropped = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+
+    def load_tokenizer(self):
+        """
+        Load the token counter. Loading the tiktoken encoding may download it,
+        so this runs at startup on a thread rather than on the event loop.
+        """
+        if self._tokenizer is None:
+            # gpt-4o family encoding
+            self._tokenizer = get_tokenizer(settings.CHUNK_TOKENIZER, "o200k_base")
+
+    def _count_text(self, text: str) -> int:
+        if self._tokenizer is None:
+            self.load_tokenizer()
+        return self._tokenizer.count(text)
+
+    def count(self, messages: Sequence[BaseMessage]) -> int:
+        total = 0
+        for message in messages:
+            total += _MESSAGE_OVERHEAD_TOKENS + self._count_text(message_text(message))
+            tool_calls = getattr(message, "tool_calls", None)
+            if tool_calls:
+                total += self._count_text(json.dumps(tool_calls, default=str))
+        return total
+
+    def _truncate_tool_results(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        limit = self.stale_tool_result_tokens
+        result = []
+        for message in messages:
+            if isinstance(message, ToolMessage):
+                text = message_text(message)
+                tokens = self._count_text(text)
+                if tokens > limit:
+                    self.tool_results_truncated += 1
+                    # ~4 characters per token
+                    message = message.model_copy(update={"content": (
+                        f"{text[:limit * 4]}\n[Earlier tool result truncated, about {tokens - limit} tokens "
+                        f"omitted. Call the tool again if these details are needed.]"
+                    )})
+            result.append(message)
+        return result
+
+    async def prepare(self, messages: Sequence[BaseMessage], chat_id: Optional[str] = None) -> List[BaseMessage]:
+        """Return the messages to send to the model for this step"""
+        if not self.enabled:
+            return list(messages)
+        if self._tokenizer is None:
+            # Not loaded at startup (e.g. the graph runs outside the app)
+            await asyncio.to_thread(self.load_tokenizer)
+        self.requests += 1
+
+        system_texts = []
+        start = 0
+        while start < len(messages) and isinstance(messages[start], SystemMessage):
+            text = message_text(messages[start]).strip()
+            if text:
+                system_texts.append(text)
+            start += 1
+        history = list(messages[start:])
+        system = "\n\n".join(system_texts)
+
+        turns = _turns(history)
+        recent = [message for turn in turns[-self.recent_turns:] for message in turn]
+        stale = [message for turn in turns[:-self.recent_turns] for message in turn]
+        stale_view = self._truncate_tool_results(stale)
+
+        budget = self.max_tokens - self._count_text(system) - _MESSAGE_OVERHEAD_TOKENS
+        recent_tokens = self.count(recent)
+        self.tokens_in += self._count_text(system) + self.count(stale) + recent_tokens
+
+        summary = None
+        if stale and self.count(stale_view) + recent_tokens > budget:
+            self.over_budget += 1
+            summary, stale_view = await self._summarized(chat_id or _digest(history[0]), stale, stale_view,
+                                                         budget - recent_tokens)
+        if summary:
+            system = "\n\n".join(filter(None, [system, f"## Summary of the earlier conversation\n{summary}"]))
+            budget = self.max_tokens - self._count_text(system) - _MESSAGE_OVERHEAD_TOKENS
+
+        fitted = stale_view + self._fit_recent(turns[-self.recent_turns:], budget - self.count(stale_view))
+        output = ([SystemMessage(content=system)] if system else []) + fitted
+        self.tokens_out += self.count(output)
+        return output
+
+    async def _summarized(self, chat_key: str, stale: List[BaseMessage], stale_view: List[BaseMessage],
+                          budget: int) -> Tuple[Optional[str], List[BaseMessage]]:
+        """
+        Return (summary, stale messages still sent verbatim). A cached summary of
+        an earlier prefix is reused as long as the turns after it fit the budget.
+        """
+        digests = [_digest(message) for message in stale]
+        cached = self._summaries.get(chat_key)
+        covered, summary = 0, None
+        if cached is not None and cached.count <= len(stale) and \
+                _prefix_digest(digests[:cached.count]) == cached.digest:
+            self._summaries.move_to_end(chat_key)
+            self.summary_cache_hits += 1
+            covered, summary = cached.count, cached.text
+            remainder = stale_view[covered:]
+            if self._count_text(summary) + self.count(remainder) <= budget:
+                return summary, remainder
+
+        try:
+            summary = await self._summarize(summary, stale_view[covered:])
+        except Exception as e:
+            # Without a summary the older turns are dropped rather than sent over budget
+            logger.warning(f"Conversation summary failed, dropping {len(stale)} earlier messages: {e}")
+            self.turns_dropped += len(_turns(stale[covered:]))
+            return summary, []
+
+        self.summaries_created += 1
+        self._summaries[chat_key] = _Summary(len(stale), _prefix_digest(digests), summary)
+        self._summaries.move_to_end(chat_key)
+        while len(self._summaries) > self.max_chats:
+            self._summaries.popitem(last=False)
+        return summary, []
+
+    async def _summarize(self, previous: Optional[str], messages: List[BaseMessage]) -> str:
+        if self._summarizer is None:
+            self._summarizer = ChatOpenAI(model=self.summary_model, temperature=0, max_tokens=self.summary_tokens)
+            record_construction("ChatOpenAI")
+
+        lines = []
+        for message in messages:
+            text = message_text(message)[:_SUMMARY_INPUT_CHARS]
+            if isinstance(message, HumanMessage):
+                lines.append(f"Professor: {text}")
+            elif isinstance(message, AIMessage):
+                calls = ", ".join(f"{call['name']}({json.dumps(call['args'], default=str)})"
+                                  for call in message.tool_calls)
+                lines.append(f"Assistant: {text}" + (f" [called {calls}]" if calls else ""))
+            elif isinstance(message, ToolMessage):
+                lines.append(f"Tool result: {text}")
+
+        response = await self._summarizer.ainvoke(
+            [
+                SystemMessage(content=SUMMARY_PROMPT.format(words=int(self.summary_tokens * 0.75))),
+                HumanMessage(content=f"Current summary:\n{previous or '(none)'}\n\nNew messages:\n" + "\n".join(lines)),
+            ],
+            # Runs inside the agent node: keep the summary out of the chat's token stream
+            config={"tags": [TAG_NOSTREAM]},
+        )
+        return message_text(response).strip()
+
+    def _fit_recent(self, turns: List[List[BaseMessage]], budget: int) -> List[BaseMessage]:
+        messages = [message for turn in turns for message in turn]
+        if self.count(messages) <= budget or not turns:
+            return messages
+
+        # Truncate tool results of the earlier recent turns, then drop those turns oldest first
+        turns = [self._truncate_tool_results(turn) for turn in turns[:-1]] + [turns[-1]]
+        while len(turns) > 1 and self.count([message for turn in turns for message in turn]) > budget:
+            turns.pop(0)
+            self.turns_dropped += 1
+        messages = [message for turn in turns for message in turn]
+        if self.count(messages) > budget:
+            logger.warning(f"Current turn alone is {self.count(messages)} tokens, over the {budget} token budget")
+        return messages
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_tokens": self.max_tokens,
+            "requests": self.requests,
+            "over_budget": self.over_budget,
+            "tool_results_truncated": self.tool_results_truncated,
+            "summaries_created": self.summaries_created,
+            "summary_cache_hits": self.summary_cache_hits,
+            "cached_summaries": len(self._summaries),
+            "turns_dropped": self.turns_dropped,
+            "avg_tokens_in": round(self.tokens_in / self.requests) if self.requests else 0,
+            "avg_tokens_out": round(self.tokens_out / self.requests) if self.requests else 0,
+        }
+
+
+context_manager = ConversationContextManager(
+    max_tokens=settings.CHAT_CONTEXT_MAX_TOKENS,
+    recent_turns=settings.CHAT_CONTEXT_RECENT_TURNS,
+    stale_tool_result_tokens=settings.CHAT_CONTEXT_STALE_TOOL_RESULT_TOKENS,
+    summary_model=settings.CHAT_CONTEXT_SUMMARY_MODEL,
+    summary_tokens=settings.CHAT_CONTEXT_SUMMARY_TOKENS,
+    max_chats=settings.CHAT_CONTEXT_SUMMARY_CACHE_MAX_CHATS,
+    enabled=settings.CHAT_CONTEXT_ENABLED,
+)
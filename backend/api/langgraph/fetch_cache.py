@@ -0,0 +1,369 @@
+"""
+HTTP cache for the `fetch` MCP tool.
+
+The fetch server downloads a page and converts it to markdown on every call,
+so a URL pasted again in a later turn (or paged through with `start_index`)
+is downloaded and converted again. The cache keeps the full extracted text
+per URL and serves any slice of it, formatted exactly like the server does,
+following the HTTP caching headers of the page:
+
+    fresh (max-age / s-maxage, Expires, or heuristic)   served from memory
+    stale with an ETag or Last-Modified                 revalidated with a conditional GET; a 304
+                                                        keeps the text, anything else refetches
+    no-store / private, or no freshness and no validator   not stored
+
+The server does not return response headers, so they are read in-process
+from a GET of the same URL: the conditional GET of a stale page, or on a
+miss a GET sent alongside the tool call, so it adds no round trip to the
+call. Only the headers are read; the body is left to the tool. These
+requests refuse non-public hosts, like the fetch server does.
+"""
+import asyncio
+import ipaddress
+import re
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+
+from ..utils.logger import logger
+
+# Same User-Agent as the fetch server's autonomous requests, so origins answer both alike
+USER_AGENT = "ModelContextProtocol/1.0 (Autonomous; +https://github.com/modelcontextprotocol/servers)"
+
+# Largest max_length the fetch tool accepts, used to get the full page in one call
+_FULL_LENGTH = 999999
+_DEFAULT_MAX_LENGTH = 5000
+_NO_MORE_CONTENT = "<error>No more content available.</error>"
+_TRUNCATED = "\n\n<error>Content truncated. Call the fetch tool with a start_index of "
+_OUTPUT = re.compile(
+    r"(?P<prefix>(?:Content type [^\n]* cannot be simplified to markdown, but here is the raw content:\n)?)"
+    r"Contents of (?P<url>[^\n]*?):\n(?P<content>.*)",
+    re.DOTALL,
+)
+
+ToolCall = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class _Page:
+    """Full extracted text of one URL plus its HTTP validators"""
+
+    def __init__(self, url: str, prefix: str, content: str):
+        self.url = url
+        self.prefix = prefix
+        self.content = content
+        self.size = len(prefix.encode("utf-8")) + len(content.encode("utf-8"))
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.expires_at = 0.0
+
+    @property
+    def has_validators(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def render(self, start_index: int, max_length: int) -> str:
+        """The fetch server's output for this page and slice"""
+        if start_index >= len(self.content):
+            body = _NO_MORE_CONTENT
+        else:
+            body = self.content[start_index:start_index + max_length]
+            remaining = len(self.content) - (start_index + len(body))
+            if len(body) == max_length and remaining > 0:
+                body += f"{_TRUNCATED}{start_index + len(body)} to get more content.</error>"
+        return f"{self.prefix}Contents of {self.url}:\n{body}"
+
+
+def _parse_output(result: Any) -> Optional[_Page]:
+    """Parse a full-length fetch result, or None if it is not a complete page"""
+    content = result[0] if isinstance(result, tuple) else result
+    if not isinstance(content, str):
+        return None
+    match = _OUTPUT.fullmatch(content)
+    if match is None or _TRUNCATED in match["content"][-200:]:
+        return None
+    text = match["content"]
+    # The server's answer for an empty page; store it empty so every slice gets the same answer
+    return _Page(match["url"], match["prefix"], "" if text == _NO_MORE_CONTENT else text)
+
+
+def _cache_control(headers: httpx.Headers) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in headers.get("cache-control", "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip().strip('"') or None
+    return directives
+
+
+def _http_date(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def _seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def freshness_lifetime(headers: Optional[httpx.Headers], default_ttl: float, max_ttl: float) -> Optional[float]:
+    """
+    Seconds a response stays fresh in a shared cache (RFC 9111), or None if it
+    must not be stored. Without explicit freshness, 10% of the time since
+    Last-Modified is used (at most `default_ttl`), else `default_ttl`.
+    """
+    if headers is None:
+        return min(default_ttl, max_ttl)
+    directives = _cache_control(headers)
+    if "no-store" in directives or "private" in directives:
+        return None
+
+    date = _http_date(headers.get("date")) or time.time()
+    if "no-cache" in directives:
+        lifetime = 0.0
+    elif _seconds(directives.get("s-maxage")) is not None:
+        lifetime = _seconds(directives["s-maxage"])
+    elif _seconds(directives.get("max-age")) is not None:
+        lifetime = _seconds(directives["max-age"])
+    elif "expires" in headers:
+        # An invalid Expires means already expired
+        expires = _http_date(headers["expires"])
+        lifetime = max(0.0, expires - date) if expires is not None else 0.0
+    elif _http_date(headers.get("last-modified")) is not None:
+        lifetime = min(default_ttl, max(0.0, date - _http_date(headers["last-modified"])) * 0.1)
+    else:
+        lifetime = default_ttl
+
+    age = _seconds(headers.get("age")) or 0.0
+    return min(max(0.0, lifetime - age), max_ttl)
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def _refuse_private_host(request: httpx.Request):
+    """httpx request hook (runs for every redirect hop): only contact public addresses"""
+    host = request.url.host
+    infos = await asyncio.get_running_loop().getaddrinfo(host, None)
+    for info in infos:
+        address = info[4][0]
+        if not _is_public_address(address):
+            raise httpx.RequestError(f"Refused to contact {host}: resolves to non-public address {address}",
+                                     request=request)
+
+
+class FetchCache:
+    """
+    LRU cache of fetch tool pages bounded by entry count and total text size.
+
+    `intercept(arguments, call)` stands in for a fetch tool call: it answers
+    from the cache or calls `call` (the pool's dispatch) for the full page.
+    Concurrent calls for the same uncached URL share one fetch.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024, default_ttl: float = 300,
+                 max_ttl: float = 86400, enabled: bool = True, allow_private_hosts: bool = False,
+                 request_timeout: float = 10, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self.enabled = enabled
+        self.allow_private_hosts = allow_private_hosts
+        self.request_timeout = request_timeout
+        self._clock = clock
+        self._entries: "OrderedDict[Tuple[str, bool], _Page]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, bool], asyncio.Future] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        self.size_bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.uncacheable = 0
+        self.evictions = 0
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                timeout=self.request_timeout,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT},
+                event_hooks={} if self.allow_private_hosts else {"request": [_refuse_private_host]},
+            )
+        return self._http
+
+    async def intercept(self, arguments: Dict[str, Any], call: ToolCall):
+        """Answer a fetch tool call, returning the same (content, artifact) pair as the tool"""
+        url = arguments.get("url")
+        raw = arguments.get("raw", False)
+        start_index = arguments.get("start_index", 0)
+        max_length = arguments.get("max_length", _DEFAULT_MAX_LENGTH)
+        if not (
+            self.enabled and isinstance(url, str) and isinstance(raw, bool)
+            and isinstance(start_index, int) and start_index >= 0
+            and isinstance(max_length, int) and 0 < max_length <= _FULL_LENGTH
+        ):
+            # Disabled, or arguments the server rejects: let it report them
+            return await call(arguments)
+
+        page = await self._page((url.strip(), raw), call)
+        if page is None:
+            return await call(arguments)
+        return page.render(start_index, max_length), None
+
+    async def _page(self, key: Tuple[str, bool], call: ToolCall) -> Optional[_Page]:
+        page = self._entries.get(key)
+        if page is not None and self._clock() < page.expires_at:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return page
+
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            page = await self._load(key, call)
+            future.set_result(page)
+            return page
+        except BaseException as e:
+            # Errors are not cached; callers waiting on this fetch see the same error
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _load(self, key: Tuple[str, bool], call: ToolCall) -> Optional[_Page]:
+        url, raw = key
+        headers: Optional[asyncio.Future] = None
+        page = self._entries.get(key)
+        if page is not None:
+            if page.has_validators:
+                status, response_headers = await self._get_headers(page.url, page)
+                if status == 304:
+                    self._refresh(page, response_headers)
+                    self._entries.move_to_end(key)
+                    self.revalidated += 1
+                    return page
+                if status is not None and status < 400:
+                    # Changed: the conditional GET already returned the new page's headers
+                    headers = asyncio.get_running_loop().create_future()
+                    headers.set_result(response_headers)
+            self._remove(key)
+
+        self.misses += 1
+        if headers is None:
+            headers = asyncio.ensure_future(self._headers(url))
+        try:
+            output = await call({"url": url, "raw": raw, "start_index": 0, "max_length": _FULL_LENGTH})
+        except BaseException:
+            headers.cancel()
+            raise
+        page = _parse_output(output)
+        if page is None:
+            # Longer than one call can return, or output this cache does not understand
+            headers.cancel()
+            self.uncacheable += 1
+            return None
+        self._store(key, page, await headers)
+        return page
+
+    async def _get_headers(self, url: str, page: Optional[_Page] = None) -> Tuple[Optional[int], Optional[httpx.Headers]]:
+        """
+        (status, headers) of a GET of `url`, conditional on the validators of
+        `page` if given, or (None, None) if the request failed. The response is
+        streamed and closed after the headers, so the body is not downloaded.
+        """
+        request_headers = {}
+        if page is not None and page.etag:
+            request_headers["If-None-Match"] = page.etag
+        if page is not None and page.last_modified:
+            request_headers["If-Modified-Since"] = page.last_modified
+        try:
+            async with self._client().stream("GET", url, headers=request_headers) as response:
+                return response.status_code, response.headers
+        except Exception as e:
+            logger.debug(f"Fetch cache could not read headers of {url}: {e}")
+            return None, None
+
+    async def _headers(self, url: str) -> Optional[httpx.Headers]:
+        """Caching headers of the page, or None if they could not be read"""
+        status, headers = await self._get_headers(url)
+        return headers if status is not None and status < 400 else None
+
+    def _refresh(self, page: _Page, response_headers: httpx.Headers):
+        """Apply a 304 Not Modified to a stale page, which answers this call"""
+        lifetime = freshness_lifetime(response_headers, self.default_ttl, self.max_ttl)
+        if lifetime is None:
+            # Now no-store: let the entry go at the next lookup
+            page.etag = page.last_modified = None
+            page.expires_at = 0.0
+            return
+        # A 304 may update the validators
+        page.etag = response_headers.get("etag", page.etag)
+        page.last_modified = response_headers.get("last-modified", page.last_modified)
+        page.expires_at = self._clock() + lifetime
+
+    def _store(self, key: Tuple[str, bool], page: _Page, headers: Optional[httpx.Headers]):
+        lifetime = freshness_lifetime(headers, self.default_ttl, self.max_ttl)
+        if headers is not None:
+            page.etag = headers.get("etag")
+            page.last_modified = headers.get("last-modified")
+        if lifetime is None or (lifetime <= 0 and not page.has_validators) or page.size > self.max_bytes:
+            self.uncacheable += 1
+            return
+
+        page.expires_at = self._clock() + lifetime
+        self._entries[key] = page
+        self.size_bytes += page.size
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size_bytes -= evicted.size
+            self.evictions += 1
+
+    def _remove(self, key: Tuple[str, bool]):
+        page = self._entries.pop(key, None)
+        if page is not None:
+            self.size_bytes -= page.size
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+    async def close(self):
+        self.clear()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def stats(self) -> Dict[str, Any]:
+        served = self.hits + self.revalidated
+        lookups = served + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "size_mb": round(self.size_bytes / (1024 * 1024), 2),
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "uncacheable": self.uncacheable,
+            "evictions": self.evictions,
+            "hit_rate": round(served / lookups, 3) if lookups else 0.0,
+        }
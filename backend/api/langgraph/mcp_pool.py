@@ -0,0 +1,264 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from langchain_mcp_adapters.client import MultiServerMCPClient
+
+from ..utils.logger import logger
+
+
+class _MCPWorker:
+    """
+    One MCP server subprocess and its client session.
+
+    The stdio client lives in a task group that has to be exited by the task
+    that entered it, so each worker owns a task that holds the connection open
+    until the worker is stopped or the connection fails.
+    """
+
+    def __init__(self, index: int, connection: Dict[str, Any]):
+        self.index = index
+        self.connection = connection
+        self.tools: Dict[str, BaseTool] = {}
+        self.in_flight = 0
+        self.calls = 0
+        self.failures = 0
+        self.restarts = 0
+        self.started_at: Optional[float] = None
+        self._client: Optional[MultiServerMCPClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error: Optional[BaseException] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._client is not None and self._task is not None and not self._task.done()
+
+    async def _hold_connection(self):
+        try:
+            async with MultiServerMCPClient({"server": self.connection}) as client:
+                self._client = client
+                self.tools = {tool.name: tool for tool in client.get_tools()}
+                self.started_at = time.monotonic()
+                self._ready.set()
+                await self._stop.wait()
+        except BaseException as e:
+            self._error = e
+            if not self._stop.is_set():
+                logger.warning(f"MCP worker {self.index} exited: {e!r}")
+        finally:
+            self._client = None
+            self._ready.set()
+
+    async def start(self, timeout: float):
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._hold_connection(), name=f"mcp-worker-{self.index}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise TimeoutError(f"MCP worker {self.index} did not start within {timeout}s")
+        if not self.alive:
+            raise RuntimeError(f"MCP worker {self.index} failed to start: {self._error!r}")
+
+    async def stop(self):
+        task = self._task
+        if task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), 5)
+        except BaseException:
+            # Stuck in a call: cancelling the task tears down the subprocess
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        self._client = None
+        self._task = None
+
+    async def ping(self, timeout: float) -> bool:
+        client = self._client
+        if client is None:
+            return False
+        try:
+            session = next(iter(client.sessions.values()))
+            await asyncio.wait_for(session.send_ping(), timeout)
+            return True
+        except Exception:
+            return False
+
+    async def call(self, name: str, arguments: Dict[str, Any]):
+        # The adapter tool returns (content, artifact) for response_format="content_and_artifact"
+        return await self.tools[name].coroutine(**arguments)
+
+
+class MCPWorkerPool:
+    """
+    Supervised pool of identical MCP server subprocesses (the fetch server).
+
+    An MCP server handles its requests one at a time, so a single subprocess
+    makes every user's call wait behind the slowest fetch. The pool dispatches
+    each call to the least busy live worker, times calls out, and restarts
+    workers that crash, fail a health check ping or time out (a timed out
+    worker is still busy with the abandoned request).
+
+    `get_tools()` returns proxy tools with the same schemas as the server's
+    tools, so the agent binds them once and they keep working across restarts.
+    `interceptors` maps a tool name to `async fn(arguments, call)` that runs in
+    place of the call (e.g. a response cache) and can forward it with `call(arguments)`.
+    """
+
+    def __init__(self, connection: Dict[str, Any], size: int = 2, call_timeout: float = 30,
+                 health_check_interval: float = 30, start_timeout: float = 30,
+                 interceptors: Optional[Dict[str, Callable[..., Awaitable[Any]]]] = None):
+        self.connection = connection
+        self.interceptors = interceptors or {}
+        self.size = max(1, size)
+        self.call_timeout = call_timeout
+        self.health_check_interval = health_check_interval
+        self.start_timeout = start_timeout
+        self.workers = [_MCPWorker(i, connection) for i in range(self.size)]
+        self.timeouts = 0
+        self._tools: List[BaseTool] = []
+        self._start_lock = asyncio.Lock()
+        self._started = False
+        self._supervisor: Optional[asyncio.Task] = None
+        self._restarting: Dict[int, asyncio.Task] = {}
+
+    async def start(self):
+        """Start the workers once; concurrent callers wait for the same start"""
+        if self._started:
+            return
+        async with self._start_lock:
+            if self._started:
+                return
+            results = await asyncio.gather(
+                *(worker.start(self.start_timeout) for worker in self.workers), return_exceptions=True
+            )
+            for worker, result in zip(self.workers, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"MCP worker {worker.index} failed to start: {result}")
+            live = [worker for worker in self.workers if worker.alive]
+            if live:
+                self._tools = self._proxy_tools(live[0])
+            logger.info(f"Started {len(live)}/{self.size} MCP workers with tools {[t.name for t in self._tools]}")
+            self._supervisor = asyncio.create_task(self._supervise(), name="mcp-supervisor")
+            self._started = True
+
+    def get_tools(self) -> List[BaseTool]:
+        return list(self._tools)
+
+    def _proxy_tools(self, worker: _MCPWorker) -> List[BaseTool]:
+        def make_proxy(tool: BaseTool) -> BaseTool:
+            async def call(arguments: Dict[str, Any]):
+                return await self.call(tool.name, arguments)
+
+            async def dispatch(**arguments):
+                interceptor = self.interceptors.get(tool.name)
+                if interceptor is not None:
+                    return await interceptor(arguments, call)
+                return await call(arguments)
+
+            return StructuredTool(
+                name=tool.name,
+                description=tool.description,
+                args_schema=tool.args_schema,
+                coroutine=dispatch,
+                response_format="content_and_artifact",
+            )
+
+        return [make_proxy(tool) for tool in worker.tools.values()]
+
+    def _pick_worker(self) -> Optional[_MCPWorker]:
+        live = [worker for worker in self.workers if worker.alive and worker.index not in self._restarting]
+        if not live:
+            return None
+        return min(live, key=lambda worker: (worker.in_flight, worker.calls))
+
+    async def call(self, name: str, arguments: Dict[str, Any]):
+        await self.start()
+        worker = self._pick_worker()
+        if worker is None:
+            raise ToolException(f"No MCP server is available to run {name}, try again shortly")
+
+        worker.in_flight += 1
+        worker.calls += 1
+        try:
+            return await asyncio.wait_for(worker.call(name, arguments), self.call_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            worker.failures += 1
+            self._schedule_restart(worker, "call timed out")
+            raise ToolException(f"{name} timed out after {self.call_timeout:.0f}s")
+        except ToolException:
+            # The server answered with a tool error (e.g. the page could not be fetched)
+            raise
+        except Exception as e:
+            # Anything other than a tool error is a transport failure (e.g. the subprocess died)
+            worker.failures += 1
+            self._schedule_restart(worker, f"call failed: {e!r}")
+            raise ToolException(f"{name} failed: {e}")
+        finally:
+            worker.in_flight -= 1
+
+    def _schedule_restart(self, worker: _MCPWorker, reason: str):
+        if worker.index in self._restarting:
+            return
+        logger.warning(f"Restarting MCP worker {worker.index}: {reason}")
+        task = asyncio.create_task(self._restart(worker))
+        self._restarting[worker.index] = task
+
+    async def _restart(self, worker: _MCPWorker):
+        try:
+            await worker.stop()
+            await worker.start(self.start_timeout)
+            worker.restarts += 1
+            if not self._tools:
+                self._tools = self._proxy_tools(worker)
+            logger.info(f"MCP worker {worker.index} restarted")
+        except Exception as e:
+            logger.error(f"MCP worker {worker.index} restart failed, retrying at the next health check: {e}")
+        finally:
+            self._restarting.pop(worker.index, None)
+
+    async def _supervise(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for worker in self.workers:
+                if worker.index in self._restarting:
+                    continue
+                if not worker.alive:
+                    self._schedule_restart(worker, "not running")
+                elif worker.in_flight == 0 and not await worker.ping(min(5, self.health_check_interval)):
+                    # Busy workers are not pinged: a long fetch would delay the pong
+                    self._schedule_restart(worker, "health check ping failed")
+
+    async def close(self):
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            await asyncio.gather(self._supervisor, return_exceptions=True)
+            self._supervisor = None
+        await asyncio.gather(*self._restarting.values(), return_exceptions=True)
+        await asyncio.gather(*(worker.stop() for worker in self.workers), return_exceptions=True)
+        self._started = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "live": sum(worker.alive for worker in self.workers),
+            "timeouts": self.timeouts,
+            "workers": [
+                {
+                    "index": worker.index,
+                    "alive": worker.alive,
+                    "in_flight": worker.in_flight,
+                    "calls": worker.calls,
+                    "failures": worker.failures,
+                    "restarts": worker.restarts,
+                }
+                for worker in self.workers
+            ],
+        }
@@ -1,13 +1,49 @@
 from langchain_core.tools import tool
 from datetime import datetime, timezone
+from ..services.chat_vector_cache import chat_vector_cache
 from ..database.mongodb import MongoDB
+from ..database.vector_index import asimilarity_search_by_vector, similarity_search
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
-from langchain_mongodb import MongoDBAtlasVectorSearch
-from langchain_openai import OpenAIEmbeddings
+import asyncio
 import traceback
 from langchain_core.runnables import RunnableConfig
 
+RETRIEVAL_K = 5
+
+
+def _session_id(config: RunnableConfig):
+    metadata = config.get("configurable", {}).get("metadata", {})
+    return metadata.get("langfuse_session_id")
+
+
+def _evaluation_contexts(results):
+    contexts = []
+    for doc, score in results:
+        print(f"* [SIM={score:.3f}] {doc.page_content[:200]}...")
+        contexts.append({
+            "content": doc.page_content,
+            "metadata": doc.metadata,
+            "similarity_score": score
+        })
+
+    print(f"Retrieved {len(contexts)} context items")
+    return {"contexts": contexts}
+
+
+def _teaching_materials(results):
+    materials = []
+    for doc, score in results:
+        print(f"* [SIM={score:.3f}] {doc.page_content[:200]}...")
+        materials.append({
+            "content": doc.page_content,
+            "metadata": doc.metadata,
+            "similarity_score": score,
+        })
+
+    print(f"Retrieved {len(materials)} teaching material items")
+    return {"materials": materials}
+
 
 @tool
 def get_evaluations_context(query: str, config: RunnableConfig):
@@ -15,91 +51,110 @@ def get_evaluations_context(query: str, config: RunnableConfig):
     try:
         print(f"get_evaluations_context received query: '{query}'")
 
-        metadata = config.get("configurable", {}).get("metadata", {})
-        session_id = metadata.get("langfuse_session_id")
-        
+        session_id = _session_id(config)
+        # Shared embeddings client and vector store handles, injected by the chat route
+        services = config["configurable"]["services"]
+
         if not query or not isinstance(query, str):
             return f"Error: Invalid query parameter. Received: {type(query)}: {query}"
-            
-        db = MongoDB.get_db()
-        vectors_collection = db.evaluations_vectors
-
-        # Initialize vector store with proper parameters
-        vector_store = MongoDBAtlasVectorSearch(
-            embedding=OpenAIEmbeddings(model="text-embedding-3-large"),
-            collection=vectors_collection,
-            index_name="evaluations_index",
-            relevance_score_fn="cosine",
-        )
-        
-        print(f"Executing vector search with query and session Id: '{query}' and '{session_id}")
-        
-        # Use pre_filter to filter by session_id (stored in source field)
-        results = vector_store.similarity_search_with_score(
-            query, 
-            k=5,
-            pre_filter={"source": {"$eq": session_id}}
-        )
-        
-        contexts = []
-        for doc, score in results:
-            print(f"* [SIM={score:.3f}] {doc.page_content[:200]}...")
-            contexts.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "similarity_score": score
-            })
-        
-        print(f"Retrieved {len(contexts)} context items")
-        
-        return {"contexts": contexts}
-        
+
+        if chat_vector_cache.enabled and session_id:
+            # A chat's vectors fit in memory, so search them exactly in-process
+            print(f"Executing cached vector search with query and session Id: '{query}' and '{session_id}")
+            results = chat_vector_cache.search(session_id, services.query_embeddings.embed_query(query), k=RETRIEVAL_K)
+        else:
+            print(f"Executing vector search with query and session Id: '{query}' and '{session_id}")
+
+            # Use pre_filter to filter by session_id (stored in source field)
+            results = similarity_search(
+                services.evaluations_store,
+                query,
+                k=RETRIEVAL_K,
+                pre_filter={"source": {"$eq": session_id}}
+            )
+
+        return _evaluation_contexts(results)
+
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"Error in get_evaluations_context: {str(e)}\n{error_details}")
         return f"Error retrieving context: {str(e)}"
-    
+
 @tool
-def get_teaching_material_context(query: str):
+def get_teaching_material_context(query: str, config: RunnableConfig):
     """Used to add extra information to help improve professors and their teaching habits, based on the information provided from the course evaluations"""
     try:
         print(f"get_teaching_material_context received query: '{query}'")
-        
+
         if not query or not isinstance(query, str):
             return f"Error: Invalid query parameter. Received: {type(query)}: {query}"
-        
-        db = MongoDB.get_db()
-        teaching_materials_collection = db.teaching_materials
-        
-        # Use vector search to find relevant teaching materials
-        vector_store = MongoDBAtlasVectorSearch(
-            embedding=OpenAIEmbeddings(model="text-embedding-3-large"),
-            collection=teaching_materials_collection,
-            index_name="teaching_materials_index",
-            relevance_score_fn="cosine",
-        )
-        
-        print(f"Executing teaching materials vector search with query: '{query}'")
-        results = vector_store.similarity_search_with_score(query, k=5)
-        
-        materials = []
-        for doc, score in results:
-            print(f"* [SIM={score:.3f}] {doc.page_content[:200]}...")
-            materials.append({
-                "content": doc.page_content,
-                "metadata": doc.metadata,
-                "similarity_score": score,
-            })
-        
-        print(f"Retrieved {len(materials)} teaching material items")
-        
-        return {
-            "materials": materials
-        }
-        
+
+        services = config["configurable"]["services"]
+        snapshot = services.teaching_materials_snapshot
+
+        if snapshot is not None:
+            # Local memory-mapped copy of the textbook corpus, no network hop besides the query embedding
+            print(f"Executing teaching materials snapshot search with query: '{query}'")
+            results = snapshot.search(services.query_embeddings.embed_query(query), k=RETRIEVAL_K)
+        else:
+            # Use vector search to find relevant teaching materials
+            print(f"Executing teaching materials vector search with query: '{query}'")
+            results = similarity_search(services.teaching_materials_store, query, k=RETRIEVAL_K)
+
+        return _teaching_materials(results)
+
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Error in get_teaching_material_context: {str(e)}\n{error_details}")
+        return f"Error retrieving teaching materials: {str(e)}"
+
+
+async def asearch_evaluations(query_embedding, config: RunnableConfig):
+    """get_evaluations_context for an already embedded query, searching without blocking the event loop"""
+    session_id = _session_id(config)
+    try:
+        if chat_vector_cache.enabled and session_id:
+            # A cold chat is loaded from MongoDB first, so keep it off the event loop
+            results = await asyncio.to_thread(chat_vector_cache.search, session_id, query_embedding, RETRIEVAL_K)
+        else:
+            results = await asimilarity_search_by_vector(
+                MongoDB.get_async_db().evaluations_vectors,
+                "evaluations_index",
+                query_embedding,
+                k=RETRIEVAL_K,
+                pre_filter={"source": {"$eq": session_id}}
+            )
+        return _evaluation_contexts(results)
+    except Exception as e:
+        error_details = traceback.format_exc()
+        print(f"Error in get_evaluations_context: {str(e)}\n{error_details}")
+        return f"Error retrieving context: {str(e)}"
+
+
+async def asearch_teaching_materials(query_embedding, config: RunnableConfig):
+    """get_teaching_material_context for an already embedded query, searching without blocking the event loop"""
+    snapshot = config["configurable"]["services"].teaching_materials_snapshot
+    try:
+        if snapshot is not None:
+            results = await asyncio.to_thread(snapshot.search, query_embedding, RETRIEVAL_K)
+        else:
+            results = await asimilarity_search_by_vector(
+                MongoDB.get_async_db().teaching_materials,
+                "teaching_materials_index",
+                query_embedding,
+                k=RETRIEVAL_K,
+            )
+        return _teaching_materials(results)
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"Error in get_teaching_material_context: {str(e)}\n{error_details}")
         return f"Error retrieving teaching materials: {str(e)}"
-    
-tools = [get_evaluations_context, get_teaching_material_context]
\ No newline at end of file
+
+
+# Async searches used by the agent to run these tools fused: one embedding request per turn, concurrent searches
+retrieval_searches = {
+    get_evaluations_context.name: asearch_evaluations,
+    get_teaching_material_context.name: asearch_teaching_materials,
+}
+
+tools = [get_evaluations_context, get_teaching_material_context]
@@ -11,11 +11,12 @@ from langchain_core.messages import (
 from fastapi import FastAPI, Header
 from pydantic import BaseModel
 from typing import List, Literal, Union, Optional, Any
-from ..utils.deps import get_current_user
+from ..utils.deps import get_current_user, get_services
+from ..services.container import ServiceContainer
+from ..services.answer_cache import AnswerRecorder, answer_cache
+from ..services.request_quota import refund_request, reserve_request
 from ..models.user import UserInDB
 from fastapi import Depends, HTTPException, status
-from ..database.mongodb import MongoDB
-from bson import ObjectId
 from langfuse.callback import CallbackHandler
 from langfuse.decorators import observe
 from langfuse import Langfuse
@@ -196,94 +197,141 @@ def add_langgraph_route(app: FastAPI, graph, path: str, current_user: UserInDB =
         
     """
    
-    async def chat_completions(request: ChatRequest, x_chat_id: Optional[str] = Header(None, alias="X-Chat-ID"), current_user: dict = Depends(get_current_user)):
-        inputs = convert_to_langchain_messages(request.messages)
-        # Check and update request count
-        db = MongoDB.get_db()
-        user = db.users.find_one({"_id": ObjectId(current_user.id)})
+    async def chat_completions(
+        request: ChatRequest,
+        x_chat_id: Optional[str] = Header(None, alias="X-Chat-ID"),
+        current_user: dict = Depends(get_current_user),
+        services: ServiceContainer = Depends(get_services)
+    ):
+        # Check and update request count in one atomic update (current_user was loaded by the dependency)
+        user = await reserve_request(current_user.id)
         
-        if user["requests_used"] >= user["requests_limit"]:
+        if user is None:
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail="Request limit exceeded"
             )
-            
-        # Increment request count
-        db.users.update_one(
-            {"_id": ObjectId(current_user.id)},
-            {"$inc": {"requests_used": 1}}
-        )
+        current_user = current_user.model_copy(update={"requests_used": user["requests_used"]})
         
-        inputs = convert_to_langchain_messages(request.messages)
-        system_msg = SystemMessage(content=SYSTEM_MESSAGE)
-        all_messages = [system_msg] + inputs
+        # Give the reserved request back if anything fails before the response starts streaming
+        try:
+            inputs = convert_to_langchain_messages(request.messages)
+            system_msg = SystemMessage(content=SYSTEM_MESSAGE)
+            all_messages = [system_msg] + inputs
 
-        print("inputs")
-        print(inputs)
+            print("inputs")
+            print(inputs)
 
-        accumulated_content = "" 
-        tool_calls = {} # Initialize an empty string to accumulate message content
+            accumulated_content = "" 
+            tool_calls = {} # Initialize an empty string to accumulate message content
         
-        # Only create trace if user has enabled logging
-        trace = None
-        if current_user.enable_logging:
-            trace = langfuse.trace(
-                user_id = current_user.email,
-                session_id = x_chat_id
-            )
-            trace.update(
-                input = inputs[-1].content[0]['text'],
-            )
+            # Only create trace if user has enabled logging
+            trace = None
+            if current_user.enable_logging:
+                trace = langfuse.trace(
+                    user_id = current_user.email,
+                    session_id = x_chat_id
+                )
+                trace.update(
+                    input = inputs[-1].content[0]['text'],
+                )
+
+            # Replay the recorded answer when this chat repeats a question over unchanged files
+            question = answer_cache.question(inputs) if answer_cache.enabled and x_chat_id else None
+            recorder = None
+            if question:
+                scope = await answer_cache.scope(x_chat_id, inputs, request.system, [tool.name for tool in request.tools or []])
+                events = await answer_cache.lookup(x_chat_id, scope, question, services.query_embeddings)
+                if events is not None:
+                    if trace is not None:
+                        trace.update(
+                            output = "".join(event["text"] for event in events if event["type"] == "text"),
+                            metadata = {"answer_cache": "hit"},
+                        )
+
+                    async def replay(controller: RunController):
+                        await answer_cache.replay(controller, events)
+
+                    return DataStreamResponse(create_run(replay))
+                recorder = AnswerRecorder()
+                version = answer_cache.version(x_chat_id)
+        except BaseException:
+            await refund_request(current_user.id)
+            raise
 
         async def run(controller: RunController):
             tool_calls = {}
             tool_calls_by_idx = {}
+            tool_call_ids_by_idx = {}
             nonlocal accumulated_content  # Use nonlocal to modify the outer variable
 
-            async for msg, metadata in graph.astream(
-                {"messages": all_messages},
-                config ={
-                    "configurable": {
-                        "system": request.system,
-                        "frontend_tools": request.tools,
-                        "metadata": {
-                            "langfuse_session_id": x_chat_id,
-                            "current_user": current_user.email,
-                            "current_id": current_user.id
-                        },
-                    }
-                },
-                stream_mode="messages"
-            ):
-                if isinstance(msg, ToolMessage):
-                    tool_controller = tool_calls.get(msg.tool_call_id)
-                    if tool_controller is None:
-                        # The MCP tool may send a ToolMessage before its call is registered.
-                        # Register a fallback tool call using "MCP" (or an appropriate tool name) as a default.
-                        tool_controller = await controller.add_tool_call("MCP", msg.tool_call_id)
-                        tool_calls[msg.tool_call_id] = tool_controller
+            # The quota is refunded if the run fails before the model produced anything
+            model_started = False
+            try:
+                async for msg, metadata in graph.astream(
+                    {"messages": all_messages},
+                    config ={
+                        "configurable": {
+                            "system": request.system,
+                            "frontend_tools": request.tools,
+                            "services": services,
+                            "metadata": {
+                                "langfuse_session_id": x_chat_id,
+                                "current_user": current_user.email,
+                                "current_id": current_user.id
+                            },
+                        }
+                    },
+                    stream_mode="messages"
+                ):
+                    model_started = True
+                    if isinstance(msg, ToolMessage):
+                        tool_controller = tool_calls.get(msg.tool_call_id)
+                        if tool_controller is None:
+                            # The MCP tool may send a ToolMessage before its call is registered.
+                            # Register a fallback tool call using "MCP" (or an appropriate tool name) as a default.
+                            tool_controller = await controller.add_tool_call("MCP", msg.tool_call_id)
+                            tool_calls[msg.tool_call_id] = tool_controller
+                            if recorder is not None:
+                                recorder.tool_call("MCP", msg.tool_call_id)
                     
-                    # Accumulate tool message content
-                    tool_controller.set_result(msg.content)
-
-                if isinstance(msg, AIMessageChunk) or isinstance(msg, AIMessage):
-                    if msg.content:
-                        # Accumulate AI message content
-                        accumulated_content += msg.content
-                        controller.append_text(msg.content)
-
-                    for chunk in msg.tool_call_chunks:
-                        if not chunk["index"] in tool_calls_by_idx:
-                            tool_controller = await controller.add_tool_call(
-                                chunk["name"], chunk["id"]
-                            )
-                            tool_calls_by_idx[chunk["index"]] = tool_controller
-                            tool_calls[chunk["id"]] = tool_controller
-                        else:
-                            tool_controller = tool_calls_by_idx[chunk["index"]]
-
-                        tool_controller.append_args_text(chunk["args"])
-            
+                        # Accumulate tool message content
+                        tool_controller.set_result(msg.content)
+                        if recorder is not None:
+                            recorder.tool_result(msg.tool_call_id, msg.content)
+
+                    if isinstance(msg, AIMessageChunk) or isinstance(msg, AIMessage):
+                        if msg.content:
+                            # Accumulate AI message content
+                            accumulated_content += msg.content
+                            controller.append_text(msg.content)
+                            if recorder is not None:
+                                recorder.text(msg.content)
+
+                        for chunk in msg.tool_call_chunks:
+                            if not chunk["index"] in tool_calls_by_idx:
+                                tool_controller = await controller.add_tool_call(
+                                    chunk["name"], chunk["id"]
+                                )
+                                tool_calls_by_idx[chunk["index"]] = tool_controller
+                                tool_calls[chunk["id"]] = tool_controller
+                                tool_call_ids_by_idx[chunk["index"]] = chunk["id"]
+                                if recorder is not None:
+                                    recorder.tool_call(chunk["name"], chunk["id"])
+                            else:
+                                tool_controller = tool_calls_by_idx[chunk["index"]]
+
+                            tool_controller.append_args_text(chunk["args"])
+                            if recorder is not None:
+                                recorder.tool_args(tool_call_ids_by_idx[chunk["index"]], chunk["args"])
+            except BaseException:
+                if not model_started:
+                    await refund_request(current_user.id)
+                raise
+
+            if recorder is not None:
+                answer_cache.store_later(x_chat_id, scope, question, recorder, version, services.query_embeddings)
+
             # After processing all message chunks, update the trace with the complete accumulated content
             if trace is not None:
                 trace.update(
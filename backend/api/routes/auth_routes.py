@@ -6,10 +6,10 @@ from datetime import datetime, timedelta
 from bson import ObjectId
 from ..utils.logger import logger
 from ..services.auth_service import AuthService
-from ..services.document_service import DocumentService
-from ..utils.deps import get_current_user
+from ..utils.deps import get_current_user, get_services
 from jose import jwt
-from ..services.file_service import FileService
+from ..services.container import ServiceContainer
+from ..services.user_cache import user_cache
 router = APIRouter()
 auth_service = AuthService()
 
@@ -138,14 +138,14 @@ async def logout():
     return {"message": "Successfully logged out"}
 
 @router.post("/set-chat-id")
-async def set_chat_id(current_user: UserInDB = Depends(get_current_user)):
+async def set_chat_id(current_user: UserInDB = Depends(get_current_user), services: ServiceContainer = Depends(get_services)):
     """
     Sets a new chat ID for the current user. Called when dashboard loads or refreshes.
     Also deletes any existing vectors associated with the old chat ID.
     """
     db = MongoDB.get_db()
-    document_service = DocumentService()
-    file_service = FileService()
+    document_service = services.document_service
+    file_service = services.file_service
     
     # Get the user's current chat_id
     user = db.users.find_one({"_id": ObjectId(current_user.id)})
@@ -170,5 +170,6 @@ async def set_chat_id(current_user: UserInDB = Depends(get_current_user)):
         {"_id": ObjectId(current_user.id)},
         {"$set": {"active_chat_id": new_chat_id}}
     )
+    user_cache.invalidate(current_user.id)
     
     return {"active_chat_id": new_chat_id} 
\ No newline at end of file
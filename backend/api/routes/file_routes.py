@@ -1,20 +1,29 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Depends, Request
 from fastapi.responses import StreamingResponse, JSONResponse
-from ..services.file_service import FileService
 from ..services.document_service import DocumentService
+from ..services.progress_notifier import progress_notifier
+from ..services.progress_store import progress_store
+from ..config.settings import settings
 import asyncio
 import json
+import time
 from ..utils.logger import logger
 from ..services.auth_service import AuthService
 from ..models.user import UserInDB
-from ..utils.deps import get_current_user
+from ..utils.deps import get_current_user, get_services
+from ..services.container import ServiceContainer
 
 router = APIRouter()
+
+# Milliseconds the browser waits before reopening a dropped progress stream
+PROGRESS_STREAM_RETRY_MS = 2000
+
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
     file_id: str = Form(...),
-    current_user: UserInDB = Depends(get_current_user)
+    current_user: UserInDB = Depends(get_current_user),
+    services: ServiceContainer = Depends(get_services)
 ):
     try:
         if not current_user:
@@ -23,7 +32,7 @@ async def upload_file(
         if not current_user.active_chat_id:
             raise HTTPException(status_code=400, detail="No active chat session")
             
-        result = await FileService.save_file(file, file_id, current_user=current_user)
+        result = await services.file_service.save_file(file, file_id, current_user=current_user)
         
         # Include processing metrics in the response
         response = {
@@ -43,30 +52,89 @@ async def upload_file(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/{file_id}")
-async def delete_file(file_id: str):
+async def delete_file(file_id: str, services: ServiceContainer = Depends(get_services)):
     try:
-        result = await FileService.delete_file(file_id)
+        result = await services.file_service.delete_file(file_id)
         return {"message": "File deleted successfully", "file_id": file_id}
     except Exception as e:
         logger.error(f"Error in delete_file endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _progress_payload(file_id: str) -> dict:
+    progress_data = dict(DocumentService.get_progress(file_id))
+
+    # Ensure status and current_stage are consistent
+    if "stats" in progress_data and "current_stage" in progress_data["stats"]:
+        # Make sure the status field matches the current_stage for consistency
+        progress_data["status"] = progress_data["stats"]["current_stage"]
+
+        # Don't show "completed" until progress is actually 100%
+        if progress_data["status"] == "completed" and progress_data["progress"] < 95:
+            progress_data["status"] = "finalizing"
+
+    return progress_data
+
 @router.get("/progress/{file_id}")
 async def get_file_progress(file_id: str):
     """Get the current progress of a file being processed"""
     try:
-        progress_data = DocumentService.get_progress(file_id)
-        
-        # Ensure status and current_stage are consistent
-        if "stats" in progress_data and "current_stage" in progress_data["stats"]:
-            # Make sure the status field matches the current_stage for consistency
-            progress_data["status"] = progress_data["stats"]["current_stage"]
-            
-            # Don't show "completed" until progress is actually 100%
-            if progress_data["status"] == "completed" and progress_data["progress"] < 95:
-                progress_data["status"] = "finalizing"
-                
-        return JSONResponse(content=progress_data)
+        return JSONResponse(content=await asyncio.to_thread(_progress_payload, file_id))
     except Exception as e:
         logger.error(f"Error getting file progress: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _progress_events(file_id: str):
+    """
+    Server-sent events for one file: the latest progress snapshot after each
+    update, at most PROGRESS_STREAM_MAX_UPDATES_PER_SECOND, until the file
+    completes, fails or is deleted
+    """
+    rate = settings.PROGRESS_STREAM_MAX_UPDATES_PER_SECOND
+    min_interval = 1 / rate if rate > 0 else 0
+    keepalive = settings.PROGRESS_STREAM_KEEPALIVE_SECONDS
+    # The client opens the stream before its upload request reaches the server
+    start_deadline = time.monotonic() + settings.PROGRESS_STREAM_START_TIMEOUT_SECONDS
+    started = False
+    last_data = None
+    last_sent = time.monotonic()
+
+    # Reconnect delay for the browser's EventSource
+    yield f"retry: {PROGRESS_STREAM_RETRY_MS}\n\n"
+    with progress_notifier.subscribe(file_id) as subscription:
+        while True:
+            timeout = keepalive
+            if progress_store.poll_seconds:
+                # Uploads processed by another worker are only seen by reading the shared store
+                timeout = min(timeout, progress_store.poll_seconds)
+            if not started:
+                timeout = max(0, min(timeout, start_deadline - time.monotonic()))
+            await subscription.wait(timeout)
+
+            payload = await asyncio.to_thread(_progress_payload, file_id)
+            if payload["status"] == "not_found" and not started and time.monotonic() < start_deadline:
+                data = last_data
+            else:
+                started = True
+                data = json.dumps(payload)
+
+            if data != last_data:
+                last_data = data
+                last_sent = time.monotonic()
+                yield f"data: {data}\n\n"
+                if payload["status"] in ("completed", "error", "not_found"):
+                    return
+                # Updates published while waiting here are coalesced into the next snapshot
+                await asyncio.sleep(min_interval)
+            elif time.monotonic() - last_sent >= keepalive:
+                last_sent = time.monotonic()
+                # Comment line, keeps proxies from closing an idle connection
+                yield ": keepalive\n\n"
+
+@router.get("/progress/{file_id}/stream")
+async def stream_file_progress(file_id: str):
+    """Stream the progress of a file being processed as server-sent events"""
+    return StreamingResponse(
+        _progress_events(file_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -5,6 +5,7 @@ from bson import ObjectId
 from pymongo.errors import PyMongoError
 
 from ..utils.deps import get_current_user
+from ..services.user_cache import user_cache
 from ..database.mongodb import MongoDB
 from ..models.user import UserInDB
 from ..utils.logger import logger
@@ -52,6 +53,7 @@ async def update_logging_status(
             {"_id": ObjectId(current_user.id)},
             {"$set": {"enable_logging": request.logging_enabled}}
         )
+        user_cache.invalidate(current_user.id)
         
         if result.modified_count == 0:
             logger.warning(f"User not found or update failed for {current_user.email}")
@@ -0,0 +1,238 @@
+"""
+Replay cache for chat answers.
+
+Professors often ask the same opening questions ("summarize my evaluations")
+against a chat whose files have not changed, and each one runs the whole
+gpt-4o tool loop again. An answer is stored with its tool calls and results,
+keyed by:
+
+    chat ID + fingerprint of the chat's uploaded files (from the files collection)
+    + digest of everything before the question (system prompts, frontend tools, earlier turns)
+    + the question, matched after normalization or by embedding similarity
+
+and a repeat is replayed through the same stream events instead of calling
+the model. Uploads and deletes invalidate the chat's answers in this process;
+the file fingerprint makes other server processes miss as well.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from ..config.settings import settings
+from ..database.mongodb import MongoDB
+from ..utils.logger import logger
+from .query_embedding_cache import normalize_query
+
+# Characters per text event when replaying a stored answer
+REPLAY_CHUNK_CHARS = 64
+
+
+def _sha1(payload: Any) -> str:
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class AnswerRecorder:
+    """Collects the stream events of one answer while it is generated"""
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self._tools: Dict[str, Dict[str, Any]] = {}
+
+    def text(self, text: str):
+        if self.events and self.events[-1]["type"] == "text":
+            self.events[-1]["text"] += text
+        else:
+            self.events.append({"type": "text", "text": text})
+
+    def tool_call(self, name: str, tool_call_id: str):
+        event = {"type": "tool", "name": name, "id": tool_call_id, "args": "", "result": None}
+        self._tools[tool_call_id] = event
+        self.events.append(event)
+
+    def tool_args(self, tool_call_id: str, args_text: str):
+        event = self._tools.get(tool_call_id)
+        if event is not None:
+            event["args"] += args_text or ""
+
+    def tool_result(self, tool_call_id: str, result: Any):
+        event = self._tools.get(tool_call_id)
+        if event is not None:
+            event["result"] = result
+
+    @property
+    def complete(self) -> bool:
+        """Has text, and every tool call has a result (a frontend tool interrupts without one)"""
+        return any(e["type"] == "text" and e["text"].strip() for e in self.events) and \
+            all(e["result"] is not None for e in self._tools.values())
+
+
+class _Answer:
+    def __init__(self, question: str, embedding: Optional[np.ndarray], events: List[Dict[str, Any]]):
+        self.question = question
+        self.embedding = embedding
+        self.events = events
+        self.created_at = time.monotonic()
+
+
+class AnswerCache:
+    """TTL + LRU cache of recorded answers (see module docstring)"""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 86400, similarity: float = 0.95,
+                 enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.enabled = enabled
+        # (chat ID, scope digest, normalized question) -> answer
+        self._entries: "OrderedDict[Tuple[str, str, str], _Answer]" = OrderedDict()
+        # Bumped on every file change of a chat, so an answer generated across a change is not stored
+        self._versions: Dict[str, int] = {}
+        self._pending: set = set()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def question(messages: Sequence[BaseMessage]) -> Optional[str]:
+        """Text of the final user message, or None when the request is not a plain question"""
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return None
+        content = messages[-1].content
+        if isinstance(content, str):
+            return content.strip() or None
+        if any(isinstance(part, dict) and part.get("type") != "text" for part in content):
+            # Images are not part of the key
+            return None
+        text = " ".join(part.get("text") or "" for part in content if isinstance(part, dict)).strip()
+        return text or None
+
+    @staticmethod
+    async def file_fingerprint(chat_id: str) -> str:
+        cursor = MongoDB.get_async_db().files.find({"chat_id": chat_id}, {"_id": 0, "file_id": 1, "filename": 1})
+        files = sorted((doc.get("file_id"), doc.get("filename")) for doc in await cursor.to_list(length=None))
+        return _sha1(files)
+
+    async def scope(self, chat_id: str, messages: Sequence[BaseMessage], system: Optional[str],
+                    tool_names: Sequence[str]) -> str:
+        """Digest of everything an answer depends on besides the question"""
+        history = [[message.type, message.content, getattr(message, "tool_calls", None)] for message in messages[:-1]]
+        return _sha1([await self.file_fingerprint(chat_id), system or "", sorted(tool_names), history])
+
+    def version(self, chat_id: str) -> int:
+        return self._versions.get(chat_id, 0)
+
+    def _fresh(self, key: Tuple[str, str, str]) -> Optional[_Answer]:
+        answer = self._entries.get(key)
+        if answer is None:
+            return None
+        if self.ttl_seconds > 0 and time.monotonic() - answer.created_at > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        return answer
+
+    async def lookup(self, chat_id: str, scope: str, question: str, embeddings) -> Optional[List[Dict[str, Any]]]:
+        """Recorded events of a matching answer, or None"""
+        key = (chat_id, scope, normalize_query(question))
+        answer = self._fresh(key)
+        if answer is None and self.similarity > 0:
+            candidates = [k for k in self._entries if k[:2] == key[:2] and self._entries[k].embedding is not None]
+            candidates = [k for k in candidates if self._fresh(k) is not None]
+            if candidates:
+                query = await self._embed(question, embeddings)
+                if query is not None:
+                    scores = np.stack([self._entries[k].embedding for k in candidates]) @ query
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity:
+                        key, answer = candidates[best], self._entries[candidates[best]]
+                        self.semantic_hits += 1
+
+        if answer is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return answer.events
+
+    @staticmethod
+    async def _embed(question: str, embeddings) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await embeddings.aembed_query(question), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Answer cache could not embed the question: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def store_later(self, chat_id: str, scope: str, question: str, recorder: AnswerRecorder, version: int,
+                    embeddings):
+        """Store a finished answer in the background (the question is embedded first)"""
+        if not recorder.complete:
+            return
+        task = asyncio.create_task(self.store(chat_id, scope, question, recorder.events, version, embeddings))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def store(self, chat_id: str, scope: str, question: str, events: List[Dict[str, Any]], version: int,
+                    embeddings):
+        embedding = await self._embed(question, embeddings) if self.similarity > 0 else None
+        if self.version(chat_id) != version:
+            # The chat's files changed while the answer was generated
+            return
+        key = (chat_id, scope, normalize_query(question))
+        self._entries[key] = _Answer(question, embedding, events)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self.stores += 1
+
+    def invalidate_chat(self, chat_id: str):
+        """Forget a chat's answers after its files changed"""
+        self._versions[chat_id] = self.version(chat_id) + 1
+        for key in [key for key in self._entries if key[0] == chat_id]:
+            del self._entries[key]
+        self.invalidations += 1
+
+    @staticmethod
+    async def replay(controller, events: List[Dict[str, Any]]):
+        """Send recorded events through an assistant-stream RunController"""
+        for event in events:
+            if event["type"] == "text":
+                text = event["text"]
+                for start in range(0, len(text), REPLAY_CHUNK_CHARS):
+                    controller.append_text(text[start:start + REPLAY_CHUNK_CHARS])
+                    # Let the response flush chunks as they are produced
+                    await asyncio.sleep(0)
+            else:
+                tool_controller = await controller.add_tool_call(event["name"], event["id"])
+                if event["args"]:
+                    tool_controller.append_args_text(event["args"])
+                tool_controller.set_result(event["result"])
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+answer_cache = AnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+    similarity=settings.ANSWER_CACHE_SIMILARITY,
+    enabled=settings.ANSWER_CACHE_ENABLED,
+)
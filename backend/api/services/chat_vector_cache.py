@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ..config.settings import settings
+from ..database.mongodb import MongoDB
+from ..utils.logger import logger
+from ..utils.vector_codec import decode_vectors
+
+# Vector document fields that are not returned as Document metadata
+_EXCLUDED_FIELDS = ("embedding", "text")
+
+
+class _ChatVectors:
+    """Unit-normalized float32 vectors of one chat plus their texts and metadata"""
+
+    def __init__(self):
+        self.matrix = np.empty((0, 0), dtype=np.float32)
+        self.texts: List[str] = []
+        self.metadata: List[Dict[str, Any]] = []
+        self.loaded_at = time.monotonic()
+        self._pending: List[np.ndarray] = []
+
+    def append(self, vectors: np.ndarray, texts: List[str], metadata: List[Dict[str, Any]]):
+        # Appends are staged and concatenated on the next query rather than once per batch
+        self._pending.append(vectors)
+        self.texts.extend(texts)
+        self.metadata.extend(metadata)
+
+    def consolidate(self) -> np.ndarray:
+        if self._pending:
+            blocks = [self.matrix] if len(self.matrix) else []
+            self.matrix = np.concatenate(blocks + self._pending)
+            self._pending = []
+        return self.matrix
+
+    def keep(self, mask: np.ndarray):
+        self.matrix = self.consolidate()[mask]
+        self.texts = [text for text, kept in zip(self.texts, mask) if kept]
+        self.metadata = [meta for meta, kept in zip(self.metadata, mask) if kept]
+
+    @property
+    def nbytes(self) -> int:
+        # Vectors dominate; texts and metadata are approximated by their text length
+        return self.matrix.nbytes + sum(block.nbytes for block in self._pending) + sum(len(text) for text in self.texts)
+
+
+def _normalize(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2:
+        matrix = matrix.reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class ChatVectorCache:
+    """
+    In-process cache of each chat's evaluation vectors for exact top-k search.
+
+    A chat holds hundreds to a few thousand chunks, so a brute-force cosine
+    search over its float32 matrix is a single matmul and avoids an Atlas
+    $vectorSearch round trip. Chats are loaded from MongoDB on first use,
+    extended in place as uploads store new vectors, and evicted least recently
+    used once the total size exceeds `max_bytes`. Entries older than
+    `ttl_seconds` are reloaded, so changes made by other server processes are
+    picked up eventually.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, ttl_seconds: float = 600, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, _ChatVectors]" = OrderedDict()
+        # Bumped whenever a chat changes, so a load that raced with a change is not cached
+        self._versions: Dict[str, int] = {}
+        self._file_deletions = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _bump(self, chat_id: str):
+        self._versions[chat_id] = self._versions.get(chat_id, 0) + 1
+
+    def _get(self, chat_id: str) -> Optional[_ChatVectors]:
+        entry = self._entries.get(chat_id)
+        if entry is None:
+            return None
+        if self.ttl_seconds > 0 and time.monotonic() - entry.loaded_at > self.ttl_seconds:
+            del self._entries[chat_id]
+            return None
+        self._entries.move_to_end(chat_id)
+        return entry
+
+    def _evict(self):
+        total = sum(entry.nbytes for entry in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            chat_id, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+            logger.info(f"Evicted vectors of chat {chat_id} from the chat vector cache")
+
+    def _load(self, chat_id: str) -> _ChatVectors:
+        entry = _ChatVectors()
+        db = MongoDB.get_db()
+        vectors, texts, metadata = [], [], []
+        for vector_doc in db.evaluations_vectors.find({"source": chat_id}):
+            vectors.append(vector_doc["embedding"])
+            texts.append(vector_doc.get("text", ""))
+            metadata.append({key: value for key, value in vector_doc.items() if key not in _EXCLUDED_FIELDS})
+        if vectors:
+            entry.append(_normalize(decode_vectors(vectors)), texts, metadata)
+        return entry
+
+    def _entry(self, chat_id: str) -> _ChatVectors:
+        with self._lock:
+            entry = self._get(chat_id)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            version = (self._versions.get(chat_id, 0), self._file_deletions)
+
+        entry = self._load(chat_id)
+        with self._lock:
+            if (self._versions.get(chat_id, 0), self._file_deletions) == version:
+                self._entries[chat_id] = entry
+                self._entries.move_to_end(chat_id)
+                self._evict()
+        return entry
+
+    def search(self, chat_id: str, query_embedding: Sequence[float], k: int = 5) -> List[Tuple[Document, float]]:
+        """
+        Return the top-k chunks of a chat with Atlas-compatible cosine scores,
+        i.e. (1 + cosine similarity) / 2, best first.
+        """
+        entry = self._entry(chat_id)
+        with self._lock:
+            matrix = entry.consolidate()
+            if not len(matrix):
+                return []
+            scores = matrix @ _normalize([query_embedding])[0]
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                (Document(page_content=entry.texts[i], metadata=dict(entry.metadata[i])), float((1 + scores[i]) / 2))
+                for i in top
+            ]
+
+    def add(self, chat_id: str, vector_docs: List[Dict[str, Any]]):
+        """Append freshly stored vector documents to a chat that is already cached"""
+        if not self.enabled or not vector_docs:
+            return
+        vectors = _normalize(decode_vectors([vector_doc["embedding"] for vector_doc in vector_docs]))
+        texts = [vector_doc.get("text", "") for vector_doc in vector_docs]
+        metadata = [{key: value for key, value in vector_doc.items() if key not in _EXCLUDED_FIELDS} for vector_doc in vector_docs]
+        with self._lock:
+            self._bump(chat_id)
+            entry = self._get(chat_id)
+            if entry is not None:
+                entry.append(vectors, texts, metadata)
+                self._evict()
+
+    def update_metadata(self, chat_id: str, updates: Dict[str, Dict[str, Any]]):
+        """Apply {vector id: fields} metadata updates made after insertion"""
+        with self._lock:
+            self._bump(chat_id)
+            entry = self._get(chat_id)
+            if entry is None:
+                return
+            for meta in entry.metadata:
+                fields = updates.get(meta.get("_id"))
+                if fields:
+                    meta.update(fields)
+
+    def invalidate_file(self, file_id: str):
+        """Drop a deleted file's vectors from every cached chat"""
+        with self._lock:
+            # A load in flight may still include the file's vectors, so it must not be cached
+            self._file_deletions += 1
+            for entry in self._entries.values():
+                mask = np.array([meta.get("file_id") != file_id for meta in entry.metadata], dtype=bool)
+                if len(mask) and not mask.all():
+                    entry.keep(mask)
+
+    def invalidate_chat(self, chat_id: str):
+        with self._lock:
+            self._bump(chat_id)
+            self._entries.pop(chat_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "chats": len(self._entries),
+                "vectors": sum(len(entry.texts) for entry in self._entries.values()),
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+chat_vector_cache = ChatVectorCache(
+    max_bytes=settings.CHAT_VECTOR_CACHE_MAX_MB * 1024 * 1024,
+    ttl_seconds=settings.CHAT_VECTOR_CACHE_TTL_SECONDS,
+    enabled=settings.CHAT_VECTOR_CACHE_ENABLED,
+)
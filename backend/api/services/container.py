@@ -0,0 +1,76 @@
+from typing import Any, Dict
+
+from langchain_mongodb import MongoDBAtlasVectorSearch
+
+from ..config.settings import settings
+from ..database.mongodb import MongoDB
+from ..database.vector_index import create_embeddings
+from ..utils.construction_stats import construction_stats, record_construction
+from ..utils.logger import logger
+from ..utils.vector_snapshot import load_snapshot
+from .answer_cache import answer_cache
+from .chat_vector_cache import chat_vector_cache
+from .document_service import DocumentService
+from .embedding_cache import embedding_cache
+from .file_service import FileService
+from .progress_notifier import progress_notifier
+from .progress_store import progress_store
+from .query_embedding_cache import CachedQueryEmbeddings, query_embedding_cache
+from .user_cache import user_cache
+
+class ServiceContainer:
+    """
+    Application-scoped clients and services.
+
+    Built once in the FastAPI lifespan after MongoDB is connected and shared by
+    every request: routes get it through the `get_services` dependency and the
+    LangGraph tools through `config["configurable"]["services"]`. The
+    embeddings client and vector store handles are thread-safe and keep their
+    HTTP connection pools alive between requests.
+    """
+
+    def __init__(self):
+        db = MongoDB.get_db()
+
+        self.embeddings = create_embeddings()
+        # Retrieval goes through the query embedding cache; ingestion uses the raw client
+        self.query_embeddings = CachedQueryEmbeddings(self.embeddings, query_embedding_cache)
+
+        self.evaluations_store = MongoDBAtlasVectorSearch(
+            collection=db.evaluations_vectors,
+            embedding=self.query_embeddings,
+            index_name="evaluations_index",
+            relevance_score_fn="cosine",
+        )
+        record_construction("MongoDBAtlasVectorSearch")
+
+        self.teaching_materials_store = MongoDBAtlasVectorSearch(
+            collection=db.teaching_materials,
+            embedding=self.query_embeddings,
+            index_name="teaching_materials_index",
+            relevance_score_fn="cosine",
+        )
+        record_construction("MongoDBAtlasVectorSearch")
+        # Static textbook corpus exported to disk; None falls back to the Atlas store
+        self.teaching_materials_snapshot = load_snapshot(
+            settings.TEACHING_MATERIALS_SNAPSHOT_DIR, settings.EMBEDDING_MODEL, settings.EMBEDDING_DIMENSIONS
+        )
+
+        self.document_service = DocumentService(embeddings=self.embeddings)
+        self.file_service = FileService(self.document_service)
+        logger.info("Service container initialized")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "constructions": construction_stats.snapshot(),
+            "embedding_cache": embedding_cache.stats(),
+            "chat_vector_cache": chat_vector_cache.stats(),
+            "query_embedding_cache": query_embedding_cache.stats(),
+            "answer_cache": answer_cache.stats(),
+            "user_cache": user_cache.stats(),
+            "progress_streams": progress_notifier.stats(),
+            "progress_store": progress_store.stats(),
+            "teaching_materials_snapshot": (
+                self.teaching_materials_snapshot.manifest if self.teaching_materials_snapshot else None
+            ),
+        }
@@ -1,23 +1,43 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-import pdfplumber
 import pandas as pd
 import chardet
-from typing import List, BinaryIO, Tuple, Dict, Any
+from typing import List, BinaryIO, Tuple, Dict, Any, AsyncIterator, AsyncIterable, Iterator, Optional, Union
 from ..utils.logger import logger
+from ..utils.pdf_extraction import extract_pages_serial, iter_pages_parallel
+from ..utils.csv_reader import iter_csv_blocks
+from ..utils.excel_reader import iter_sheet_blocks, iter_sheets_parallel, list_sheets
+from ..utils.row_serializer import serialize_row_parts, serialize_rows
+from ..utils.token_chunker import ChunkPacker, PackedChunk, get_tokenizer
+from ..utils.deduplicator import Deduplicator
+from ..utils.construction_stats import record_construction
+from ..utils.vector_codec import encode_vectors
 from ..database.mongodb import MongoDB
+from ..database.vector_index import create_embeddings, ensure_vector_index
+from ..config.settings import settings
+from .embedding_cache import embedding_cache
+from .chat_vector_cache import chat_vector_cache
+from .progress_notifier import progress_notifier
+from .progress_store import progress_store
 from langchain_openai import OpenAIEmbeddings
-from langchain_mongodb import MongoDBAtlasVectorSearch
 import os
 from uuid import uuid4
 import time
 import asyncio
-from pymongo.operations import InsertOne
+from pymongo.operations import InsertOne, UpdateOne
 import re
+import shutil
+import tempfile
+
+class SourceProgress:
+    """Fraction (0-1) of an upload consumed so far by a streaming loader"""
+
+    def __init__(self):
+        self.fraction = 0.0
+
 
 class DocumentService:
-    # Dictionary to store progress information for each file
-    _progress_tracker = {}
+    # Progress information for each file (in-process, or shared by all workers)
+    _progress_tracker = progress_store
     
     # Define progress stages with their percentage ranges - more evenly distributed
     _progress_stages = {
@@ -34,21 +54,23 @@ class DocumentService:
     @staticmethod
     def get_progress(file_id: str) -> dict:
         """Get the current progress for a file"""
-        if file_id not in DocumentService._progress_tracker:
+        progress = DocumentService._progress_tracker.get(file_id)
+        if progress is None:
             return {"status": "not_found", "progress": 0, "message": "File not found"}
-        return DocumentService._progress_tracker[file_id]
+        return progress
     
     @staticmethod
     def update_progress(file_id: str, progress: float, status: str = "processing", message: str = "", stats: Dict[str, Any] = None):
         """Update the progress for a file"""
-        DocumentService._progress_tracker[file_id] = {
+        DocumentService._progress_tracker.put(file_id, {
             "file_id": file_id,
             "progress": min(100, max(0, progress)),  # Ensure progress is between 0-100
             "status": status,
             "message": message,
             "updated_at": time.time(),
             "stats": stats or {}
-        }
+        })
+        progress_notifier.publish(file_id)
     
     @staticmethod
     def update_stage_progress(file_id: str, stage: str, completion_percentage: float = 0, message: str = "", stats: Dict[str, Any] = None):
@@ -92,8 +114,9 @@ class DocumentService:
     @staticmethod
     def clear_progress(file_id: str):
         """Clear progress tracking for a file"""
-        if file_id in DocumentService._progress_tracker:
-            del DocumentService._progress_tracker[file_id]
+        DocumentService._progress_tracker.delete(file_id)
+        progress_notifier.publish(file_id)
+
     @staticmethod
     def clean_text(text: str) -> str:
         """
@@ -128,14 +151,15 @@ class DocumentService:
         text = re.sub(r'[\x00-\x09\x0b\x0c\x0e-\x1f\x7f]', '', text)
         
         return text
-    def __init__(self, chunk_size: int = 1048, chunk_overlap: int = 100):
-        self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap
-        )
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+    def __init__(self, chunk_size: Optional[int] = None, chunk_overlap: Optional[int] = None, embeddings: Optional[OpenAIEmbeddings] = None):
+        record_construction("DocumentService")
+        # Chunk size and overlap are measured in tokens
+        self.chunk_size = chunk_size if chunk_size is not None else settings.CHUNK_TOKEN_BUDGET
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else settings.CHUNK_TOKEN_OVERLAP
+        self.tokenizer = get_tokenizer(settings.CHUNK_TOKENIZER)
+        if embeddings is None:
+            embeddings = create_embeddings()
+        self.embeddings = embeddings
         self.vector_index_name = "evaluations_index"
 
     async def process_file(self, file: BinaryIO, filename: str, mime_type: str, file_id: str, chat_id: str) -> Dict[str, Any]:
@@ -173,35 +197,54 @@ class DocumentService:
             self.update_stage_progress(file_id, "analyzing", 50, "Determining optimal chunking strategy")
             await asyncio.sleep(0.2)  # Small delay for smoother progress updates
             
-            # Update to chunking stage
-            self.update_stage_progress(file_id, "chunking", 0, "Starting file chunking")
-            documents = await self._load_and_chunk_file(file, file_type, encoding, chat_id)
-            chunking_time = time.time() - chunking_start
-            logger.info(f"Created {len(documents)} chunks in {chunking_time:.2f}s")
-            
-            # Complete chunking stage
-            self.update_stage_progress(
-                file_id,
-                "chunking",
-                100,
-                f"Created {len(documents)} chunks",
-                {
-                    "total_chunks": len(documents),
-                    "chunking_time_seconds": round(chunking_time, 2)
-                }
-            )
-            
-            # Prepare for vectorization
-            self.update_stage_progress(file_id, "vectorizing_prep", 0, "Preparing for vector embedding creation")
-            await asyncio.sleep(0.2)  # Small delay for smoother progress updates
-            self.update_stage_progress(file_id, "vectorizing_prep", 50, "Optimizing batch processing")
-            await asyncio.sleep(0.2)  # Small delay for smoother progress updates
-            self.update_stage_progress(file_id, "vectorizing_prep", 100, "Starting vector creation")
-            
-            # Create vectors and store in MongoDB
-            vector_start = time.time()
-            await self._store_vectors(documents, filename, mime_type, file_id, chat_id)
-            vector_time = time.time() - vector_start
+            deduplicator = self._new_deduplicator()
+            if settings.INGEST_STREAMING:
+                # Chunks flow from the loader through embedding and insert in fixed-size
+                # windows, so memory stays flat and early vectors are searchable right away
+                self.update_stage_progress(file_id, "chunking", 0, "Streaming file into the vector store")
+                source_progress = SourceProgress()
+                vector_start = time.time()
+                store_stats = await self._store_vectors(
+                    self._iter_chunks(file, file_type, encoding, source_progress, deduplicator),
+                    filename, mime_type, file_id, chat_id, source_progress
+                )
+                vector_time = time.time() - vector_start
+                # Chunking overlaps with vectorization in streaming mode
+                chunking_time = vector_time
+                chunks_created = store_stats["chunks"]
+            else:
+                # Update to chunking stage
+                self.update_stage_progress(file_id, "chunking", 0, "Starting file chunking")
+                documents = await self._load_and_chunk_file(file, file_type, encoding, chat_id, deduplicator)
+                chunking_time = time.time() - chunking_start
+                chunks_created = len(documents)
+                logger.info(f"Created {chunks_created} chunks in {chunking_time:.2f}s")
+
+                # Complete chunking stage
+                self.update_stage_progress(
+                    file_id,
+                    "chunking",
+                    100,
+                    f"Created {chunks_created} chunks",
+                    {
+                        "total_chunks": chunks_created,
+                        "chunking_time_seconds": round(chunking_time, 2)
+                    }
+                )
+
+                # Prepare for vectorization
+                self.update_stage_progress(file_id, "vectorizing_prep", 0, "Preparing for vector embedding creation")
+                await asyncio.sleep(0.2)  # Small delay for smoother progress updates
+                self.update_stage_progress(file_id, "vectorizing_prep", 50, "Optimizing batch processing")
+                await asyncio.sleep(0.2)  # Small delay for smoother progress updates
+                self.update_stage_progress(file_id, "vectorizing_prep", 100, "Starting vector creation")
+
+                # Create vectors and store in MongoDB
+                vector_start = time.time()
+                store_stats = await self._store_vectors(documents, filename, mime_type, file_id, chat_id)
+                vector_time = time.time() - vector_start
+
+            duplicates_removed = await self._store_occurrences(deduplicator, chat_id)
             
             # Enter finalizing stage
             self.update_stage_progress(file_id, "finalizing", 0, "Finalizing file processing")
@@ -215,11 +258,15 @@ class DocumentService:
             summary = {
                 "status": "success",
                 "file_type": file_type,
-                "chunks_created": len(documents),
+                "chunks_created": chunks_created,
+                "streaming": settings.INGEST_STREAMING,
                 "chunking_time_seconds": round(chunking_time, 2),
                 "vectorization_time_seconds": round(vector_time, 2),
                 "total_processing_time_seconds": round(total_time, 2),
-                "processing_rate": round(len(documents) / total_time, 2),
+                "processing_rate": round(chunks_created / total_time, 2),
+                "embedding_cache_hits": store_stats["cache_hits"],
+                "embedding_cache_misses": store_stats["cache_misses"],
+                "duplicates_removed": duplicates_removed,
                 "message": "File processed and stored successfully"
             }
             logger.info(f"File processing complete: {summary}")
@@ -236,260 +283,484 @@ class DocumentService:
             self.update_progress(file_id, 0, "error", f"Error processing file: {str(e)}")
             raise
 
-    async def _load_and_chunk_file(self, file: BinaryIO, file_type: str, encoding: str, chat_id: str) -> List[Document]:
+    async def _load_and_chunk_file(self, file: BinaryIO, file_type: str, encoding: str, chat_id: str, deduplicator: Optional[Deduplicator] = None) -> List[Document]:
         """Load and chunk file based on type"""
+        return [doc async for doc in self._iter_chunks(file, file_type, encoding, deduplicator=deduplicator)]
+
+    async def _iter_chunks(
+        self,
+        file: BinaryIO,
+        file_type: str,
+        encoding: str,
+        source_progress: "SourceProgress" = None,
+        deduplicator: Optional[Deduplicator] = None
+    ) -> AsyncIterator[Document]:
+        """
+        Yield document chunks as the loader produces them.
+
+        Args:
+            file: The uploaded file
+            file_type: File extension
+            encoding: Detected text encoding
+            source_progress: Optionally updated with the fraction of the source consumed
+            deduplicator: Collapses repeated spreadsheet rows before they are packed into chunks
+        """
+        source_progress = source_progress or SourceProgress()
         if file_type == 'pdf':
-            return await self._process_pdf(file, chat_id)
+            # Lines are packed up to the token budget within each page, with a
+            # trailing overlap carried into the next chunk of the same page
+            packer = ChunkPacker(self.chunk_size, self.tokenizer, overlap=self.chunk_overlap, separator=" ")
+            async for page_num, page_count, text in self._iter_pdf_pages(file):
+                lines = [DocumentService.clean_text(line) for line in (text or "").split("\n")]
+                chunks = packer.add_many(lines) + packer.flush()
+                for chunk in chunks:
+                    # Only set page number here, chat_id will be set in _store_vectors
+                    yield Document(page_content=chunk.text, metadata={"page": page_num})
+                source_progress.fraction = (page_num + 1) / page_count
         elif file_type == 'csv':
-            return await self._process_csv(file, encoding, chat_id)
+            async for doc in self._iter_csv_chunks(file, encoding, source_progress, deduplicator):
+                yield doc
         elif file_type in ['xlsx', 'xls']:
-            return await self._process_excel(file, file_type, chat_id)
+            async for doc in self._iter_excel_chunks(file, file_type, source_progress, deduplicator):
+                yield doc
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
 
     async def _process_pdf(self, file: BinaryIO, chat_id: str) -> List[Document]:
-        documents = []
-        with pdfplumber.open(file) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                text = DocumentService.clean_text(page.extract_text()) if page.extract_text() else ""
-                # Ensure text is properly cleaned
-                doc = Document(
-                    page_content=DocumentService.clean_text(text),
-                    metadata={"page": page_num}  # Only set page number here, chat_id will be set in _store_vectors
-                )
-                chunks = self.text_splitter.split_documents([doc])
-                documents.extend(chunks)
-        return documents
+        return [doc async for doc in self._iter_chunks(file, 'pdf', None)]
+
+    async def _iter_pdf_pages(self, file: BinaryIO) -> AsyncIterator[Tuple[int, int, str]]:
+        """
+        Yield (page_num, page_count, text) for every page in order.
+
+        With PDF_EXTRACTION_WORKERS > 0 pages are extracted in parallel on the
+        shared process pool with a per-page timeout; otherwise the whole file is
+        extracted serially on a worker thread so the event loop stays free.
+        """
+        workers = settings.PDF_EXTRACTION_WORKERS
+        file.seek(0)
+        if workers <= 0:
+            texts = await asyncio.to_thread(extract_pages_serial, file)
+            for page_num, text in enumerate(texts):
+                yield page_num, len(texts), text
+            return
+
+        # Worker processes read the upload from a temporary file rather than receiving it per page
+        with tempfile.NamedTemporaryFile(suffix=".pdf") as tmp:
+            await asyncio.to_thread(shutil.copyfileobj, file, tmp)
+            tmp.flush()
+            async for page in iter_pages_parallel(tmp.name, workers, settings.PDF_PAGE_TIMEOUT_SECONDS):
+                yield page
 
     async def _process_csv(self, file: BinaryIO, encoding: str, chat_id: str) -> List[Document]:
-        df = pd.read_csv(file, encoding=encoding)
-        return self._chunk_dataframe(df)
+        return [doc async for doc in self._iter_csv_chunks(file, encoding)]
+
+    async def _iter_csv_chunks(
+        self,
+        file: BinaryIO,
+        encoding: str,
+        source_progress: Optional[SourceProgress] = None,
+        deduplicator: Optional[Deduplicator] = None
+    ) -> AsyncIterator[Document]:
+        """
+        Read the CSV in blocks of CSV_BLOCK_ROWS rows and yield chunk Documents per block,
+        so only one block of rows is held in memory at a time.
+        """
+        source_progress = source_progress or SourceProgress()
+        file.seek(0, os.SEEK_END)
+        file_size = file.tell() or 1
+        file.seek(0)
+
+        blocks = iter_csv_blocks(file, encoding, settings.CSV_BLOCK_ROWS, settings.CSV_ENGINE)
+        async for doc in self._iter_block_chunks(blocks, deduplicator=deduplicator):
+            yield doc
+            source_progress.fraction = min(1.0, file.tell() / file_size)
+        source_progress.fraction = 1.0
 
     async def _process_excel(self, file: BinaryIO, file_type: str, chat_id: str) -> List[Document]:
-        if file_type == 'xlsx':
-            df = pd.read_excel(file, engine='openpyxl')
-        else:
-            df = pd.read_excel(file, engine='xlrd')
-        return self._chunk_dataframe(df)
+        return [doc async for doc in self._iter_excel_chunks(file, file_type)]
 
-    def _chunk_dataframe(self, df: pd.DataFrame, chat_id: str = None) -> List[Document]:
+    async def _iter_excel_chunks(
+        self,
+        file: BinaryIO,
+        file_type: str,
+        source_progress: Optional[SourceProgress] = None,
+        deduplicator: Optional[Deduplicator] = None
+    ) -> AsyncIterator[Document]:
         """
-        Chunk a dataframe into documents, optimized to create fewer chunks
-        for large spreadsheets to improve processing speed.
+        Yield chunk Documents for every sheet of a workbook, tagged with `sheet` metadata.
+
+        .xlsx workbooks are read with openpyxl in read-only mode. A single sheet
+        is streamed in blocks of EXCEL_BLOCK_ROWS rows; several sheets are
+        parsed in parallel on the shared process pool (EXCEL_SHEET_WORKERS) and
+        chunked in workbook order. Legacy .xls files have no streaming reader
+        and are loaded whole with xlrd.
+        """
+        source_progress = source_progress or SourceProgress()
+        file.seek(0)
+        if file_type == 'xls':
+            sheets = await asyncio.to_thread(pd.read_excel, file, engine='xlrd', sheet_name=None)
+            for i, (sheet_name, df) in enumerate(sheets.items()):
+                for doc in await asyncio.to_thread(self._chunk_dataframe, df, None, sheet_name, deduplicator):
+                    yield doc
+                source_progress.fraction = (i + 1) / len(sheets)
+            return
+
+        # openpyxl and the pool workers read the workbook from a temporary file
+        with tempfile.NamedTemporaryFile(suffix=".xlsx") as tmp:
+            await asyncio.to_thread(shutil.copyfileobj, file, tmp)
+            tmp.flush()
+            sheets = await asyncio.to_thread(list_sheets, tmp.name)
+            logger.info(f"Processing workbook with {len(sheets)} sheet(s)")
+            workers = settings.EXCEL_SHEET_WORKERS
+
+            if workers > 0 and len(sheets) > 1:
+                done = 0
+                async for sheet_name, total_cols, (rows, fields, comments) in iter_sheets_parallel(
+                    tmp.name, sheets, workers, settings.EXCEL_BLOCK_ROWS
+                ):
+                    packer = ChunkPacker(self.chunk_size, self.tokenizer)
+                    chunks = await asyncio.to_thread(
+                        self._pack_rows, rows, packer, total_cols, 0, len(rows), True, sheet_name, deduplicator,
+                        fields, comments
+                    )
+                    for doc in chunks:
+                        yield doc
+                    done += 1
+                    source_progress.fraction = done / len(sheets)
+            else:
+                for i, sheet_name in enumerate(sheets):
+                    blocks = iter_sheet_blocks(tmp.name, sheet_name, settings.EXCEL_BLOCK_ROWS)
+                    async for doc in self._iter_block_chunks(blocks, sheet_name, deduplicator):
+                        yield doc
+                    source_progress.fraction = (i + 1) / len(sheets)
+
+    async def _iter_block_chunks(
+        self,
+        blocks: Iterator[pd.DataFrame],
+        sheet_name: Optional[str] = None,
+        deduplicator: Optional[Deduplicator] = None
+    ) -> AsyncIterator[Document]:
+        """
+        Chunk a stream of row blocks with a single packer, so chunk boundaries and
+        row_range offsets continue across blocks. Blocks are read one ahead on a
+        worker thread to detect the last one.
+        """
+        packer = ChunkPacker(self.chunk_size, self.tokenizer)
+        row_offset = 0
+        block = await asyncio.to_thread(next, blocks, None)
+        while block is not None:
+            next_block = await asyncio.to_thread(next, blocks, None)
+            # The last block also flushes the packer's partial chunk; the total row
+            # count is only known when the whole source fits in one block
+            final = next_block is None
+            total_rows = len(block) if final and row_offset == 0 else None
+            chunks = await asyncio.to_thread(self._chunk_rows, block, packer, row_offset, total_rows, final, sheet_name, deduplicator)
+            for doc in chunks:
+                yield doc
+            row_offset += len(block)
+            block = next_block
+
+    def _chunk_dataframe(
+        self,
+        df: pd.DataFrame,
+        chat_id: str = None,
+        sheet_name: Optional[str] = None,
+        deduplicator: Optional[Deduplicator] = None
+    ) -> List[Document]:
+        """
+        Chunk a dataframe into documents by packing whole rows up to the
+        token budget, so chunk counts scale with content rather than row count.
         """
         total_rows = len(df)
         total_cols = len(df.columns)
         logger.info(f"Processing dataframe with {total_rows} rows and {total_cols} columns")
-        
-        # For very large dataframes, use smaller chunks to avoid too much information in a single chunk
-        if total_rows > 1000:
-            # Dynamically determine chunk size based on total rows
-            # This ensures efficient processing while maintaining manageable chunk sizes
-            target_chunks =  int(total_rows / 10)
-            rows_per_chunk = total_rows // target_chunks
-            
-            logger.info(f"Large dataframe detected: Creating approximately {target_chunks} chunks "
-                       f"with {rows_per_chunk} rows per chunk")
-            
-            documents = []
-            
-            # Process dataframe in batches
-            for i in range(0, total_rows, rows_per_chunk):
-                end_idx = min(i + rows_per_chunk, total_rows)
-                batch_df = df.iloc[i:end_idx]
-                
-                # Include column headers only in first chunk or if columns are important
-                include_header = (i == 0) or (total_cols < 10)
-                
-                # For wide dataframes, consider chunking by columns as well
-                if total_cols > 20 and total_rows > 500:
-                    # Process wide dataframes in column groups
-                    col_group_size = 10
-                    for j in range(0, total_cols, col_group_size):
-                        end_col = min(j + col_group_size, total_cols)
-                        col_slice = batch_df.iloc[:, j:end_col]
-                        
-                        # Create meaningful chunk with row/column range in metadata
-                        text = DocumentService.clean_text(col_slice.to_string(header=include_header, index=False))
-                        doc = Document(
-                            page_content=DocumentService.clean_text(text),
-                            metadata={
-                                "row_range": f"{i}-{end_idx-1}",
-                                "col_range": f"{j}-{end_col-1}",
-                                "total_rows": total_rows,
-                                "total_cols": total_cols
-                            }
-                        )
-                        documents.append(doc)
-                else:
-                    # For narrower dataframes, chunk by rows only
-                    text = DocumentService.clean_text(batch_df.to_string(header=include_header, index=False))
-                    doc = Document(
-                        page_content=DocumentService.clean_text(text),
-                        metadata={
-                            "row_range": f"{i}-{end_idx-1}",
-                            "total_rows": total_rows,
-                            "total_cols": total_cols
-                        }
-                    )
-                    documents.append(doc)
-            
-            logger.info(f"Created {len(documents)} chunks from dataframe")
-            return documents
-        else:
-            # For smaller dataframes, use a simpler approach with fewer chunks
-            if total_rows <= 100:
-                # Very small dataframes - just one document
-                text = DocumentService.clean_text(df.to_string(header=True, index=False))
-                doc = Document(page_content=DocumentService.clean_text(text), metadata={"total_rows": total_rows, "total_cols": total_cols})
-                return [doc]
-            else:
-                # Medium dataframes - a few chunks
-                rows_per_chunk = 100
-                documents = []
-                
-                for i in range(0, total_rows, rows_per_chunk):
-                    end_idx = min(i + rows_per_chunk, total_rows)
-                    batch_df = df.iloc[i:end_idx]
-                    text = DocumentService.clean_text(batch_df.to_string(header=(i==0), index=False))
-                    doc = Document(
-                        page_content=DocumentService.clean_text(text),
-                        metadata={
-                            "row_range": f"{i}-{end_idx-1}",
-                            "total_rows": total_rows
-                        }
-                    )
-                    documents.append(doc)
-                
-                logger.info(f"Created {len(documents)} chunks from medium-sized dataframe")
-                return documents
 
-    async def _store_vectors(self, documents: List[Document], filename: str, mime_type: str, file_id: str, chat_id: str):
-        """Create embeddings and store in MongoDB using optimized batch processing"""
+        packer = ChunkPacker(self.chunk_size, self.tokenizer)
+        return self._chunk_rows(df, packer, total_rows=total_rows, sheet_name=sheet_name, deduplicator=deduplicator)
+
+    def _chunk_rows(
+        self,
+        df: pd.DataFrame,
+        packer: ChunkPacker,
+        row_offset: int = 0,
+        total_rows: Optional[int] = None,
+        final: bool = True,
+        sheet_name: Optional[str] = None,
+        deduplicator: Optional[Deduplicator] = None
+    ) -> List[Document]:
+        """
+        Serialize a (block of a) dataframe and pack its rows into chunks.
+
+        Args:
+            df: The rows to chunk
+            packer: Row packer; shared across blocks when streaming a large file
+            row_offset: Index of the first row of `df` within the whole file, used for row_range
+            total_rows: Row count of the whole file when known; omitted from metadata otherwise
+            final: Flush the packer's partial chunk after these rows
+            sheet_name: Workbook sheet the rows belong to, stored as `sheet` metadata
+            deduplicator: Drops rows that repeat an earlier row and records which chunk holds each kept row
+        """
+        if deduplicator is None:
+            return self._pack_rows(serialize_rows(df), packer, len(df.columns), row_offset, total_rows, final, sheet_name)
+        rows, fields, comments = serialize_row_parts(df)
+        return self._pack_rows(rows, packer, len(df.columns), row_offset, total_rows, final, sheet_name, deduplicator,
+                               fields, comments)
+
+    def _pack_rows(
+        self,
+        rows: List[str],
+        packer: ChunkPacker,
+        total_cols: int,
+        row_offset: int = 0,
+        total_rows: Optional[int] = None,
+        final: bool = True,
+        sheet_name: Optional[str] = None,
+        deduplicator: Optional[Deduplicator] = None,
+        fields: Optional[List[str]] = None,
+        comments: Optional[List[str]] = None
+    ) -> List[Document]:
+        """
+        Pack already serialized rows into chunk Documents (see _chunk_rows).
+        `fields` and `comments` split the rows for deduplication (see serialize_row_parts).
+        """
+        if deduplicator is not None:
+            # Duplicates become empty units, which the packer skips without shifting row indexes
+            rows = deduplicator.filter(rows, sheet_name, row_offset, fields, comments)
+        chunks = packer.add_many(rows, first_index=row_offset)
+        if final:
+            chunks.extend(packer.flush())
+
+        documents = [self._row_document(chunk, total_rows, total_cols, sheet_name) for chunk in chunks]
+        if deduplicator is not None:
+            for chunk, doc in zip(chunks, documents):
+                deduplicator.track_chunk(doc.id, sheet_name, chunk.first_unit, chunk.last_unit)
+        location = f"sheet '{sheet_name}' " if sheet_name is not None else ""
+        logger.info(f"Created {len(documents)} chunks from {location}rows {row_offset}-{row_offset + len(rows) - 1}")
+        return documents
+
+    @staticmethod
+    def _row_document(chunk: PackedChunk, total_rows: Optional[int], total_cols: int, sheet_name: Optional[str] = None) -> Document:
+        metadata = {"sheet": sheet_name} if sheet_name is not None else {}
+        metadata["row_range"] = f"{chunk.first_unit}-{chunk.last_unit}"
+        if total_rows is not None:
+            metadata["total_rows"] = total_rows
+        metadata["total_cols"] = total_cols
+        return Document(id=str(uuid4()), page_content=chunk.text, metadata=metadata)
+
+    @staticmethod
+    def _new_deduplicator() -> Optional[Deduplicator]:
+        if not settings.DEDUP_ENABLED:
+            return None
+        return Deduplicator(
+            threshold=settings.DEDUP_NEAR_THRESHOLD,
+            num_perm=settings.DEDUP_NUM_PERM,
+            bands=settings.DEDUP_LSH_BANDS,
+        )
+
+    async def _store_occurrences(self, deduplicator: Optional[Deduplicator], chat_id: str) -> int:
+        """
+        Record how often collapsed rows occurred on the stored chunks that hold them.
+
+        Counts are only final once the whole file has been read, so they are
+        written after the chunks are inserted, as an `occurrences` list on each
+        affected chunk giving how many times each of its rows appeared.
+
+        Returns:
+            Number of duplicate rows that were not embedded
+        """
+        if deduplicator is None:
+            return 0
+        stats = deduplicator.stats()
+        removed = stats["exact_duplicates"] + stats["near_duplicates"]
+        occurrences = deduplicator.chunk_occurrences()
+        if occurrences:
+            operations = [
+                UpdateOne({"_id": chunk_id}, {"$set": {"occurrences": counts}})
+                for chunk_id, counts in occurrences.items()
+            ]
+            vectors_collection = MongoDB.get_db().evaluations_vectors
+            await asyncio.to_thread(vectors_collection.bulk_write, operations, ordered=False)
+            chat_vector_cache.update_metadata(chat_id, {
+                chunk_id: {"occurrences": counts} for chunk_id, counts in occurrences.items()
+            })
+        logger.info(f"Deduplication: {stats['unique_units']} unique rows, {stats['exact_duplicates']} exact and "
+                    f"{stats['near_duplicates']} near duplicates collapsed into {len(occurrences)} chunks")
+        return removed
+
+    async def _store_vectors(
+        self,
+        documents: Union[List[Document], AsyncIterable[Document]],
+        filename: str,
+        mime_type: str,
+        file_id: str,
+        chat_id: str,
+        source_progress: Optional[SourceProgress] = None
+    ) -> Dict[str, int]:
+        """
+        Create embeddings and store in MongoDB using a pipelined batch stage.
+
+        Several embedding batches are in flight at once (bounded by
+        EMBEDDING_MAX_CONCURRENCY) and each batch is inserted with an unordered
+        bulk write on a worker thread as soon as its embeddings arrive, so the
+        insert for batch N overlaps with embedding of batch N+1 and the event
+        loop stays free for other requests.
+
+        `documents` may be a list or an async iterator of chunks. Iterators are
+        consumed in fixed-size windows and the bounded number of in-flight
+        batches applies backpressure to the loader.
+
+        Returns:
+            Chunk count and embedding cache statistics for this upload
+        """
         db = MongoDB.get_db()
         vectors_collection = db.evaluations_vectors
-        
-        # Ensure each document has the correct metadata
-        for doc in documents:
-            # Set all necessary metadata fields
-            doc.metadata["source"] = chat_id
-            doc.metadata["file_id"] = file_id
-            doc.metadata["filename"] = filename
-            doc.metadata["mime_type"] = mime_type
-            # Keep any existing metadata like page numbers
-        
-        # Create vector store for index management
-        vector_store = MongoDBAtlasVectorSearch(
-            collection=vectors_collection,
-            embedding=self.embeddings,
-            index_name=self.vector_index_name,
-            relevance_score_fn="cosine",
-        )
-        
-        # Process documents in optimized batches
-        batch_size = 100  # Adjust based on performance testing
-        total_documents = len(documents)
-        
-        logger.info(f"Processing {total_documents} documents in batches of {batch_size}")
+
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        max_concurrency = max(1, settings.EMBEDDING_MAX_CONCURRENCY)
+        total_documents = len(documents) if isinstance(documents, list) else None
+        total_batches = (total_documents + batch_size - 1) // batch_size if total_documents is not None else None
+
+        logger.info(f"Processing {total_documents if total_documents is not None else 'streamed'} documents "
+                    f"in batches of {batch_size} ({max_concurrency} embedding batches in flight)")
         start_time = time.time()
-        # Process all documents in batches
-        for i in range(0, total_documents, batch_size):
+        stats = {"cache_hits": 0, "cache_misses": 0, "processed_chunks": 0, "completed_batches": 0}
+        embedding_slots = asyncio.Semaphore(max_concurrency)
+
+        async def embed_and_insert(batch_number: int, batch_documents: List[Document]):
             batch_start_time = time.time()
-            batch_end = min(i + batch_size, total_documents)
-            batch_documents = documents[i:batch_end]
-            
-            # Calculate batch progress (0-100% within the vectorizing stage)
-            batch_progress = (i / total_documents) * 100
-            batch_number = i//batch_size + 1
-            total_batches = (total_documents + batch_size - 1)//batch_size
-            
-            # Calculate processed comments (chunks)
-            processed_chunks = min(i + batch_size, total_documents)
-            
-            # Calculate more granular progress for smoother updates
-            # Use a logarithmic scale to make early progress appear faster
-            import math
-            # Adjust the progress calculation to be more granular
-            # This creates a more continuous feeling of progress
-            adjusted_progress = batch_progress
-            if batch_number > 1:
-                # Add small increments between batches for smoother transitions
-                sub_batch_progress = (time.time() - batch_start_time) / 5  # Assuming ~5 seconds per batch
-                sub_batch_progress = min(sub_batch_progress, 1.0)  # Cap at 100% of a sub-batch
-                adjusted_progress = ((batch_number - 1) / total_batches * 100) + (100 / total_batches * sub_batch_progress)
-            
-            # Update progress with more detailed message and stats
-            self.update_stage_progress(
-                file_id,
-                "vectorizing",
-                adjusted_progress,
-                f"Creating embeddings (batch {batch_number}/{total_batches})",
-                {
-                    "processed_chunks": processed_chunks,
-                    "total_chunks": total_documents,
-                    "current_batch": batch_number,
-                    "total_batches": total_batches,
-                    "estimated_time_remaining": f"{(total_batches - batch_number) * 5} seconds"
-                }
-            )
-            
-            # Extract text content for batch embedding and clean it
-            texts = [DocumentService.clean_text(doc.page_content) for doc in batch_documents]
-            
-            # Generate embeddings for the entire batch at once
-            batch_embeddings = self.embeddings.embed_documents(texts)
-            
-            # Prepare bulk operations
-            bulk_operations = []
-            
+
+            # Loaders emit cleaned text (one row per line for spreadsheets), so it is stored as-is
+            texts = [doc.page_content for doc in batch_documents]
+
+            # Only the embedding call holds a slot, so the insert below overlaps with the next batch's embedding
+            async with embedding_slots:
+                batch_embeddings, batch_hits, batch_misses = await embedding_cache.aembed_documents(self.embeddings, texts)
+
             # Create document entries with embeddings
-            for j, (doc, embedding) in enumerate(zip(batch_documents, batch_embeddings)):
-                doc_id = str(uuid4())
-                
-                # Create document with embedding
-                # Clean the text content
-                clean_text = DocumentService.clean_text(doc.page_content)
-                
+            vector_docs = []
+            stored_embeddings = encode_vectors(batch_embeddings, settings.EMBEDDING_STORAGE_FORMAT)
+            for doc, text, embedding in zip(batch_documents, texts, stored_embeddings):
                 vector_doc = {
-                    "_id": doc_id,
+                    "_id": doc.id or str(uuid4()),
                     "embedding": embedding,
-                    "text": clean_text,
+                    "text": text,
                     "source": chat_id,
                     "file_id": file_id,
                     "filename": filename,
                     "mime_type": mime_type
                 }
-                
-                # Add any additional metadata
+
+                # Keep any existing metadata like page numbers
                 for key, value in doc.metadata.items():
                     if key not in ["source", "file_id", "filename", "mime_type"]:
                         vector_doc[key] = value
-                
-                # Add to bulk operations
-                bulk_operations.append(InsertOne(vector_doc))
-            
-            # Execute bulk insert
-            if bulk_operations:
-                result = vectors_collection.bulk_write(bulk_operations)
-                batch_time = time.time() - batch_start_time
-                logger.info(f"Batch {i//batch_size + 1}/{(total_documents + batch_size - 1)//batch_size}: "
-                           f"Inserted {result.inserted_count} documents in {batch_time:.2f}s "
-                           f"({result.inserted_count/batch_time:.1f} docs/s)")
-        
+
+                vector_docs.append(vector_doc)
+
+            inserted_count = 0
+            if vector_docs:
+                bulk_operations = [InsertOne(vector_doc) for vector_doc in vector_docs]
+                result = await asyncio.to_thread(vectors_collection.bulk_write, bulk_operations, ordered=False)
+                inserted_count = result.inserted_count
+                # Keep the chat's in-memory search matrix current if it is cached
+                await asyncio.to_thread(chat_vector_cache.add, chat_id, vector_docs)
+
+            stats["cache_hits"] += batch_hits
+            stats["cache_misses"] += batch_misses
+            stats["processed_chunks"] += len(batch_documents)
+            stats["completed_batches"] += 1
+
+            batch_time = time.time() - batch_start_time
+            logger.info(f"Batch {batch_number}/{total_batches or '?'}: "
+                        f"Inserted {inserted_count} documents in {batch_time:.2f}s "
+                        f"({inserted_count/batch_time:.1f} docs/s)")
+
+            # Estimate progress and remaining time from the observed throughput so far
+            elapsed = time.time() - start_time
+            if total_documents is not None:
+                completion = stats["processed_chunks"] / total_documents
+                message = f"Creating embeddings (batch {stats['completed_batches']}/{total_batches})"
+            else:
+                completion = source_progress.fraction if source_progress else 0
+                message = f"Creating embeddings ({stats['processed_chunks']} chunks stored)"
+            remaining_seconds = int(elapsed / completion - elapsed) if completion > 0 else 0
+            self.update_stage_progress(
+                file_id,
+                "vectorizing",
+                completion * 100,
+                message,
+                {
+                    "processed_chunks": stats["processed_chunks"],
+                    "total_chunks": total_documents,
+                    "current_batch": stats["completed_batches"],
+                    "total_batches": total_batches,
+                    "estimated_time_remaining": f"{remaining_seconds} seconds"
+                }
+            )
+
+        # Keep a bounded number of batches in flight: enough to saturate the
+        # embedding slots while earlier batches are still being inserted
+        max_in_flight = max_concurrency * 2
+        in_flight = set()
+        batch_number = 0
+        try:
+            async for batch_documents in DocumentService._iter_windows(documents, batch_size):
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    DocumentService._raise_first_error(done)
+                batch_number += 1
+                in_flight.add(asyncio.create_task(embed_and_insert(batch_number, batch_documents)))
+            if in_flight:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_EXCEPTION)
+                DocumentService._raise_first_error(done)
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+            raise
+
         total_time = time.time() - start_time
-        logger.info(f"Total processing time: {total_time:.2f}s for {total_documents} documents "
-                   f"({total_documents/total_time:.1f} docs/s)")
-        
+        processed = stats["processed_chunks"]
+        logger.info(f"Total processing time: {total_time:.2f}s for {processed} documents "
+                   f"({processed/total_time:.1f} docs/s), "
+                   f"embedding cache: {stats['cache_hits']} hits / {stats['cache_misses']} misses")
+
         # Ensure vector search index exists
         try:
-            vector_store.create_vector_search_index(
-                dimensions=3072,  # For text-embedding-3-large
-                filters=[{"type": "filter", "path": "source"}],
-                update=True
+            await asyncio.to_thread(
+                ensure_vector_index, db, vectors_collection.name, self.vector_index_name, ["source"]
             )
         except Exception as e:
             logger.warning(f"Vector index creation warning (may already exist): {e}")
 
+        return {"chunks": processed, "cache_hits": stats["cache_hits"], "cache_misses": stats["cache_misses"]}
+
+    @staticmethod
+    async def _iter_windows(documents: Union[List[Document], AsyncIterable[Document]], size: int) -> AsyncIterator[List[Document]]:
+        """Group a list or async iterator of chunks into windows of at most `size` documents"""
+        if isinstance(documents, list):
+            for i in range(0, len(documents), size):
+                yield documents[i:i + size]
+            return
+
+        window = []
+        async for doc in documents:
+            window.append(doc)
+            if len(window) >= size:
+                yield window
+                window = []
+        if window:
+            yield window
+
+    @staticmethod
+    def _raise_first_error(tasks):
+        """Re-raise the first failure among finished pipeline tasks, marking every exception as retrieved"""
+        errors = [task.exception() for task in tasks if not task.cancelled()]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise errors[0]
+
     async def process_file_content(self, content: bytes, filename: str, chat_id: str):
         """
         Process file content directly without saving to disk
@@ -507,7 +778,8 @@ class DocumentService:
             
             # Get document chunks
             # Get document chunks
-            documents = await self._load_and_chunk_file(file_obj, file_type, encoding, chat_id)
+            deduplicator = self._new_deduplicator()
+            documents = await self._load_and_chunk_file(file_obj, file_type, encoding, chat_id, deduplicator)
             
             # Ensure all document content is properly cleaned
             for doc in documents:
@@ -515,6 +787,7 @@ class DocumentService:
             
             # Create vectors and store in MongoDB
             await self._store_vectors(documents, filename, f"application/{file_type}", file_id, chat_id)
+            await self._store_occurrences(deduplicator, chat_id)
             
             return "File content processed and stored successfully"
             
@@ -532,6 +805,7 @@ class DocumentService:
             
             # Delete all vectors with matching file_id
             delete_result = vectors_collection.delete_many({"file_id": file_id})
+            chat_vector_cache.invalidate_file(file_id)
             
             logger.info(f"Deleted {delete_result.deleted_count} vectors for file {file_id}")
             return delete_result.deleted_count
@@ -548,6 +822,7 @@ class DocumentService:
             
             # Delete all vectors with matching chat_id
             delete_result = vectors_collection.delete_many({"source": chat_id})
+            chat_vector_cache.invalidate_chat(chat_id)
             
             return delete_result.deleted_count
             
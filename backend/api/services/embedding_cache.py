@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo.operations import UpdateOne
+
+from ..config.settings import settings
+from ..database.mongodb import MongoDB
+from ..database.vector_index import NATIVE_DIMENSIONS
+from ..utils.logger import logger
+
+
+class EmbeddingCache:
+    """
+    Content-addressed cache of chunk embeddings.
+
+    Entries are keyed by a hash of the cleaned chunk text, the embedding model
+    name and the embedding dimensions. Lookups go through a bounded in-process
+    LRU tier first and fall back to a persistent MongoDB tier, so only true
+    misses have to be sent to the embeddings API.
+    """
+
+    def __init__(self, max_entries: int = 20000, collection_name: str = "embedding_cache", enabled: bool = True):
+        self.max_entries = max_entries
+        self.collection_name = collection_name
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, model: str, dimensions: int) -> str:
+        """Build the cache key for a chunk of cleaned text"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model}:{dimensions}:{digest}"
+
+    def _collection(self):
+        db = MongoDB.get_db()
+        return db[self.collection_name] if db is not None else None
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+            return embedding
+
+    def _put_local(self, key: str, embedding: List[float]):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        """Return the cached embeddings for the given keys, checking the LRU tier before MongoDB"""
+        found = {}
+        remote_keys = []
+        for key in keys:
+            embedding = self._get_local(key)
+            if embedding is not None:
+                found[key] = embedding
+            else:
+                remote_keys.append(key)
+
+        collection = self._collection()
+        if remote_keys and collection is not None:
+            try:
+                cursor = collection.find({"_id": {"$in": remote_keys}}, {"embedding": 1})
+                for entry in cursor:
+                    found[entry["_id"]] = entry["embedding"]
+                    self._put_local(entry["_id"], entry["embedding"])
+            except Exception as e:
+                logger.warning(f"Embedding cache lookup failed, falling back to API: {e}")
+        return found
+
+    def put_many(self, items: Dict[str, List[float]], model: str, dimensions: int):
+        """Store freshly computed embeddings in both cache tiers"""
+        for key, embedding in items.items():
+            self._put_local(key, embedding)
+
+        collection = self._collection()
+        if not items or collection is None:
+            return
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"_id": key},
+                {"$setOnInsert": {
+                    "embedding": embedding,
+                    "model": model,
+                    "dimensions": dimensions,
+                    "created_at": now,
+                }},
+                upsert=True,
+            )
+            for key, embedding in items.items()
+        ]
+        try:
+            collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.warning(f"Failed to persist {len(operations)} cached embeddings: {e}")
+
+    def _plan(self, embeddings, texts: List[str]) -> Tuple[str, int, List[str]]:
+        model = embeddings.model
+        dimensions = embeddings.dimensions or NATIVE_DIMENSIONS.get(model, 0)
+        return model, dimensions, [self.make_key(text, model, dimensions) for text in texts]
+
+    @staticmethod
+    def _missing(keys: List[str], texts: List[str], found: Dict[str, List[float]]) -> Dict[str, str]:
+        # Embed each distinct missing text once, even if it repeats within the batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return missing
+
+    def _finish(self, keys: List[str], found: Dict[str, List[float]], misses: int) -> Tuple[List[List[float]], int, int]:
+        hits = len(keys) - misses
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+        return [found[key] for key in keys], hits, misses
+
+    def embed_documents(self, embeddings, texts: List[str]) -> Tuple[List[List[float]], int, int]:
+        """
+        Embed texts, only calling the embeddings client for cache misses.
+
+        Args:
+            embeddings: The LangChain embeddings client used for misses
+            texts: Cleaned chunk texts
+
+        Returns:
+            Tuple of (embeddings in input order, cache hits, cache misses)
+        """
+        if not self.enabled:
+            return embeddings.embed_documents(texts), 0, len(texts)
+
+        model, dimensions, keys = self._plan(embeddings, texts)
+        found = self.get_many(keys)
+        missing = self._missing(keys, texts, found)
+        if missing:
+            fresh = dict(zip(missing.keys(), embeddings.embed_documents(list(missing.values()))))
+            self.put_many(fresh, model, dimensions)
+            found.update(fresh)
+        return self._finish(keys, found, len(missing))
+
+    async def aembed_documents(self, embeddings, texts: List[str]) -> Tuple[List[List[float]], int, int]:
+        """Async variant of embed_documents; MongoDB lookups and writes run on a worker thread"""
+        if not self.enabled:
+            return await embeddings.aembed_documents(texts), 0, len(texts)
+
+        model, dimensions, keys = self._plan(embeddings, texts)
+        found = await asyncio.to_thread(self.get_many, keys)
+        missing = self._missing(keys, texts, found)
+        if missing:
+            fresh = dict(zip(missing.keys(), await embeddings.aembed_documents(list(missing.values()))))
+            await asyncio.to_thread(self.put_many, fresh, model, dimensions)
+            found.update(fresh)
+        return self._finish(keys, found, len(missing))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+embedding_cache = EmbeddingCache(
+    max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+    collection_name=settings.EMBEDDING_CACHE_COLLECTION,
+    enabled=settings.EMBEDDING_CACHE_ENABLED,
+)
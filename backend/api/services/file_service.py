@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 from ..database.mongodb import MongoDB
 from ..models.file import FileModel
 from ..utils.logger import logger
+from ..utils.construction_stats import record_construction
+from .answer_cache import answer_cache
 from .document_service import DocumentService
 from typing import Optional
 from ..models.user import UserInDB
@@ -11,8 +13,12 @@ from ..models.user import UserInDB
 load_dotenv()
 
 class FileService:
-    @staticmethod
+    def __init__(self, document_service: Optional[DocumentService] = None):
+        record_construction("FileService")
+        self.document_service = document_service or DocumentService()
+
     async def save_file(
+        self,
         file: UploadFile,
         file_id: str,
         user_id: Optional[str] = None,
@@ -22,9 +28,11 @@ class FileService:
             if not current_user or not current_user.active_chat_id:
                 raise HTTPException(status_code=400, detail="No active chat session")
 
+            # The chat's answers are stale from the first stored batch until the file is recorded
+            answer_cache.invalidate_chat(current_user.active_chat_id)
+
             # Process document with optimized batch processing
-            doc_service = DocumentService()
-            processing_result = await doc_service.process_file(
+            processing_result = await self.document_service.process_file(
                 file.file,
                 file.filename,
                 file.content_type,
@@ -47,36 +55,44 @@ class FileService:
                 processing_metrics={
                     "chunks_created": processing_result.get("chunks_created", 0),
                     "processing_time_seconds": processing_result.get("total_processing_time_seconds", 0),
-                    "processing_rate": processing_result.get("processing_rate", 0)
+                    "processing_rate": processing_result.get("processing_rate", 0),
+                    "embedding_cache_hits": processing_result.get("embedding_cache_hits", 0),
+                    "embedding_cache_misses": processing_result.get("embedding_cache_misses", 0),
+                    "duplicates_removed": processing_result.get("duplicates_removed", 0)
                 }
             )
             
             # Save file metadata to MongoDB
             db = MongoDB.get_db()
             db.files.insert_one(file_doc.dict())
+            answer_cache.invalidate_chat(current_user.active_chat_id)
             
             logger.info(f"File processed successfully: {file.filename} with {processing_result.get('chunks_created', 0)} chunks")
             return file_doc
             
         except Exception as e:
             logger.error(f"Error processing file: {e}")
+            if current_user and current_user.active_chat_id:
+                # Some of the file's vectors may have been stored
+                answer_cache.invalidate_chat(current_user.active_chat_id)
             raise
 
-    @staticmethod
-    async def delete_file(file_id: str):
+    async def delete_file(self, file_id: str):
         try:
             # Get MongoDB connection
             db = MongoDB.get_db()
             
             # Delete file metadata from MongoDB
-            delete_result = db.files.delete_one({"file_id": file_id})
+            file_doc = db.files.find_one_and_delete({"file_id": file_id})
             
-            if delete_result.deleted_count == 0:
+            if file_doc is None:
                 raise Exception(f"File with id {file_id} not found")
+            # Invalidated again once the vectors are gone, for answers generated in between
+            answer_cache.invalidate_chat(file_doc.get("chat_id"))
             
             # Delete vectors associated with the file
-            doc_service = DocumentService()
-            await doc_service.delete_file_vectors(file_id)
+            await self.document_service.delete_file_vectors(file_id)
+            answer_cache.invalidate_chat(file_doc.get("chat_id"))
             
             logger.info(f"File and associated vectors deleted successfully: {file_id}")
             return True
@@ -93,6 +109,7 @@ class FileService:
             
             # Delete all vectors with matching chat_id
             delete_result = file_collection.delete_many({"chat_id": chat_id})
+            answer_cache.invalidate_chat(chat_id)
             
             return delete_result.deleted_count
             
@@ -0,0 +1,87 @@
+"""
+Push notifications for file processing progress.
+
+DocumentService.update_progress publishes the file ID here, and each open
+progress stream (see GET /api/files/progress/{file_id}/stream) holds a
+subscription that is woken up. Subscribers read the latest snapshot when they
+wake, so any number of updates between two sends collapse into one, and the
+stream rate is bounded by the reader rather than by how often a stage reports.
+"""
+import asyncio
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Set
+
+
+class ProgressSubscription:
+    """Wake-up flag for one progress stream, bound to the stream's event loop"""
+
+    def __init__(self, file_id: str):
+        self.file_id = file_id
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        # Set first so the stream sends the current snapshot right away
+        self._event.set()
+
+    def notify(self):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._event.set()
+        elif not self._loop.is_closed():
+            # Published from a worker thread
+            self._loop.call_soon_threadsafe(self._event.set)
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait for an update; False when the timeout passed without one"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+
+class ProgressNotifier:
+    def __init__(self):
+        self._subscribers: Dict[str, Set[ProgressSubscription]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.streams_opened = 0
+
+    @contextmanager
+    def subscribe(self, file_id: str) -> Iterator[ProgressSubscription]:
+        subscription = ProgressSubscription(file_id)
+        with self._lock:
+            self._subscribers.setdefault(file_id, set()).add(subscription)
+            self.streams_opened += 1
+        try:
+            yield subscription
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(file_id)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[file_id]
+
+    def publish(self, file_id: str):
+        with self._lock:
+            subscribers = list(self._subscribers.get(file_id, ()))
+            self.published += 1
+        for subscription in subscribers:
+            subscription.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open_streams": sum(len(subscribers) for subscribers in self._subscribers.values()),
+                "files_watched": len(self._subscribers),
+                "streams_opened": self.streams_opened,
+                "published": self.published,
+            }
+
+
+progress_notifier = ProgressNotifier()
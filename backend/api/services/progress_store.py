@@ -0,0 +1,235 @@
+"""
+Storage for file processing progress (see DocumentService.update_progress).
+
+PROGRESS_STORE selects the backend:
+
+- "memory": per-process dict with TTL eviction and a size cap. Enough for a
+  single server process.
+- "mongo": the memory tier for uploads running in this process, plus a
+  MongoDB collection with a TTL index that every worker reads, so a progress
+  request can land on any process. Updates are coalesced per file and written
+  by a background thread in one bulk write every
+  PROGRESS_STORE_FLUSH_INTERVAL_SECONDS; completed, error and cleared
+  entries trigger the next write right away. Once a local entry is complete
+  or failed and written, reads go to the collection, so a file cleared
+  through another worker is not served from this worker's memory.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from pymongo.operations import DeleteOne, ReplaceOne
+
+from ..config.settings import settings
+from ..database.mongodb import MongoDB
+from ..utils.logger import logger
+
+# Statuses after which no further update is expected for a file
+TERMINAL_STATUSES = ("completed", "error")
+
+
+class MemoryProgressStore:
+    """Progress entries of this process, evicted TTL seconds after their last update or oldest first"""
+
+    # Readers of another process's progress poll the store this often (0: updates are always local)
+    poll_seconds = 0
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(file_id)
+            if entry is None:
+                return None
+            progress, expires_at = entry
+            if self.ttl_seconds > 0 and time.monotonic() >= expires_at:
+                del self._entries[file_id]
+                self.evictions += 1
+                return None
+            return progress
+
+    def put(self, file_id: str, progress: Dict[str, Any]):
+        with self._lock:
+            self._entries[file_id] = (progress, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(file_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, file_id: str):
+        with self._lock:
+            self._entries.pop(file_id, None)
+
+    def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+            }
+
+
+class MongoProgressStore:
+    """Memory tier for local uploads, shared MongoDB collection written in batches (see module docstring)"""
+
+    def __init__(self, collection_name: str = "file_progress", max_entries: int = 1000, ttl_seconds: float = 3600,
+                 flush_interval_seconds: float = 1.0):
+        self.collection_name = collection_name
+        self.ttl_seconds = ttl_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self.poll_seconds = flush_interval_seconds
+        self._local = MemoryProgressStore(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        # file ID -> latest progress, or None for a cleared entry
+        self._pending: Dict[str, Optional[Dict[str, Any]]] = {}
+        # The batch being written; its entries are not in the collection yet either
+        self._writing: Dict[str, Optional[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self.updates = 0
+        self.flushes = 0
+        self.documents_written = 0
+        self.remote_reads = 0
+        self.write_errors = 0
+
+    def _collection(self):
+        db = MongoDB.get_db()
+        return db[self.collection_name] if db is not None else None
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        progress = self._local.get(file_id)
+        if progress is None:
+            return self._read_shared(file_id)
+        if progress.get("status") not in TERMINAL_STATUSES:
+            # Still processing here, so this process has the latest update
+            return progress
+        with self._lock:
+            if file_id in self._pending or file_id in self._writing:
+                return progress
+
+        # A finished upload may since have been cleared through another worker
+        shared = self._read_shared(file_id, fallback=progress)
+        if shared is None:
+            self._local.delete(file_id)
+        return shared
+
+    def _read_shared(self, file_id: str, fallback: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """The collection's copy, or `fallback` if it could not be read"""
+        collection = self._collection()
+        if collection is None:
+            return fallback
+        self.remote_reads += 1
+        try:
+            # The TTL monitor only runs once a minute
+            document = collection.find_one({"_id": file_id, "expires_at": {"$gt": datetime.utcnow()}},
+                                           {"_id": 0, "progress": 1})
+        except Exception as e:
+            logger.warning(f"Failed to read progress of file {file_id}: {e}")
+            return fallback
+        return document["progress"] if document else None
+
+    def put(self, file_id: str, progress: Dict[str, Any]):
+        self._local.put(file_id, progress)
+        self._queue(file_id, progress, urgent=progress.get("status") in TERMINAL_STATUSES)
+
+    def delete(self, file_id: str):
+        self._local.delete(file_id)
+        self._queue(file_id, None, urgent=True)
+
+    def _queue(self, file_id: str, progress: Optional[Dict[str, Any]], urgent: bool):
+        with self._lock:
+            self._pending[file_id] = progress
+            self.updates += 1
+            if self._flusher is None and not self._closed.is_set():
+                self._flusher = threading.Thread(target=self._run, name="progress-store-flush", daemon=True)
+                self._flusher.start()
+        if urgent:
+            self._wake.set()
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Write the pending updates in one bulk write"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._writing = pending
+        try:
+            self._write(pending)
+        finally:
+            with self._lock:
+                self._writing = {}
+
+    def _write(self, pending: Dict[str, Optional[Dict[str, Any]]]):
+        collection = self._collection()
+        if not pending or collection is None:
+            return
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl_seconds)
+        operations = [
+            ReplaceOne({"_id": file_id}, {"progress": progress, "expires_at": expires_at}, upsert=True)
+            if progress is not None else DeleteOne({"_id": file_id})
+            for file_id, progress in pending.items()
+        ]
+        try:
+            collection.bulk_write(operations, ordered=False)
+            self.flushes += 1
+            self.documents_written += len(operations)
+        except Exception as e:
+            # Progress is advisory; the next update of a file writes it again
+            self.write_errors += 1
+            logger.warning(f"Failed to write progress of {len(operations)} files: {e}")
+
+    def close(self):
+        """Stop the flusher and write what is still pending"""
+        self._closed.set()
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            **self._local.stats(),
+            "backend": "mongo",
+            "pending": pending,
+            "updates": self.updates,
+            "flushes": self.flushes,
+            "documents_written": self.documents_written,
+            "remote_reads": self.remote_reads,
+            "write_errors": self.write_errors,
+        }
+
+
+def create_progress_store():
+    if settings.PROGRESS_STORE == "mongo":
+        return MongoProgressStore(
+            collection_name=settings.PROGRESS_STORE_COLLECTION,
+            max_entries=settings.PROGRESS_STORE_MAX_ENTRIES,
+            ttl_seconds=settings.PROGRESS_STORE_TTL_SECONDS,
+            flush_interval_seconds=settings.PROGRESS_STORE_FLUSH_INTERVAL_SECONDS,
+        )
+    if settings.PROGRESS_STORE != "memory":
+        logger.warning(f"Unknown PROGRESS_STORE {settings.PROGRESS_STORE!r}, using the in-memory store")
+    return MemoryProgressStore(
+        max_entries=settings.PROGRESS_STORE_MAX_ENTRIES,
+        ttl_seconds=settings.PROGRESS_STORE_TTL_SECONDS,
+    )
+
+
+progress_store = create_progress_store()
@@ -0,0 +1,223 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from ..config.settings import settings
+from ..utils.logger import logger
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query used as the cache key"""
+    return " ".join(query.split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    TTL + LRU cache of search query embeddings keyed by model and normalized query.
+
+    Concurrent lookups of the same uncached query are coalesced: the first
+    caller computes the embedding and every other caller waits on the same
+    in-flight future instead of sending its own request ("single flight").
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 3600, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[List[float], float]]" = OrderedDict()
+        self._in_flight: Dict[Tuple[str, str], Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._miss_seconds = 0.0
+
+    def _lookup(self, key: Tuple[str, str]) -> Tuple[List[float], Future, bool]:
+        """Return (cached embedding, future to wait on, whether the caller must compute)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                embedding, expires_at = entry
+                if self.ttl_seconds <= 0 or time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding, None, False
+                del self._entries[key]
+
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return None, future, False
+
+            future = Future()
+            self._in_flight[key] = future
+            self.misses += 1
+            return None, future, True
+
+    def _store(self, key: Tuple[str, str], future: Future, embedding: List[float], elapsed: float):
+        with self._lock:
+            self._entries[key] = (embedding, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._in_flight.pop(key, None)
+            self._miss_seconds += elapsed
+        future.set_result(embedding)
+
+    def _fail(self, key: Tuple[str, str], future: Future, error: BaseException):
+        # Errors are not cached; waiting callers see the error and the next lookup retries
+        with self._lock:
+            self._in_flight.pop(key, None)
+            self.errors += 1
+        future.set_exception(error)
+
+    def get_or_compute(self, model: str, query: str, compute: Callable[[str], List[float]]) -> List[float]:
+        if not self.enabled:
+            return compute(query)
+        key = (model, normalize_query(query))
+        embedding, future, owner = self._lookup(key)
+        if embedding is not None:
+            return embedding
+        if not owner:
+            return future.result()
+
+        start = time.perf_counter()
+        try:
+            embedding = compute(query)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        self._store(key, future, embedding, time.perf_counter() - start)
+        return embedding
+
+    async def aget_or_compute(self, model: str, query: str, compute) -> List[float]:
+        """Async variant; `compute` is a coroutine function"""
+        if not self.enabled:
+            return await compute(query)
+        key = (model, normalize_query(query))
+        embedding, future, owner = self._lookup(key)
+        if embedding is not None:
+            return embedding
+        if not owner:
+            return await asyncio.wrap_future(future)
+
+        start = time.perf_counter()
+        try:
+            embedding = await compute(query)
+        except BaseException as e:
+            self._fail(key, future, e)
+            raise
+        self._store(key, future, embedding, time.perf_counter() - start)
+        return embedding
+
+    async def aget_or_compute_many(self, model: str, queries: List[str], compute_many) -> List[List[float]]:
+        """
+        Async lookup of several queries; the misses are embedded together with one
+        `compute_many` call (a coroutine function taking a list of queries).
+        """
+        if not self.enabled:
+            return await compute_many(queries) if queries else []
+
+        results: List[Optional[List[float]]] = [None] * len(queries)
+        owned: Dict[Tuple[str, str], Tuple[Future, str]] = {}
+        waiting: List[Tuple[int, Future]] = []
+        for i, query in enumerate(queries):
+            key = (model, normalize_query(query))
+            embedding, future, owner = self._lookup(key)
+            if embedding is not None:
+                results[i] = embedding
+            elif owner:
+                owned[key] = (future, query)
+                waiting.append((i, future))
+            else:
+                # In flight elsewhere, or a repeat of a query owned earlier in this batch
+                waiting.append((i, future))
+
+        if owned:
+            start = time.perf_counter()
+            try:
+                embeddings = await compute_many([query for _, query in owned.values()])
+            except BaseException as e:
+                for key, (future, _) in owned.items():
+                    self._fail(key, future, e)
+                raise
+            # Each query would otherwise have taken a full round trip of its own
+            elapsed = time.perf_counter() - start
+            for (key, (future, _)), embedding in zip(owned.items(), embeddings):
+                self._store(key, future, embedding, elapsed)
+
+        for i, future in waiting:
+            results[i] = await asyncio.wrap_future(future)
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            computed = self.misses - self.errors - len(self._in_flight)
+            avg_miss = self._miss_seconds / computed if computed > 0 else 0.0
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "in_flight": len(self._in_flight),
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                "avg_miss_latency_ms": round(avg_miss * 1000, 1),
+                # Every hit skips one embedding round trip of roughly the average miss latency;
+                # coalesced waiters skip a request but still wait for the in-flight one
+                "estimated_latency_saved_seconds": round(self.hits * avg_miss, 2),
+                "requests_saved": self.hits + self.coalesced,
+            }
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves embed_query through a QueryEmbeddingCache.
+
+    Document embedding is passed straight through; chunk embeddings have their
+    own content-addressed cache in DocumentService.
+    """
+
+    def __init__(self, embeddings: Embeddings, cache: "QueryEmbeddingCache"):
+        self.embeddings = embeddings
+        self.cache = cache
+        model = getattr(embeddings, "model", type(embeddings).__name__)
+        dimensions = getattr(embeddings, "dimensions", None)
+        self.cache_model = f"{model}:{dimensions}" if dimensions else model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cache.get_or_compute(self.cache_model, text, self.embeddings.embed_query)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.cache.aget_or_compute(self.cache_model, text, self.embeddings.aembed_query)
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries, sending all cache misses in one embeddings request"""
+        # OpenAI query and document embeddings are the same vectors, so misses go out as one batch
+        return await self.cache.aget_or_compute_many(self.cache_model, texts, self.embeddings.aembed_documents)
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.QUERY_EMBEDDING_CACHE_TTL_SECONDS,
+    enabled=settings.QUERY_EMBEDDING_CACHE_ENABLED,
+)
+logger.debug(f"Query embedding cache enabled: {query_embedding_cache.enabled}")
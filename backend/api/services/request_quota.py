@@ -0,0 +1,48 @@
+from typing import Any, Dict, Optional
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from ..database.mongodb import MongoDB
+from ..models.user import UserInDB
+from ..utils.logger import logger
+from .user_cache import user_cache
+
+_DEFAULT_LIMIT = UserInDB.model_fields["requests_limit"].default
+
+
+async def reserve_request(user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Count one chat request against the user's quota.
+
+    The limit check and the increment are a single conditional
+    find-and-modify, so concurrent requests cannot both take the last
+    request. Returns the updated user document, or None if the quota is used up.
+    """
+    user = await MongoDB.get_async_db().users.find_one_and_update(
+        {
+            "_id": ObjectId(user_id),
+            "$expr": {"$lt": [{"$ifNull": ["$requests_used", 0]}, {"$ifNull": ["$requests_limit", _DEFAULT_LIMIT]}]},
+        },
+        {"$inc": {"requests_used": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if user is not None:
+        user_cache.put_document(user)
+    else:
+        # The cached copy may still show requests left
+        user_cache.invalidate(user_id)
+    return user
+
+
+async def refund_request(user_id: str):
+    """Give back a reserved request that produced no answer"""
+    try:
+        await MongoDB.get_async_db().users.update_one(
+            {"_id": ObjectId(user_id), "requests_used": {"$gt": 0}},
+            {"$inc": {"requests_used": -1}},
+        )
+    except Exception as e:
+        logger.error(f"Failed to refund a request to user {user_id}: {e}")
+    finally:
+        user_cache.invalidate(user_id)
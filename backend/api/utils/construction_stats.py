@@ -0,0 +1,94 @@
+import threading
+from collections import Counter
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+from .logger import logger
+
+# Objects constructed while handling the current request; None outside a request
+_request_counter: ContextVar[Optional[Counter]] = ContextVar("request_construction_counter", default=None)
+
+
+class ConstructionStats:
+    """Counts constructions of heavyweight objects (clients, services) overall and per request"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals: Counter = Counter()
+        self.requests = 0
+        self.requests_constructing = 0
+        self.objects_in_requests = 0
+        self.max_per_request = 0
+
+    def record(self, kind: str):
+        with self._lock:
+            self.totals[kind] += 1
+        counter = _request_counter.get()
+        if counter is not None:
+            counter[kind] += 1
+
+    def finish_request(self, counter: Counter, path: str):
+        constructed = sum(counter.values())
+        with self._lock:
+            self.requests += 1
+            self.objects_in_requests += constructed
+            self.max_per_request = max(self.max_per_request, constructed)
+            if constructed:
+                self.requests_constructing += 1
+        if constructed:
+            logger.debug(f"{path} constructed {constructed} objects: {dict(counter)}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "requests_constructing_objects": self.requests_constructing,
+                "objects_constructed_in_requests": self.objects_in_requests,
+                "avg_per_request": round(self.objects_in_requests / self.requests, 3) if self.requests else 0,
+                "max_per_request": self.max_per_request,
+                "totals_by_type": dict(self.totals),
+            }
+
+
+construction_stats = ConstructionStats()
+
+
+def record_construction(kind: str):
+    """Call from the constructor of an expensive object to include it in the counts"""
+    construction_stats.record(kind)
+
+
+class ConstructionCounterMiddleware:
+    """
+    ASGI middleware that gives each HTTP request its own construction counter.
+
+    The request is finished when the last body chunk is sent, so objects built
+    while a streaming response (e.g. a chat run) is producing output are
+    included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        counter = Counter()
+        token = _request_counter.set(counter)
+        finished = False
+
+        async def send_wrapper(message):
+            nonlocal finished
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not finished:
+                finished = True
+                construction_stats.finish_request(counter, scope.get("path", ""))
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not finished:
+                construction_stats.finish_request(counter, scope.get("path", ""))
+            _request_counter.reset(token)
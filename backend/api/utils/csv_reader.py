@@ -0,0 +1,95 @@
+from typing import BinaryIO, Iterator
+
+import pandas as pd
+from pandas._libs.parsers import STR_NA_VALUES
+
+from .logger import logger
+
+
+def resolve_csv_engine(engine: str) -> str:
+    """
+    Pick the CSV parser engine.
+
+    "auto" prefers pyarrow when it is installed and falls back to pandas' C
+    parser; an explicit "pyarrow" also falls back if the package is missing.
+    """
+    if engine in ("auto", "pyarrow"):
+        try:
+            import pyarrow.csv  # noqa: F401
+            return "pyarrow"
+        except ImportError:
+            if engine == "pyarrow":
+                logger.warning("pyarrow is not installed; falling back to the C CSV parser")
+            return "c"
+    return engine
+
+
+def iter_csv_blocks(file: BinaryIO, encoding: str, block_rows: int, engine: str = "auto") -> Iterator[pd.DataFrame]:
+    """
+    Read a CSV upload as a sequence of DataFrame row blocks.
+
+    Only one block is held in memory at a time. The pandas engines yield
+    blocks of exactly `block_rows` rows (except the last); the pyarrow engine
+    streams record batches of roughly `block_rows` rows.
+    """
+    engine = resolve_csv_engine(engine)
+    if engine == "pyarrow":
+        yield from _iter_pyarrow_blocks(file, encoding, block_rows)
+        return
+
+    with pd.read_csv(file, encoding=encoding, chunksize=block_rows, engine=engine) as reader:
+        for block in reader:
+            yield block
+
+
+def _iter_pyarrow_blocks(file: BinaryIO, encoding: str, block_rows: int) -> Iterator[pd.DataFrame]:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    # pyarrow sizes batches in bytes; sample the head of the file to turn the row target into a byte size
+    start = file.tell()
+    sample = file.read(64 * 1024)
+    file.seek(start)
+    sample_rows = max(1, sample.count(b"\n"))
+    bytes_per_row = max(1, len(sample) // sample_rows)
+    block_size = max(1 << 20, bytes_per_row * block_rows)
+
+    read_options = pa_csv.ReadOptions(encoding=encoding or "utf8", block_size=block_size)
+    # pyarrow fixes each column's type from the first block and fails on a later row that does not fit
+    # (e.g. "N/A ok" after 200k integers), so every column is read as text and typed per block below
+    header = pa_csv.open_csv(file, read_options=read_options)
+    names = header.schema.names
+    header.close()
+    file.seek(start)
+
+    reader = pa_csv.open_csv(
+        file,
+        read_options=read_options,
+        # Treat the same markers as missing as pandas does, so both engines chunk identically
+        convert_options=pa_csv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            null_values=sorted(STR_NA_VALUES),
+            strings_can_be_null=True,
+        ),
+    )
+    pending = []
+    pending_rows = 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= block_rows:
+            yield _typed_block(pa.Table.from_batches(pending).to_pandas())
+            pending = []
+            pending_rows = 0
+    if pending:
+        yield _typed_block(pa.Table.from_batches(pending).to_pandas())
+
+
+def _typed_block(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse the numeric text columns of a block, as the C parser infers types per chunk"""
+    for i in range(len(df.columns)):
+        try:
+            df.isetitem(i, pd.to_numeric(df.iloc[:, i]))
+        except (ValueError, TypeError):
+            pass
+    return df
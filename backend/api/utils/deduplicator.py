@@ -0,0 +1,197 @@
+import hashlib
+import re
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+# Punctuation, except a decimal point between digits ("4.5" must not become "45")
+_PUNCTUATION = re.compile(r"(?!(?<=\d)\.(?=\d))[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace, so "Good class!" matches "good  class" (numbers are kept)"""
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub("", text.lower())).strip()
+
+
+class Deduplicator:
+    """
+    Collapses repeated text units (spreadsheet rows) within one upload.
+
+    A unit may have structured fields (a row's ratings, course, IDs) that
+    must match exactly, and free text (its comments) that may match
+    approximately. Exact duplicates are found by a hash of the fields and
+    the normalized text. Near duplicates need the same fields, and are found
+    with MinHash signatures over character shingles of the text, bucketed
+    with locality-sensitive hashing (LSH) per field value and confirmed when
+    the estimated Jaccard similarity reaches `threshold`. A duplicate is
+    dropped and counted toward the first occurrence (its representative), so
+    the frequency can be stored with the chunk holding the representative.
+
+    Units are identified by (group, index), e.g. (sheet name, row number).
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 8, shingle_size: int = 5, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hash family: h(x) = (a * x + b) >> 32 on wrapping 64-bit integers, with odd a
+        self._a = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+        self._exact: Dict[bytes, Tuple[Hashable, int]] = {}
+        # (band, fields digest + band values) -> units, so only units with equal fields are compared
+        self._buckets: Dict[Tuple[int, bytes], List[Tuple[Hashable, int]]] = defaultdict(list)
+        self._signatures: Dict[Tuple[Hashable, int], np.ndarray] = {}
+        self._counts: Dict[Tuple[Hashable, int], int] = {}
+        self._chunks: Dict[Hashable, List[Tuple[int, int, str]]] = defaultdict(list)
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _minhash(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        """MinHash signatures of normalized texts, one row per text, computed a batch of texts at a time"""
+        size = self.shingle_size
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for start in range(0, len(texts), batch_size):
+            encoded = [text.encode("utf-8").ljust(size) for text in texts[start:start + batch_size]]
+            lengths = np.fromiter((len(data) for data in encoded), dtype=np.int64, count=len(encoded))
+            data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+
+            # Every byte window of `size` as one integer; windows that cross two texts are skipped below
+            windows = np.zeros(len(data) - size + 1, dtype=np.uint64)
+            for k in range(size):
+                windows = (windows << np.uint64(8)) | data[k:len(data) - size + 1 + k]
+            counts = lengths - size + 1
+            text_starts = np.cumsum(lengths) - lengths
+            segment_starts = np.cumsum(counts) - counts
+            shingles = windows[np.repeat(text_starts - segment_starts, counts) + np.arange(counts.sum())]
+
+            # One row per hash function keeps the per-text minimum a contiguous reduction
+            hashed = np.outer(self._a, shingles)
+            hashed += self._b[:, None]
+            hashed >>= np.uint64(32)
+            signatures[start:start + len(encoded)] = np.minimum.reduceat(hashed.astype(np.uint32), segment_starts, axis=1).T
+        return signatures
+
+    def _find_near(self, signature: np.ndarray, scope: bytes) -> Tuple[Optional[Tuple[Hashable, int]], List[Tuple[int, bytes]]]:
+        band_keys = [(band, scope + values.tobytes()) for band, values in enumerate(signature.reshape(self.bands, -1))]
+        seen = set()
+        for band_key in band_keys:
+            for candidate in self._buckets.get(band_key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if np.count_nonzero(self._signatures[candidate] == signature) >= self.threshold * self.num_perm:
+                    return candidate, band_keys
+        return None, band_keys
+
+    def _add(self, digest: bytes, scope: bytes, key: Tuple[Hashable, int], signature: Optional[np.ndarray]) -> bool:
+        representative = self._exact.get(digest)
+        if representative is not None:
+            self._counts[representative] += 1
+            self.exact_duplicates += 1
+            return False
+
+        if signature is not None:
+            representative, band_keys = self._find_near(signature, scope)
+            if representative is not None:
+                # Later exact copies of this variant resolve without another LSH lookup
+                self._exact[digest] = representative
+                self._counts[representative] += 1
+                self.near_duplicates += 1
+                return False
+            self._signatures[key] = signature
+            for band_key in band_keys:
+                self._buckets[band_key].append(key)
+
+        self._exact[digest] = key
+        self._counts[key] = 1
+        return True
+
+    @staticmethod
+    def _digest(*parts: str) -> bytes:
+        return hashlib.blake2b("\x1f".join(parts).encode("utf-8"), digest_size=16).digest()
+
+    def add(self, text: str, group: Hashable, index: int, fields: str = "") -> bool:
+        """
+        Register a unit. Returns True if it is new and should be kept, False if it
+        duplicates an earlier unit (whose occurrence count is incremented).
+        """
+        normalized = normalize(text)
+        signature = self._minhash([normalized])[0] if self.threshold > 0 and normalized else None
+        return self._add(self._digest(fields, normalized), self._digest(fields), (group, index), signature)
+
+    def filter(
+        self,
+        units: List[str],
+        group: Hashable,
+        first_index: int = 0,
+        fields: Optional[List[str]] = None,
+        texts: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Return `units` with duplicates replaced by empty strings, keeping indexes aligned.
+
+        `fields` and `texts` split each unit into the part compared exactly and the
+        part compared approximately (see row_serializer.serialize_row_parts); without
+        them the whole unit is free text.
+        """
+        if fields is None or texts is None:
+            fields, texts = [""] * len(units), units
+        normalized = [normalize(text) if text else "" for text in texts]
+        scopes = [self._digest(value) for value in fields]
+        digests = [self._digest(value, text) for value, text in zip(fields, normalized)]
+
+        # MinHash only the first copy of each text not seen before, in one vectorized pass
+        signatures = {}
+        if self.threshold > 0:
+            pending = {}
+            for i, (unit, text, digest) in enumerate(zip(units, normalized, digests)):
+                if unit and text and digest not in self._exact and digest not in pending:
+                    pending[digest] = i
+            if pending:
+                positions = list(pending.values())
+                signatures = dict(zip(positions, self._minhash([normalized[i] for i in positions])))
+
+        return [
+            unit if unit and self._add(digests[i], scopes[i], (group, first_index + i), signatures.get(i)) else ""
+            for i, unit in enumerate(units)
+        ]
+
+    def track_chunk(self, chunk_id: str, group: Hashable, first_unit: int, last_unit: int):
+        """Record which units a stored chunk covers"""
+        self._chunks[group].append((first_unit, last_unit, chunk_id))
+
+    def chunk_occurrences(self) -> Dict[str, List[int]]:
+        """
+        Map chunk id -> occurrence count of each kept unit in the chunk, in text
+        order, for the chunks holding at least one unit that was seen more than once.
+        """
+        kept: Dict[Hashable, List[int]] = defaultdict(list)
+        for group, index in self._counts:
+            kept[group].append(index)
+
+        occurrences = {}
+        for group, chunks in self._chunks.items():
+            indexes = sorted(kept[group])
+            for first_unit, last_unit, chunk_id in chunks:
+                counts = [
+                    self._counts[(group, index)]
+                    for index in indexes[bisect_left(indexes, first_unit):bisect_right(indexes, last_unit)]
+                ]
+                if any(count > 1 for count in counts):
+                    occurrences[chunk_id] = counts
+        return occurrences
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "unique_units": len(self._counts),
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+        }
@@ -1,7 +1,8 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from ..models.user import UserInDB
 from ..database.mongodb import MongoDB
+from ..services.user_cache import user_cache
 from jose import jwt
 from bson import ObjectId
 from bson.errors import InvalidId
@@ -17,6 +18,18 @@ ALGORITHM = "HS256"
 # OAuth2 scheme for token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+
+def get_services(request: Request):
+    """
+    FastAPI dependency returning the application-scoped ServiceContainer
+    created in the lifespan.
+    Usage:
+        @router.post("/some-route")
+        async def some_route(services: ServiceContainer = Depends(get_services)):
+            await services.document_service.delete_file_vectors(file_id)
+    """
+    return request.app.state.services
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
     """
     FastAPI dependency that gets the current user from a JWT token.
@@ -39,6 +52,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
     except jwt.JWTError:
         raise credentials_exception
     
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        return cached
+
     try:
         db = MongoDB.get_db()
         user = db.users.find_one({"_id": ObjectId(user_id)})
@@ -48,7 +65,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         
         # Convert ObjectId to string for the response
         user["_id"] = str(user["_id"])
-        return UserInDB(**user)
+        user = UserInDB(**user)
+        user_cache.put(user)
+        return user
     except InvalidId:
         # This happens if the user_id from the token is not a valid MongoDB ObjectId
         raise credentials_exception 
\ No newline at end of file
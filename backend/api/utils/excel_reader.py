@@ -0,0 +1,169 @@
+import asyncio
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, Iterator, List, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+from pandas._libs.parsers import STR_NA_VALUES
+
+from .logger import logger
+from .process_pool import get_process_pool, reset_process_pool
+from .row_serializer import serialize_row_parts
+
+
+def list_sheets(path: str) -> List[str]:
+    workbook = load_workbook(path, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+def _header(values: tuple, width: int = 0) -> List[str]:
+    """
+    Column labels from the header row, named and de-duplicated the way pandas.read_excel does.
+
+    `width` widens the header with unnamed columns for data rows that are longer than it.
+    """
+    values = list(values)
+    # Read-only sheets often report stale dimensions and pad rows with empty trailing cells
+    while values and values[-1] is None:
+        values.pop()
+    values += [None] * (width - len(values))
+
+    columns = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _to_frame(block: List[tuple], columns: List[str]) -> pd.DataFrame:
+    df = pd.DataFrame(block, columns=columns)
+    # Treat the same text markers as missing as pandas.read_excel does
+    for i in range(len(columns)):
+        column = df.iloc[:, i]
+        if column.dtype == object or pd.api.types.is_string_dtype(column):
+            df.isetitem(i, column.where(~column.isin(STR_NA_VALUES)))
+    return df.infer_objects()
+
+
+def iter_sheet_blocks(path: str, sheet_name: str, block_rows: int) -> Iterator[pd.DataFrame]:
+    """
+    Stream one worksheet as DataFrame row blocks.
+
+    The workbook is opened in openpyxl's read-only, values-only mode, so rows
+    are parsed lazily from the XML and only one block is held in memory. The
+    first row is used as the header and fully empty rows are skipped. Cells
+    beyond the header go to "Unnamed: N" columns, which blocks from the one
+    holding the first such row onwards include.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = columns = None
+        for values in rows:
+            if any(value is not None for value in values):
+                header = values
+                columns = _header(header)
+                break
+        if not columns:
+            return
+
+        width = len(columns)
+        block = []
+        for values in rows:
+            used = len(values)
+            while used > width and values[used - 1] is None:
+                used -= 1
+            if used > width:
+                # Data under an empty header cell: pandas keeps it as an unnamed column
+                block = [row + (None,) * (used - width) for row in block]
+                columns = _header(header, used)
+                width = used
+            values = values[:width]
+            if all(value is None for value in values):
+                continue
+            block.append(values + (None,) * (width - len(values)))
+            if len(block) >= block_rows:
+                yield _to_frame(block, columns)
+                block = []
+        if block:
+            yield _to_frame(block, columns)
+    finally:
+        workbook.close()
+
+
+SheetRows = Tuple[List[str], List[str], List[str]]
+
+
+def serialize_sheet(path: str, sheet_name: str, block_rows: int) -> Tuple[int, SheetRows]:
+    """
+    Parse and serialize a whole worksheet. Runs inside a pool worker process.
+
+    Returns (column count, (rows, fields, comments)) as produced by
+    serialize_row_parts; only the compact row strings are sent back to the
+    parent, not the parsed cells.
+    """
+    total_cols = 0
+    rows, fields, comments = [], [], []
+    for block in iter_sheet_blocks(path, sheet_name, block_rows):
+        total_cols = len(block.columns)
+        for serialized, block_values in zip((rows, fields, comments), serialize_row_parts(block)):
+            serialized.extend(block_values)
+    return total_cols, (rows, fields, comments)
+
+
+async def iter_sheets_parallel(path: str, sheets: List[str], workers: int, block_rows: int) -> AsyncIterator[Tuple[str, int, SheetRows]]:
+    """
+    Serialize the sheets of the workbook at `path` on the shared process pool.
+
+    Yields (sheet_name, column count, (rows, fields, comments)) in workbook order, with at
+    most `workers` sheets submitted ahead of the consumer. If a worker crashes,
+    the pool is restarted and the affected sheet is parsed on a thread instead;
+    a sheet that fails there as well is skipped.
+    """
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    pending = deque()
+    next_sheet = 0
+
+    try:
+        while next_sheet < len(sheets) or pending:
+            while next_sheet < len(sheets) and len(pending) < workers:
+                sheet_name = sheets[next_sheet]
+                pending.append((next_sheet, loop.run_in_executor(pool, serialize_sheet, path, sheet_name, block_rows)))
+                next_sheet += 1
+
+            index, future = pending.popleft()
+            sheet_name = sheets[index]
+            try:
+                total_cols, sheet_rows = await future
+            except (BrokenProcessPool, asyncio.CancelledError) as e:
+                if isinstance(e, asyncio.CancelledError) and asyncio.current_task().cancelling():
+                    # The upload itself was cancelled
+                    raise
+                # A worker crashed, or another upload reset the broken pool and cancelled this sheet
+                logger.error(f"Excel worker crashed while parsing sheet '{sheet_name}'; restarting pool")
+                for _, other in pending:
+                    other.cancel()
+                pending.clear()
+                reset_process_pool(pool)
+                pool = get_process_pool()
+                next_sheet = index + 1
+                try:
+                    total_cols, sheet_rows = await asyncio.to_thread(serialize_sheet, path, sheet_name, block_rows)
+                except Exception as e:
+                    logger.warning(f"Failed to parse sheet '{sheet_name}', skipping it: {e}")
+                    continue
+            yield sheet_name, total_cols, sheet_rows
+    finally:
+        for _, future in pending:
+            future.cancel()
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from typing import AsyncIterator, BinaryIO, List, Optional, Tuple
+
+import pdfplumber
+
+from .logger import logger
+from .process_pool import get_process_pool, reset_process_pool
+
+# Per-worker cache of the currently open document, so a worker process opens
+# each uploaded PDF once rather than once per page. It is closed when the next
+# upload's file is opened, or by a watcher thread once the upload's temporary
+# file is deleted, so an idle worker does not hold on to a deleted file.
+_open_document = {"path": None, "pdf": None}
+_document_lock = threading.Lock()
+_document_watcher: Optional[threading.Thread] = None
+_DOCUMENT_CHECK_SECONDS = 5
+
+
+class PageTimeout(Exception):
+    pass
+
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeout()
+
+
+def _close_document():
+    pdf = _open_document["pdf"]
+    _open_document["path"] = _open_document["pdf"] = None
+    if pdf is not None:
+        pdf.close()
+
+
+def _watch_document():
+    while True:
+        time.sleep(_DOCUMENT_CHECK_SECONDS)
+        with _document_lock:
+            if _open_document["path"] is not None and not os.path.exists(_open_document["path"]):
+                _close_document()
+
+
+def _get_document(path: str):
+    """The open document for `path`; the caller holds _document_lock"""
+    global _document_watcher
+    if _open_document["path"] != path:
+        _close_document()
+        _open_document["pdf"] = pdfplumber.open(path)
+        _open_document["path"] = path
+    if _document_watcher is None:
+        _document_watcher = threading.Thread(target=_watch_document, name="pdf-document-watcher", daemon=True)
+        _document_watcher.start()
+    return _open_document["pdf"]
+
+
+def count_pages(path: str) -> int:
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_page_text(path: str, page_num: int, timeout: float = 0) -> Optional[str]:
+    """
+    Extract the text of a single page. Runs inside a pool worker process.
+
+    The timeout is enforced inside the worker with a real-time interval timer,
+    so a pathological page is abandoned and the worker is free for the next one.
+    Returns None when the page timed out.
+    """
+    use_alarm = timeout > 0 and hasattr(signal, "setitimer")
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_page_timeout)
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        with _document_lock:
+            page = _get_document(path).pages[page_num]
+            text = page.extract_text() or ""
+            page.close()
+        return text
+    except PageTimeout:
+        return None
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+def extract_pages_serial(file: BinaryIO) -> List[str]:
+    """Extract every page's text in the calling thread"""
+    with pdfplumber.open(file) as pdf:
+        texts = []
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.close()
+        return texts
+
+
+async def iter_pages_parallel(path: str, workers: int, page_timeout: float) -> AsyncIterator[Tuple[int, int, str]]:
+    """
+    Extract pages of the PDF at `path` on the shared process pool.
+
+    Yields (page_num, page_count, text) in page order. At most `workers * 2` pages are
+    submitted ahead of the consumer. Pages that time out or fail yield an
+    empty string so a single bad page cannot hang or abort the upload.
+    """
+    loop = asyncio.get_running_loop()
+    page_count = await asyncio.to_thread(count_pages, path)
+    pool = get_process_pool()
+    pending = deque()
+    next_page = 0
+
+    try:
+        while next_page < page_count or pending:
+            while next_page < page_count and len(pending) < workers * 2:
+                pending.append((next_page, loop.run_in_executor(pool, extract_page_text, path, next_page, page_timeout)))
+                next_page += 1
+
+            page_num, future = pending.popleft()
+            try:
+                text = await future
+            except (BrokenProcessPool, asyncio.CancelledError) as e:
+                if isinstance(e, asyncio.CancelledError) and asyncio.current_task().cancelling():
+                    # The upload itself was cancelled
+                    raise
+                # A worker died (e.g. crashed in a native parser), or another upload reset the broken pool
+                # and cancelled this page; skip the page and continue on a working pool
+                logger.error(f"PDF worker crashed while extracting page {page_num}; restarting pool")
+                for _, other in pending:
+                    other.cancel()
+                pending.clear()
+                reset_process_pool(pool)
+                pool = get_process_pool()
+                next_page = page_num + 1
+                text = ""
+            except Exception as e:
+                logger.warning(f"Failed to extract text from page {page_num}: {e}")
+                text = ""
+
+            if text is None:
+                logger.warning(f"Timed out after {page_timeout}s extracting page {page_num}; skipping it")
+                text = ""
+            yield page_num, page_count, text
+    finally:
+        for _, future in pending:
+            future.cancel()
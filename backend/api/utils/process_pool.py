@@ -0,0 +1,57 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .logger import logger
+
+# Shared pool for CPU-bound parsing work (PDF pages, workbook sheets) so that
+# uploads do not pin the event loop thread. Workers are spawned rather than
+# forked because the parent process already runs MongoDB and HTTP client threads.
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared process pool, creating it on first use with
+    PROCESS_POOL_WORKERS workers. Callers bound how much work they submit
+    themselves (PDF_EXTRACTION_WORKERS, EXCEL_SHEET_WORKERS).
+    """
+    # Imported here: pool workers import this module and do not need the settings
+    from ..config.settings import settings
+
+    global _pool
+    with _lock:
+        if _pool is None:
+            max_workers = max(1, settings.PROCESS_POOL_WORKERS)
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            logger.info(f"Started parsing process pool with {max_workers} workers")
+        return _pool
+
+
+def reset_process_pool(broken: ProcessPoolExecutor):
+    """
+    Discard the shared pool after a worker crashed and broke it. Does nothing if
+    another caller already replaced `broken`, so concurrent uploads that hit the
+    same crash do not shut down each other's fresh pool.
+    """
+    global _pool
+    with _lock:
+        if _pool is not broken:
+            return
+        _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+    logger.warning("Parsing process pool was reset")
+
+
+def shutdown_process_pool():
+    """Shut down the shared pool when the application stops"""
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
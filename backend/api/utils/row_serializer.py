@@ -0,0 +1,116 @@
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Whitespace runs and control characters, matching DocumentService.clean_text
+_WHITESPACE = r"\s+"
+_CONTROL_CHARS = r"[\x00-\x09\x0b\x0c\x0e-\x1f\x7f]"
+# Text columns whose cells average at least this many words hold free-text comments
+_FREE_TEXT_MIN_WORDS = 5
+# Floats at or beyond this magnitude do not fit an int64
+_INT64_BOUND = 2.0 ** 63
+
+
+def _render_column(column: pd.Series) -> np.ndarray:
+    """Render one column to cleaned strings, with "" for empty cells"""
+    empty = column.isna().to_numpy().copy()
+    if pd.api.types.is_float_dtype(column):
+        values = column.astype(str).to_numpy(dtype=object)
+        numbers = column.to_numpy(dtype=np.float64, na_value=np.nan)
+        # Floats holding whole numbers (ints with missing values) render without a trailing ".0";
+        # inf and values outside the int64 range (e.g. long numeric IDs) keep the float rendering
+        castable = np.isfinite(numbers) & (np.abs(numbers) < _INT64_BOUND)
+        if castable.any() and (numbers[castable] == np.floor(numbers[castable])).all():
+            values[castable] = numbers[castable].astype(np.int64).astype(str)
+        return np.where(empty, "", values)
+
+    values = column.astype(str)
+    if not (pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column)):
+        values = (
+            values.str.replace(_WHITESPACE, " ", regex=True)
+            .str.replace(_CONTROL_CHARS, "", regex=True)
+            .str.strip()
+        )
+        empty |= (values == "").to_numpy(dtype=bool)
+    return np.where(empty, "", values.to_numpy(dtype=object))
+
+
+def _clean_label(name) -> str:
+    return " ".join(str(name).split())
+
+
+def _is_free_text(column: pd.Series, values: np.ndarray) -> bool:
+    """Comment-like column: text cells averaging at least _FREE_TEXT_MIN_WORDS words"""
+    if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+        return False
+    present = values[values != ""]
+    if not len(present):
+        return False
+    # Whitespace is already collapsed to single spaces
+    words = np.char.count(present.astype(str), " ") + 1
+    return words.mean() >= _FREE_TEXT_MIN_WORDS
+
+
+def _append(joined: np.ndarray, pairs: np.ndarray, present: np.ndarray, separator: str) -> np.ndarray:
+    # Add a separator only between two non-empty parts
+    needs_separator = present & (joined != "")
+    return np.where(needs_separator, joined + separator, joined) + pairs
+
+
+def serialize_row_parts(df: pd.DataFrame, separator: str = "; ") -> Tuple[List[str], List[str], List[str]]:
+    """
+    Serialize rows like serialize_rows, and also return each row split into
+    its structured fields (ratings, course, IDs, ...) and its free-text
+    comments, as (rows, fields, comments).
+
+    Two rows are only duplicates if their fields match exactly; comments may
+    match approximately (see Deduplicator.filter).
+    """
+    rows = len(df)
+    if rows == 0:
+        return [], [], []
+    joined = np.full(rows, "", dtype=object)
+    fields = np.full(rows, "", dtype=object)
+    comments = np.full(rows, "", dtype=object)
+
+    # By position: duplicate headers are common in evaluation exports, and df[name] would return both columns
+    for i, name in enumerate(df.columns):
+        column = df.iloc[:, i]
+        values = _render_column(column)
+        present = values != ""
+        pairs = np.where(present, (_clean_label(name) + ": ") + values, "")
+        joined = _append(joined, pairs, present, separator)
+        if _is_free_text(column, values):
+            comments = _append(comments, pairs, present, separator)
+        else:
+            fields = _append(fields, pairs, present, separator)
+    return joined.tolist(), fields.tolist(), comments.tolist()
+
+
+def serialize_rows(df: pd.DataFrame, separator: str = "; ") -> List[str]:
+    """
+    Render each row as compact `column: value` pairs, e.g.
+    "course: CSC 510; rating: 4; comment: Great lectures".
+
+    Work is done one column at a time over whole arrays, so the cost is
+    per column rather than per cell, and empty cells are dropped instead of
+    being padded to a fixed column width like DataFrame.to_string.
+    """
+    rows = len(df)
+    joined = np.full(rows, "", dtype=object)
+    if rows == 0:
+        return []
+
+    for i, name in enumerate(df.columns):
+        values = _render_column(df.iloc[:, i])
+        present = values != ""
+        pairs = np.where(present, (_clean_label(name) + ": ") + values, "")
+        joined = _append(joined, pairs, present, separator)
+    return joined.tolist()
+
+
+def join_rows(rows: List[str]) -> str:
+    """Join serialized rows into chunk text, one row per line"""
+    return "\n".join(row for row in rows if row)
+
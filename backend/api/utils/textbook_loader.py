@@ -7,10 +7,10 @@ from dotenv import load_dotenv
 from pymongo import MongoClient
 from langchain_core.documents import Document
 from langchain_unstructured import UnstructuredLoader
-from langchain_openai import OpenAIEmbeddings
 from langchain_mongodb import MongoDBAtlasVectorSearch
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from api.database.mongodb import MongoDB
+from api.database.vector_index import create_embeddings, ensure_vector_index
 from api.utils.logger import logger
 import pdfplumber
 from tqdm import tqdm
@@ -49,7 +49,7 @@ class TextbookLoader:
         """
         self.collection_name = collection_name
         
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
+        self.embeddings = create_embeddings()
         
         if MongoDB.db is None:
             MongoDB.connect_db()
@@ -69,21 +69,7 @@ class TextbookLoader:
     def _ensure_vector_index(self):
         """Ensure vector index exists for similarity search"""
         try:
-
-            if self.collection_name not in self.db.list_collection_names():
-                self.db.create_collection(self.collection_name)
-                logger.info(f"Created {self.collection_name} collection")
-            
-            indexes = list(self.collection.list_indexes())
-            index_exists = any(index.get("name") == f"{self.collection_name}_index" for index in indexes)
-            
-            if not index_exists:
-
-                self.vector_store.create_vector_search_index(dimensions=3072)
-                logger.info(f"Created vector index '{self.collection_name}_index' in MongoDB")
-            else:
-                logger.info(f"Vector index '{self.collection_name}_index' already exists")
-                
+            ensure_vector_index(self.db, self.collection_name, f"{self.collection_name}_index")
         except Exception as e:
             # If the error is about index already existing, log it as info instead of error
             if "Index already exists" in str(e) or "IndexAlreadyExists" in str(e):
@@ -189,4 +175,10 @@ if __name__ == "__main__":
     )
     
     print(f"Processed {len(documents)} document chunks")
+
+    # Refresh the local snapshot served by get_teaching_material_context
+    from api.config.settings import settings
+    from api.utils.vector_snapshot import export_snapshot
+    if settings.TEACHING_MATERIALS_SNAPSHOT_DIR:
+        export_snapshot(loader.collection, settings.TEACHING_MATERIALS_SNAPSHOT_DIR, settings.EMBEDDING_MODEL)
     
@@ -0,0 +1,153 @@
+import math
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+
+from .logger import logger
+
+
+class EstimatingTokenizer:
+    """Fast local token estimate (~4 characters per token for English text)"""
+
+    name = "estimate"
+
+    def count(self, text: str) -> int:
+        return math.ceil(len(text) / 4)
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        return [math.ceil(len(text) / 4) for text in texts]
+
+
+class TiktokenTokenizer:
+    """Exact token counts for OpenAI models"""
+
+    name = "tiktoken"
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(name: str = "tiktoken", encoding_name: str = "cl100k_base"):
+    """
+    Return the tokenizer used for chunk budgets.
+
+    "tiktoken" loads the model's BPE encoding and falls back to the local
+    estimator if tiktoken is unavailable or its encoding cannot be loaded
+    (e.g. no network access to fetch the vocabulary).
+    """
+    if name == "tiktoken":
+        try:
+            import tiktoken
+            return TiktokenTokenizer(tiktoken.get_encoding(encoding_name))
+        except Exception as e:
+            logger.warning(f"tiktoken unavailable ({e}); using estimated token counts for chunking")
+    return EstimatingTokenizer()
+
+
+class PackedChunk(NamedTuple):
+    text: str
+    first_unit: int  # index of the first unit (row, line) in the chunk
+    last_unit: int  # index of the last unit, inclusive
+
+
+class ChunkPacker:
+    """
+    Greedily packs text units (spreadsheet rows, PDF lines) into chunks of
+    at most `budget` tokens.
+
+    The packer is stateful so units can be fed incrementally from a stream;
+    add() returns the chunks completed by each unit and flush() returns the
+    final partial chunk. Units larger than the budget are split on word
+    boundaries into budget-sized pieces. With `overlap` > 0, trailing units
+    of up to that many tokens are repeated at the start of the next chunk.
+    """
+
+    def __init__(self, budget: int, tokenizer=None, overlap: int = 0, separator: str = "\n"):
+        self.budget = max(1, budget)
+        self.tokenizer = tokenizer or EstimatingTokenizer()
+        self.overlap = min(overlap, self.budget // 2)
+        self.separator = separator
+        self._units: List[str] = []
+        self._tokens: List[int] = []
+        self._indexes: List[int] = []
+        self._total = 0
+
+    def add(self, text: str, index: int, tokens: Optional[int] = None) -> List[PackedChunk]:
+        if not text:
+            return []
+        if tokens is None:
+            tokens = self.tokenizer.count(text)
+
+        if tokens > self.budget:
+            chunks = self.flush()
+            chunks.extend(PackedChunk(piece, index, index) for piece in self._split(text))
+            return chunks
+
+        chunks = []
+        if self._units and self._total + tokens > self.budget:
+            chunks.append(self._emit())
+            self._keep_overlap()
+            if self._total + tokens > self.budget:
+                self._reset()
+        self._units.append(text)
+        self._tokens.append(tokens)
+        self._indexes.append(index)
+        self._total += tokens
+        return chunks
+
+    def add_many(self, texts: List[str], first_index: int = 0) -> List[PackedChunk]:
+        """Add consecutive units, counting their tokens in one batch"""
+        non_empty = [(i, text) for i, text in enumerate(texts) if text]
+        counts = self.tokenizer.count_many([text for _, text in non_empty])
+        chunks = []
+        for (i, text), tokens in zip(non_empty, counts):
+            chunks.extend(self.add(text, first_index + i, tokens))
+        return chunks
+
+    def flush(self) -> List[PackedChunk]:
+        if not self._units:
+            return []
+        chunk = self._emit()
+        self._reset()
+        return [chunk]
+
+    def _emit(self) -> PackedChunk:
+        return PackedChunk(self.separator.join(self._units), self._indexes[0], self._indexes[-1])
+
+    def _reset(self):
+        self._units, self._tokens, self._indexes, self._total = [], [], [], 0
+
+    def _keep_overlap(self):
+        if self.overlap <= 0:
+            self._reset()
+            return
+        kept = 0
+        start = len(self._units)
+        while start > 0 and kept + self._tokens[start - 1] <= self.overlap:
+            start -= 1
+            kept += self._tokens[start]
+        self._units = self._units[start:]
+        self._tokens = self._tokens[start:]
+        self._indexes = self._indexes[start:]
+        self._total = kept
+
+    def _split(self, text: str) -> List[str]:
+        pieces = []
+        current = []
+        current_tokens = 0
+        for word in text.split(" "):
+            word_tokens = self.tokenizer.count(word) + 1
+            if current and current_tokens + word_tokens > self.budget:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(word)
+            current_tokens += word_tokens
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
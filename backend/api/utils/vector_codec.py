@@ -0,0 +1,153 @@
+"""
+Encoding of stored embedding vectors.
+
+Embeddings can be stored as:
+    array    BSON array of doubles (one boxed float per element on the way in and out)
+    float32  BSON binary vector (subtype 9, dtype FLOAT32), searchable by Atlas Vector Search
+    raw      little-endian float32 bytes (subtype 0); smallest, but only the in-process
+             searches can use it, Atlas $vectorSearch cannot
+
+Binary encodings are written from and read into NumPy buffers directly.
+Readers accept every format, so a collection can hold a mix while it is migrated.
+
+Usage (from the backend directory):
+    python -m api.utils.vector_codec migrate --collection evaluations_vectors --to float32
+"""
+import argparse
+from typing import Any, List, Sequence
+
+import numpy as np
+from bson.binary import Binary, BINARY_SUBTYPE, VECTOR_SUBTYPE
+
+from .logger import logger
+
+STORAGE_FORMATS = ("array", "float32", "raw")
+
+_FLOAT32 = np.dtype("<f4")
+_INT8 = np.dtype("i1")
+# Binary vector header: dtype byte, then padding byte
+_FLOAT32_HEADER = b"\x27\x00"
+_INT8_DTYPE = 0x03
+
+
+def _check_format(storage_format: str) -> str:
+    if storage_format not in STORAGE_FORMATS:
+        raise ValueError(f"Unknown embedding storage format '{storage_format}', expected one of {STORAGE_FORMATS}")
+    return storage_format
+
+
+def encode_vectors(vectors: Sequence[Sequence[float]], storage_format: str) -> List[Any]:
+    """Encode a batch of embeddings into BSON values for the `embedding` field"""
+    _check_format(storage_format)
+    if storage_format == "array":
+        return [vector.tolist() if isinstance(vector, np.ndarray) else vector for vector in vectors]
+
+    # One conversion for the whole batch; each row is then a zero-copy slice of the buffer
+    matrix = np.ascontiguousarray(np.asarray(vectors, dtype=_FLOAT32))
+    if storage_format == "float32":
+        return [Binary(_FLOAT32_HEADER + row.tobytes(), VECTOR_SUBTYPE) for row in matrix]
+    return [Binary(row.tobytes(), BINARY_SUBTYPE) for row in matrix]
+
+
+def stored_format(value: Any) -> str:
+    if isinstance(value, Binary):
+        if value.subtype == VECTOR_SUBTYPE:
+            return "float32" if value[:1] == _FLOAT32_HEADER[:1] else "vector"
+        return "raw"
+    if isinstance(value, (bytes, bytearray)):
+        return "raw"
+    return "array"
+
+
+def decode_vector(value: Any) -> np.ndarray:
+    """Decode one stored embedding (any format) into a float32 array"""
+    kind = stored_format(value)
+    if kind == "float32":
+        return np.frombuffer(value, dtype=_FLOAT32, offset=2)
+    if kind == "raw":
+        return np.frombuffer(value, dtype=_FLOAT32)
+    if kind == "vector":
+        if value[0] == _INT8_DTYPE:
+            return np.frombuffer(value, dtype=_INT8, offset=2).astype(np.float32)
+        raise ValueError(f"Unsupported binary vector dtype {value[0]:#x}")
+    return np.asarray(value, dtype=np.float32)
+
+
+def decode_vectors(values: Sequence[Any]) -> np.ndarray:
+    """Decode stored embeddings into a 2-D float32 matrix"""
+    if not len(values):
+        return np.empty((0, 0), dtype=np.float32)
+    kinds = {stored_format(value) for value in values}
+    if kinds == {"array"}:
+        return np.asarray(values, dtype=np.float32)
+    if kinds == {"float32"} or kinds == {"raw"}:
+        # Join the payloads once and view them as a matrix, no per-element objects
+        offset = 2 if kinds == {"float32"} else 0
+        payload = b"".join(memoryview(value)[offset:] for value in values)
+        return np.frombuffer(payload, dtype=_FLOAT32).reshape(len(values), -1)
+    return np.stack([decode_vector(value) for value in values])
+
+
+def migrate_collection(collection, storage_format: str, batch_size: int = 500) -> int:
+    """
+    Re-encode every vector document of `collection` into `storage_format`.
+
+    Documents already in the target format are skipped, so the migration can
+    be interrupted and re-run.
+    """
+    from pymongo.operations import UpdateOne
+
+    _check_format(storage_format)
+    # Only scan documents stored in a different BSON type than the target
+    query = {"embedding": {"$type": "binData"}} if storage_format == "array" else {"embedding": {"$exists": True}}
+    cursor = collection.find(query, {"embedding": 1}).batch_size(batch_size)
+
+    migrated = 0
+    ids, values = [], []
+
+    def flush():
+        nonlocal migrated
+        if not ids:
+            return
+        encoded = encode_vectors(decode_vectors(values), storage_format)
+        collection.bulk_write(
+            [UpdateOne({"_id": _id}, {"$set": {"embedding": value}}) for _id, value in zip(ids, encoded)],
+            ordered=False,
+        )
+        migrated += len(ids)
+        logger.info(f"Migrated {migrated} embeddings in '{collection.name}' to {storage_format}")
+        ids.clear()
+        values.clear()
+
+    for doc in cursor:
+        if stored_format(doc["embedding"]) == storage_format:
+            continue
+        ids.append(doc["_id"])
+        values.append(doc["embedding"])
+        if len(ids) >= batch_size:
+            flush()
+    flush()
+    return migrated
+
+
+def main():
+    from ..database.mongodb import MongoDB
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="Re-encode stored embeddings")
+    migrate.add_argument("--collection", default="evaluations_vectors")
+    migrate.add_argument("--to", required=True, choices=STORAGE_FORMATS)
+    migrate.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    MongoDB.connect_db()
+    try:
+        migrated = migrate_collection(MongoDB.get_db()[args.collection], args.to, args.batch_size)
+    finally:
+        MongoDB.close_db()
+    print(f"Migrated {migrated} documents")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Read-only, memory-mapped snapshots of a vector collection.
+
+A snapshot is a directory holding:
+    embeddings.npy  unit-normalized float32 matrix, one row per chunk
+    texts.bin       UTF-8 chunk texts, concatenated
+    offsets.npy     int64 start offsets into texts.bin (len = rows + 1)
+    metadata.json   per-row metadata plus a manifest (model, dimensions, rows)
+
+The arrays are opened with mmap, so every uvicorn worker serving the same
+snapshot shares its pages through the OS page cache instead of holding a copy.
+
+The snapshot path is a symlink to a versioned sibling directory
+(.<name>.v-<random>); each export writes a new version and repoints the link.
+
+Usage (from the backend directory, after TextbookLoader.load_textbook):
+    python -m api.utils.vector_snapshot export --collection teaching_materials \\
+        --out snapshots/teaching_materials
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .logger import logger
+from .vector_codec import decode_vector
+
+FORMAT_VERSION = 1
+# Vector document fields that are not returned as Document metadata
+_EXCLUDED_FIELDS = ("_id", "embedding", "text")
+
+
+def export_snapshot(collection, out_dir: str, model: str, batch_size: int = 500) -> Dict[str, Any]:
+    """
+    Write every vector document of `collection` to a snapshot at `out_dir`.
+
+    The snapshot is built in a new version directory next to `out_dir` and
+    published by atomically replacing the `out_dir` symlink, so a reader sees
+    either the complete previous snapshot or the complete new one, and a
+    failure or crash at any point leaves the previous snapshot in place. The
+    replaced version is kept until the next export, so a server that resolved
+    the link just before the swap can still open it. A snapshot directory
+    written before versioning is moved to a version directory first; that one
+    time, `out_dir` is missing between the two renames (a crash there leaves
+    the old snapshot under its version name).
+    """
+    rows = collection.count_documents({"embedding": {"$exists": True}})
+    first = collection.find_one({"embedding": {"$exists": True}}, {"embedding": 1})
+    if not rows or first is None:
+        raise ValueError(f"Collection '{collection.name}' has no vector documents to export")
+    dimensions = len(decode_vector(first["embedding"]))
+
+    out_dir = os.path.abspath(out_dir)
+    parent, name = os.path.split(out_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=_version_prefix(name), dir=parent)
+    try:
+        matrix = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, "embeddings.npy"), mode="w+", dtype=np.float32, shape=(rows, dimensions)
+        )
+        offsets = [0]
+        metadata: List[Dict[str, Any]] = []
+        ids: List[str] = []
+
+        cursor = collection.find({"embedding": {"$exists": True}}).sort("_id", 1).batch_size(batch_size)
+        with open(os.path.join(tmp_dir, "texts.bin"), "wb") as texts:
+            n = 0
+            for doc in cursor:
+                if n == rows:
+                    # Documents inserted while exporting are left for the next export
+                    break
+                vector = decode_vector(doc["embedding"])
+                if vector.shape != (dimensions,):
+                    raise ValueError(f"Document {doc['_id']} has {vector.size} dimensions, expected {dimensions}")
+                norm = np.linalg.norm(vector)
+                matrix[n] = vector / norm if norm else vector
+
+                encoded = doc.get("text", "").encode("utf-8")
+                texts.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+                ids.append(str(doc["_id"]))
+                metadata.append(
+                    {key: value for key, value in doc.items() if key not in _EXCLUDED_FIELDS}
+                )
+                n += 1
+        matrix.flush()
+        del matrix
+
+        if n < rows:
+            # Documents deleted while exporting: shrink the matrix to what was written
+            full = np.load(os.path.join(tmp_dir, "embeddings.npy"), mmap_mode="r")
+            np.save(os.path.join(tmp_dir, "embeddings.npy"), np.array(full[:n]))
+            del full
+            rows = n
+
+        np.save(os.path.join(tmp_dir, "offsets.npy"), np.asarray(offsets, dtype=np.int64))
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "collection": collection.name,
+            "model": model,
+            "dimensions": dimensions,
+            "rows": rows,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(os.path.join(tmp_dir, "metadata.json"), "w", encoding="utf-8") as f:
+            json.dump({"manifest": manifest, "ids": ids, "metadata": metadata}, f, default=str)
+
+        previous = _publish(tmp_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _remove_old_versions(out_dir, keep=(tmp_dir, previous))
+
+    logger.info(f"Exported {rows} vectors from '{collection.name}' to {out_dir}")
+    return manifest
+
+
+def _version_prefix(name: str) -> str:
+    return f".{name}.v-"
+
+
+def _publish(version_dir: str, out_dir: str) -> Optional[str]:
+    """Point the `out_dir` symlink at `version_dir`; returns the version directory it replaced"""
+    parent, name = os.path.split(out_dir)
+    previous = None
+    moved_aside = False
+    if os.path.islink(out_dir):
+        previous = os.path.join(parent, os.readlink(out_dir))
+    elif os.path.isdir(out_dir):
+        # Unversioned snapshot from an older export: a directory cannot be replaced by a link in one rename
+        previous = tempfile.mkdtemp(prefix=_version_prefix(name), dir=parent)
+        os.replace(out_dir, previous)
+        moved_aside = True
+
+    link = version_dir + ".link"
+    try:
+        os.symlink(os.path.basename(version_dir), link)
+        # rename(2) over the old link is atomic: out_dir always resolves to a complete snapshot
+        os.replace(link, out_dir)
+    except BaseException:
+        if moved_aside:
+            os.replace(previous, out_dir)
+        raise
+    return previous
+
+
+def _remove_old_versions(out_dir: str, keep: Tuple[Optional[str], ...]):
+    """Delete version directories (and leftover links) of `out_dir` other than `keep`"""
+    parent, name = os.path.split(out_dir)
+    keep = {os.path.abspath(path) for path in keep if path}
+    version = re.compile(re.escape(_version_prefix(name)) + r"[^.]+(\.link)?")
+    for entry in os.listdir(parent):
+        path = os.path.join(parent, entry)
+        if not version.fullmatch(entry) or path in keep:
+            continue
+        if os.path.islink(path):
+            os.remove(path)
+        else:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class VectorSnapshot:
+    """
+    Exact cosine top-k search over a memory-mapped snapshot.
+
+    The teaching materials corpus is a few thousand chunks, so one matrix-vector
+    product over the mapped matrix is faster than an Atlas round trip and
+    needs no approximate index.
+    """
+
+    def __init__(self, path: str):
+        # Resolve the snapshot link once, so every file comes from the same version
+        self.path = path = os.path.realpath(path)
+        with open(os.path.join(path, "metadata.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.manifest: Dict[str, Any] = meta["manifest"]
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.manifest.get('format_version')} at {path}")
+        self.ids: List[str] = meta["ids"]
+        self.metadata: List[Dict[str, Any]] = meta["metadata"]
+        self.matrix = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._texts = np.memmap(os.path.join(path, "texts.bin"), dtype=np.uint8, mode="r") \
+            if self.offsets[-1] else np.empty(0, dtype=np.uint8)
+        if len(self.matrix) != len(self.metadata) or len(self.offsets) != len(self.metadata) + 1:
+            raise ValueError(f"Snapshot at {path} is inconsistent")
+
+    @property
+    def model(self) -> str:
+        return self.manifest["model"]
+
+    @property
+    def dimensions(self) -> int:
+        return self.manifest["dimensions"]
+
+    def __len__(self) -> int:
+        return len(self.metadata)
+
+    def text(self, row: int) -> str:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self._texts[start:end].tobytes().decode("utf-8")
+
+    def search(self, query_embedding: List[float], k: int = 5) -> List[Tuple[Document, float]]:
+        """Return the k nearest chunks with Atlas-style cosine scores in [0, 1]"""
+        if not len(self):
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        similarities = self.matrix @ query
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+
+        return [
+            (
+                Document(id=self.ids[row], page_content=self.text(row), metadata=dict(self.metadata[row])),
+                float((1.0 + similarities[row]) / 2.0),
+            )
+            for row in top
+        ]
+
+
+def load_snapshot(path: Optional[str], model: str, dimensions: Optional[int] = None) -> Optional[VectorSnapshot]:
+    """Open the snapshot at `path` if there is one built with `model` (and `dimensions`), else None"""
+    if not path or not os.path.exists(os.path.join(path, "metadata.json")):
+        return None
+    try:
+        snapshot = VectorSnapshot(path)
+    except Exception as e:
+        logger.error(f"Failed to open vector snapshot at {path}: {e}")
+        return None
+    if snapshot.model != model:
+        logger.warning(f"Ignoring vector snapshot at {path}: built with {snapshot.model}, expected {model}")
+        return None
+    if dimensions is not None and snapshot.dimensions != dimensions:
+        logger.warning(f"Ignoring vector snapshot at {path}: {snapshot.dimensions} dims, expected {dimensions}")
+        return None
+    logger.info(f"Opened vector snapshot at {path} ({len(snapshot)} vectors, {snapshot.dimensions} dims)")
+    return snapshot
+
+
+def main():
+    from ..config.settings import settings
+    from ..database.mongodb import MongoDB
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Export a vector collection to a snapshot")
+    export.add_argument("--collection", default="teaching_materials")
+    export.add_argument("--out", required=True)
+    export.add_argument("--model", default=settings.EMBEDDING_MODEL)
+    args = parser.parse_args()
+
+    MongoDB.connect_db()
+    try:
+        manifest = export_snapshot(MongoDB.get_db()[args.collection], args.out, args.model)
+    finally:
+        MongoDB.close_db()
+    print(json.dumps(manifest, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+CSV block reader: both engines must read the same file the same way.
+
+Run from backend/: python -m pytest tests
+"""
+import io
+
+import pytest
+
+from api.utils.csv_reader import iter_csv_blocks, resolve_csv_engine
+from api.utils.row_serializer import serialize_rows
+
+
+def _read(data: bytes, engine: str, block_rows: int):
+    rows = []
+    for block in iter_csv_blocks(io.BytesIO(data), "utf-8", block_rows, engine=engine):
+        rows.extend(serialize_rows(block))
+    return rows
+
+
+@pytest.mark.skipif(resolve_csv_engine("pyarrow") != "pyarrow", reason="pyarrow is not installed")
+def test_type_change_after_first_block():
+    # Over pyarrow's 1 MB minimum block, so the text value falls in a later block
+    lines = [b"id,score,comment"] + [b"%d,%d,fine" % (i, i % 5) for i in range(200000)]
+    lines += [b"200000,N/A ok,late text", b"200001,4.5,"]
+    data = b"\n".join(lines) + b"\n"
+
+    pyarrow_rows = _read(data, "pyarrow", 20000)
+    assert len(pyarrow_rows) == 200002
+    assert pyarrow_rows[0] == "id: 0; score: 0; comment: fine"
+    assert pyarrow_rows[-2] == "id: 200000; score: N/A ok; comment: late text"
+    assert pyarrow_rows[-1] == "id: 200001; score: 4.5"
+    assert pyarrow_rows == _read(data, "c", 20000)
@@ -0,0 +1,30 @@
+"""
+Streaming worksheet reader against pandas.read_excel on the same workbook.
+
+Run from backend/: python -m pytest tests
+"""
+import pandas as pd
+from openpyxl import Workbook
+
+from api.utils.excel_reader import iter_sheet_blocks
+from api.utils.row_serializer import serialize_rows
+
+
+def test_headerless_columns_are_kept(tmp_path):
+    path = str(tmp_path / "sheet.xlsx")
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Responses"
+    sheet.append(["course", None, "rating"])
+    sheet.append(["CS101", "gap under the header", 4])
+    sheet.append(["CS102", None, 5])
+    # Longer than the header, after the first block
+    sheet.append(["CS103", None, 3, "note past the header", None, "last column"])
+    sheet.append(["CS104", "x", 2])
+    workbook.save(path)
+
+    blocks = list(iter_sheet_blocks(path, "Responses", block_rows=2))
+    rows = [row for block in blocks for row in serialize_rows(block)]
+    assert list(blocks[-1].columns) == ["course", "Unnamed: 1", "rating", "Unnamed: 3", "Unnamed: 4", "Unnamed: 5"]
+    assert rows[2] == "course: CS103; rating: 3; Unnamed: 3: note past the header; Unnamed: 5: last column"
+    assert rows == serialize_rows(pd.read_excel(path, sheet_name="Responses"))
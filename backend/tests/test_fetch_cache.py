@@ -0,0 +1,165 @@
+"""
+FetchCache against a local stand-in HTTP server.
+
+The fetch tool is replaced by a function that records its calls and returns
+output shaped like the fetch server's, so the tests observe which calls the
+cache answers itself and which requests reach the origin.
+
+Run from backend/: python -m pytest tests
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from api.langgraph.fetch_cache import FetchCache
+
+
+class _Origin(BaseHTTPRequestHandler):
+    # path -> (Cache-Control, ETag); set per server below
+    pages = {}
+    requests = []
+
+    def do_HEAD(self):
+        self.requests.append(("HEAD", self.path, None))
+        self.send_response(405)
+        self.end_headers()
+
+    def do_GET(self):
+        cache_control, etag = self.pages[self.path]
+        self.requests.append(("GET", self.path, self.headers.get("If-None-Match")))
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
+        body = b"<html><body>page</body></html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", cache_control)
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def origin():
+    _Origin.pages = {
+        "/max-age": ("max-age=60", None),
+        "/no-store": ("no-store", None),
+        "/etag": ("max-age=60", '"v1"'),
+    }
+    _Origin.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Origin)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", _Origin.requests
+    server.shutdown()
+    server.server_close()
+
+
+class _Tool:
+    """Stands in for the fetch tool: output in the fetch server's format"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, arguments):
+        self.calls.append(arguments)
+        return f"Contents of {arguments['url']}:\n# page\n\nfetched {len(self.calls)}", None
+
+
+def _run(test):
+    async def main():
+        clock = [0.0]
+        cache = FetchCache(allow_private_hosts=True, clock=lambda: clock[0])
+        try:
+            await test(cache, clock)
+        finally:
+            await cache.close()
+    asyncio.run(main())
+
+
+def test_max_age_is_served_from_memory(origin):
+    base, requests = origin
+    tool = _Tool()
+
+    async def test(cache, clock):
+        first = await cache.intercept({"url": f"{base}/max-age"}, tool)
+        clock[0] = 59
+        second = await cache.intercept({"url": f"{base}/max-age"}, tool)
+        assert first == second
+        assert len(tool.calls) == 1
+        assert cache.stats()["hits"] == 1
+
+        # Expired without validators: fetched again
+        clock[0] = 61
+        await cache.intercept({"url": f"{base}/max-age"}, tool)
+        assert len(tool.calls) == 2
+
+    _run(test)
+    # Headers come from GETs, never HEAD
+    assert [method for method, _, _ in requests] == ["GET", "GET"]
+
+
+def test_no_store_is_not_cached(origin):
+    base, requests = origin
+    tool = _Tool()
+
+    async def test(cache, clock):
+        first = await cache.intercept({"url": f"{base}/no-store"}, tool)
+        second = await cache.intercept({"url": f"{base}/no-store"}, tool)
+        assert first != second
+        assert len(tool.calls) == 2
+        assert cache.stats()["entries"] == 0
+
+    _run(test)
+
+
+def test_stale_page_is_revalidated_with_304(origin):
+    base, requests = origin
+    tool = _Tool()
+
+    async def test(cache, clock):
+        first = await cache.intercept({"url": f"{base}/etag"}, tool)
+        clock[0] = 120
+        second = await cache.intercept({"url": f"{base}/etag", "start_index": 2, "max_length": 4}, tool)
+        assert len(tool.calls) == 1
+        assert second[0] == f"Contents of {base}/etag:\npage" + \
+            "\n\n<error>Content truncated. Call the fetch tool with a start_index of 6 to get more content.</error>"
+        assert cache.stats()["revalidated"] == 1
+
+        # Fresh again for max-age after the 304
+        clock[0] = 179
+        assert await cache.intercept({"url": f"{base}/etag"}, tool) == first
+        assert len(tool.calls) == 1
+
+    _run(test)
+    assert requests == [("GET", "/etag", None), ("GET", "/etag", '"v1"')]
+
+
+def test_changed_page_reuses_revalidation_headers(origin):
+    base, requests = origin
+    tool = _Tool()
+
+    async def test(cache, clock):
+        await cache.intercept({"url": f"{base}/etag"}, tool)
+        _Origin.pages["/etag"] = ("max-age=60", '"v2"')
+        clock[0] = 120
+        second = await cache.intercept({"url": f"{base}/etag"}, tool)
+        assert second[0].endswith("fetched 2")
+        assert len(tool.calls) == 2
+
+        # Stored with the new validator, without another header request
+        clock[0] = 300
+        await cache.intercept({"url": f"{base}/etag"}, tool)
+        assert len(tool.calls) == 2
+
+    _run(test)
+    assert requests == [("GET", "/etag", None), ("GET", "/etag", '"v1"'), ("GET", "/etag", '"v2"')]
@@ -36,6 +36,8 @@ export function CourseEvalSidebar({ files, onDeleteFile, onFileUploaded }: Cours
   const [currentFileId, setCurrentFileId] = useState<string | null>(null);
   const [processingStats, setProcessingStats] = useState<any>({});
   const [processingStage, setProcessingStage] = useState<string>("");
+  // True while the upload request is in flight; processing may not have started on the server yet
+  const uploadRequestPending = useRef(false);
 
   const API_URL = getApiUrl()
 
@@ -53,79 +55,91 @@ export function CourseEvalSidebar({ files, onDeleteFile, onFileUploaded }: Cours
     };
   }, []);
   
-  // Effect to poll for progress updates when a file is being uploaded
+  // Effect to stream progress updates (server-sent events) while a file is being uploaded
   useEffect(() => {
-    let progressInterval: NodeJS.Timeout | null = null;
+    let progressSource: EventSource | null = null;
     let previousProgress = 0;
     
     if (isUploading && currentFileId) {
-      // Start polling for progress
-      progressInterval = setInterval(async () => {
+      // The server pushes a snapshot after each processing update and ends the stream on completion
+      progressSource = new EventSource(`${API_URL}/api/files/progress/${currentFileId}/stream`);
+      
+      progressSource.onmessage = (event) => {
         try {
-          const token = localStorage.getItem('token');
-          const response = await fetch(`${API_URL}/api/files/progress/${currentFileId}`, {
-            headers: {
-              'Authorization': `Bearer ${token}`
+          const progressData = JSON.parse(event.data);
+          
+          // The server sends not_found and ends the stream once its start timeout has passed,
+          // or when the file's progress was cleared or expired
+          if (progressData.status === 'not_found') {
+            if (uploadRequestPending.current) {
+              // Still uploading: the browser reopens the stream until processing starts
+              return;
             }
-          });
+            progressSource?.close();
+            progressSource = null;
+            setIsUploading(false);
+            setCurrentFileId(null);
+            return;
+          }
           
-          if (response.ok) {
-            const progressData = await response.json();
-            
-            // Implement smooth progress transitions
-            const newProgress = progressData.progress || 0;
+          // Implement smooth progress transitions
+          const newProgress = progressData.progress || 0;
+          
+          // If progress is going backwards or jumping too much, smooth it out
+          if (newProgress < previousProgress || newProgress - previousProgress > 20) {
+            // Animate to the new value gradually
+            const animateProgress = () => {
+              setUploadProgress(prev => {
+                // Move 10% of the way to the target each frame
+                const step = (newProgress - prev) * 0.1;
+                return prev + step;
+              });
+            };
             
-            // If progress is going backwards or jumping too much, smooth it out
-            if (newProgress < previousProgress || newProgress - previousProgress > 20) {
-              // Animate to the new value gradually
-              const animateProgress = () => {
-                setUploadProgress(prev => {
-                  // Move 10% of the way to the target each frame
-                  const step = (newProgress - prev) * 0.1;
-                  return prev + step;
-                });
-              };
-              
-              // Update progress smoothly a few times
-              const animation = setInterval(animateProgress, 100);
-              setTimeout(() => clearInterval(animation), 500);
-            } else {
-              // Normal progress update
-              setUploadProgress(newProgress);
-            }
+            // Update progress smoothly a few times
+            const animation = setInterval(animateProgress, 100);
+            setTimeout(() => clearInterval(animation), 500);
+          } else {
+            // Normal progress update
+            setUploadProgress(newProgress);
+          }
+          
+          previousProgress = newProgress;
+          setUploadStatus(progressData.message || "");
+          setProcessingStats(progressData.stats || {});
+          setProcessingStage(progressData.status || "");
+          
+          // If processing is complete or errored, close the stream and reset upload state
+          if (progressData.status === 'completed' || progressData.status === 'error') {
+            progressSource?.close();
+            progressSource = null;
             
-            previousProgress = newProgress;
-            setUploadStatus(progressData.message || "");
-            setProcessingStats(progressData.stats || {});
-            setProcessingStage(progressData.status || "");
+            // Set upload state to false to stop the spinner and change button text
+            setIsUploading(false);
+            setCurrentFileId(null);
             
-            // If processing is complete or errored, stop polling and reset upload state
-            if (progressData.status === 'completed' || progressData.status === 'error') {
-              // Set upload state to false to stop the spinner and change button text
-              setIsUploading(false);
-              setCurrentFileId(null);
-              
-              if (progressInterval) {
-                clearInterval(progressInterval);
-                progressInterval = null;
-              }
-              
-              // If there was an error, show it
-              if (progressData.status === 'error') {
-                toast.error(progressData.message || "An error occurred during file processing");
-              }
+            // If there was an error, show it
+            if (progressData.status === 'error') {
+              toast.error(progressData.message || "An error occurred during file processing");
             }
           }
         } catch (error) {
-          logger.error('Error fetching progress:', error);
+          logger.error('Error reading progress update:', error);
         }
-      }, 1000); // Poll every second
+      };
+      
+      progressSource.onerror = (error) => {
+        // The browser retries on its own unless the stream was rejected
+        if (progressSource?.readyState === EventSource.CLOSED) {
+          logger.error('Progress stream closed:', error);
+        }
+      };
     }
     
-    // Cleanup interval on unmount or when upload completes
+    // Close the stream on unmount or when upload completes
     return () => {
-      if (progressInterval) {
-        clearInterval(progressInterval);
+      if (progressSource) {
+        progressSource.close();
       }
     };
   }, [isUploading, currentFileId, API_URL]);
@@ -168,6 +182,7 @@ const formData = new FormData();
     formData.append('file_id', fileId);
     const token = localStorage.getItem('token');
 
+    uploadRequestPending.current = true;
     try {
       const response = await fetch(`${API_URL}/api/files/upload`, {
         method: 'POST',
@@ -201,8 +216,12 @@ const formData = new FormData();
     } catch (error) {
       logger.error('Upload error:', error);
       toast.error('Failed to upload file. Please try again.');
+      // No progress will arrive for a rejected upload; closes the progress stream
+      setIsUploading(false);
+      setCurrentFileId(null);
     } finally {
-      // We'll reset the upload state in the polling effect when it detects completion
+      uploadRequestPending.current = false;
+      // We'll reset the upload state in the progress effect when it detects completion
       // Don't reset here as we want to keep showing progress
     }
   };